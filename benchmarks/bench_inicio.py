@@ -0,0 +1,55 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que no se deben cargar al iniciar la aplicación para ver resultados existentes
+MODULOS_PESADOS = ['paddleocr', 'paddle', 'cv2', 'textract', 'pdfminer', 'spacy', 'openai', 'nltk', 'sklearn', 'wordcloud']
+
+# Se ejecuta en un proceso nuevo: importa el módulo y devuelve el tiempo y los módulos pesados cargados
+CODIGO_MEDICION = """
+import sys, time, json
+inicio = time.perf_counter()
+import {modulo}
+duracion = time.perf_counter() - inicio
+pesados = sorted(nombre for nombre in {pesados!r} if nombre in sys.modules)
+print(json.dumps({{'tiempo_s': duracion, 'pesados': pesados}}))
+"""
+
+def medir_importacion(modulo, sin_conexion=True):
+    entorno = dict(os.environ)
+    if sin_conexion:
+        entorno['CV_OFFLINE'] = "1"
+    codigo = CODIGO_MEDICION.format(modulo=modulo, pesados=MODULOS_PESADOS)
+    proceso = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, env=entorno, capture_output=True, text=True)
+    if proceso.returncode != 0:
+        lineas = proceso.stderr.strip().splitlines()
+        raise RuntimeError(lineas[-1] if lineas else f"Código de salida {proceso.returncode}")
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+# Mide el arranque en frío de main.py (importación en un proceso nuevo) y lo compara con el presupuesto.
+# Termina con código 1 si la mediana supera el presupuesto o si se cargan módulos pesados
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempo de arranque en frío de la aplicación")
+    parser.add_argument("--modulo", default="main", help="Módulo a importar")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--presupuesto", type=float, default=float(os.environ.get("CV_PRESUPUESTO_INICIO", 3.0)),
+                        help="Tiempo máximo de importación (mediana), en segundos")
+    args = parser.parse_args()
+
+    mediciones = [medir_importacion(args.modulo) for _ in range(args.repeticiones)]
+    tiempos = [medicion['tiempo_s'] for medicion in mediciones]
+    pesados = sorted({nombre for medicion in mediciones for nombre in medicion['pesados']})
+    mediana = statistics.median(tiempos)
+
+    print(f"Importación de {args.modulo}: mediana {mediana * 1000:.0f} ms, mínimo {min(tiempos) * 1000:.0f} ms, "
+          f"máximo {max(tiempos) * 1000:.0f} ms ({args.repeticiones} repeticiones)")
+    print(f"Presupuesto: {args.presupuesto * 1000:.0f} ms")
+    if pesados:
+        print(f"Módulos pesados cargados al iniciar: {', '.join(pesados)}")
+
+    sys.exit(1 if mediana > args.presupuesto or pesados else 0)
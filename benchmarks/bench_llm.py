@@ -0,0 +1,38 @@
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import AsyncOpenAI
+from llm_utils import extraer_datos_lote, LimitadorTasa
+from stub_llm import crear_servidor
+
+# Mide el rendimiento de la extracción con OpenAI contra el servidor stub local
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de extracción concurrente con el servidor stub")
+    parser.add_argument("--cv", type=int, default=200, help="Cantidad de CV simulados")
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--latencia", type=float, default=0.5)
+    parser.add_argument("--tasa-error", type=float, default=0.05)
+    parser.add_argument("--tasa-json-invalido", type=float, default=0.05)
+    parser.add_argument("--puerto", type=int, default=8765)
+    args = parser.parse_args()
+
+    servidor = crear_servidor(args.puerto, args.latencia, args.tasa_error, args.tasa_json_invalido)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    client = AsyncOpenAI(base_url=f"http://127.0.0.1:{args.puerto}/v1", api_key="stub", max_retries=0)
+    textos = [f"Candidato {i} Apellido candidato{i}@correo.cl +56 9 1234 5678 Ingeniero 2020 Python SQL" for i in range(args.cv)]
+
+    inicio = time.perf_counter()
+    resultados = extraer_datos_lote(textos, args.concurrencia, LimitadorTasa(100000, 10000000), client)
+    duracion = time.perf_counter() - inicio
+    servidor.shutdown()
+
+    fallidos = sum(1 for _, error in resultados if error is not None)
+    print(f"CV: {args.cv}  concurrencia: {args.concurrencia}  tiempo: {duracion:.2f} s")
+    print(f"Rendimiento: {args.cv / duracion:.1f} CV/s  fallidos: {fallidos}")
+    print(f"Secuencial estimado: {args.cv * args.latencia:.1f} s")
@@ -0,0 +1,295 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import platform
+import argparse
+import threading
+import subprocess
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generar_corpus import generar_corpus
+
+ETAPAS = ['image_to_text', 'document_to_text', 'normalize_text', 'extraer_datos_cv', 'habilidades', 'procesar_df']
+TAMANOS = [10, 100, 1000]
+ruta_base = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "pipeline.json")
+ruta_corpus = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+# Cada etapa recibe el corpus y devuelve (latencias por documento en segundos, documentos fallidos,
+# duración del lote en segundos). Las importaciones, la carga de modelos y una primera llamada de
+# calentamiento quedan fuera de la duración, para que docs/s no dependa del tamaño del lote.
+# En las etapas que procesan el lote en paralelo la latencia es el tiempo desde el inicio del lote
+# hasta que el documento termina; en las secuenciales, el tiempo de cada documento
+
+def _leer(rutas):
+    contenidos = []
+    for ruta in rutas:
+        with open(ruta, 'rb') as f:
+            contenidos.append(f.read())
+    return contenidos
+
+def etapa_image_to_text(corpus, args):
+    from ocr_utils import reconocer_imagenes, cerrar_pool_ocr
+
+    imagenes = _leer(corpus['png'])
+    # El primer lote carga el modelo en los procesos, no se mide
+    list(reconocer_imagenes(imagenes[:1]))
+    inicio = time.perf_counter()
+    latencias, fallidos = [], 0
+    for _, error in reconocer_imagenes(imagenes):
+        latencias.append(time.perf_counter() - inicio)
+        fallidos += error is not None
+    duracion = time.perf_counter() - inicio
+    cerrar_pool_ocr()
+    return latencias, fallidos, duracion
+
+def etapa_document_to_text(corpus, args):
+    from documentos_utils import extraer_documentos
+
+    rutas = corpus['pdf'] + corpus['docx']
+    documentos = [(i, os.path.basename(ruta), contenido) for i, (ruta, contenido) in enumerate(zip(rutas, _leer(rutas)))]
+    # Un documento de cada formato antes de medir
+    list(extraer_documentos([documentos[0], documentos[len(corpus['pdf'])]] if corpus['docx'] else documentos[:1]))
+    inicio = time.perf_counter()
+    latencias, fallidos = [], 0
+    for _, _, _, error in extraer_documentos(documentos):
+        latencias.append(time.perf_counter() - inicio)
+        fallidos += error is not None
+    return latencias, fallidos, time.perf_counter() - inicio
+
+def etapa_normalize_text(corpus, args):
+    from utils import normalizar_texto
+
+    textos = [texto.decode('utf-8') for texto in _leer(corpus['txt'])]
+    normalizar_texto(textos[0])
+    latencias = []
+    for texto in textos:
+        inicio = time.perf_counter()
+        normalizar_texto(texto)
+        latencias.append(time.perf_counter() - inicio)
+    return latencias, 0, sum(latencias)
+
+def etapa_extraer_datos_cv(corpus, args):
+    from openai import AsyncOpenAI
+    from llm_utils import extraer_datos_async, LimitadorTasa, LLM_CONCURRENCIA, CAMPOS_CV
+    from preextraccion_utils import preextraer
+    from stub_llm import crear_servidor
+
+    servidor = crear_servidor(args.puerto, args.latencia_llm)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    textos = [texto.decode('utf-8') for texto in _leer(corpus['txt'])]
+
+    async def extraer():
+        client = AsyncOpenAI(base_url=f"http://127.0.0.1:{args.puerto}/v1", api_key="stub", max_retries=0)
+        limitador = LimitadorTasa(1000000, 1000000000)
+        semaforo = asyncio.Semaphore(LLM_CONCURRENCIA)
+        # La primera solicitud abre la conexión y compila los patrones de la preextracción
+        _, recortado, campos = preextraer(textos[0], CAMPOS_CV)
+        await extraer_datos_async(client, recortado, limitador, semaforo, campos=campos)
+        inicio = time.perf_counter()
+
+        async def medir(texto):
+            try:
+                # Igual que en la aplicación, se envía el texto recortado con los campos que faltan
+                _, recortado, campos = preextraer(texto, CAMPOS_CV)
+                await extraer_datos_async(client, recortado, limitador, semaforo, campos=campos)
+                return time.perf_counter() - inicio, 0
+            except Exception:
+                return time.perf_counter() - inicio, 1
+
+        try:
+            resultados = await asyncio.gather(*[medir(texto) for texto in textos])
+            return resultados, time.perf_counter() - inicio
+        finally:
+            await client.close()
+
+    resultados, duracion = asyncio.run(extraer())
+    servidor.shutdown()
+    return [latencia for latencia, _ in resultados], sum(fallido for _, fallido in resultados), duracion
+
+def etapa_habilidades(corpus, args):
+    from skills_utils import obtener_nlp, SKILLS_BATCH_SIZE
+
+    nlp = obtener_nlp()
+    textos = [texto.decode('utf-8') for texto in _leer(corpus['txt'])]
+    list(nlp.pipe(textos[:1]))
+    latencias = []
+    inicio = anterior = time.perf_counter()
+    for _ in nlp.pipe(textos, batch_size=SKILLS_BATCH_SIZE):
+        ahora = time.perf_counter()
+        latencias.append(ahora - anterior)
+        anterior = ahora
+    return latencias, 0, anterior - inicio
+
+# Preparación del dataset para el dashboard (lo que procesar_df calcula antes de dibujar los gráficos)
+def etapa_procesar_df(corpus, args):
+    import pandas as pd
+    from stub_llm import _datos_simulados
+    from store_utils import normalizar_resultados
+    from generar_corpus import frases_habilidades
+    from df_utils import preparar_df, calcular_frecuencias_blandas
+    from indice_utils import construir_indices
+    from ranking_utils import MotorRanking
+
+    aleatorio = random.Random(0)
+    habilidades = frases_habilidades()
+    filas = []
+    for texto in _leer(corpus['txt']):
+        datos = _datos_simulados(texto.decode('utf-8'))
+        datos['habilidades_tecnicas'] = aleatorio.sample(habilidades, 8)
+        filas.append(datos)
+    df = normalizar_resultados(pd.DataFrame(filas))
+
+    def preparar(df):
+        df = preparar_df(df)
+        construir_indices(df)
+        MotorRanking(df)
+        calcular_frecuencias_blandas(df)
+
+    # La primera fila carga el modelo de spaCy y los datos de NLTK
+    preparar(df.head(1))
+    inicio = time.perf_counter()
+    preparar(df)
+    duracion = time.perf_counter() - inicio
+    # Una sola medición para todo el lote
+    return [duracion], 0, duracion
+
+def _pico_rss_mb(quien):
+    if resource is None:
+        return None
+    maximo = resource.getrusage(quien).ru_maxrss
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    return round(maximo / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def _percentil(valores, percentil):
+    valores = sorted(valores)
+    indice = min(len(valores) - 1, max(0, round(percentil / 100 * len(valores)) - 1))
+    return valores[indice]
+
+# Ejecuta una etapa en el proceso actual y devuelve sus métricas
+def ejecutar_etapa(etapa, cantidad, args):
+    formatos = {'image_to_text': ['png'], 'document_to_text': ['pdf', 'docx']}.get(etapa, ['txt'])
+    corpus = generar_corpus(args.corpus, cantidad, formatos, args.palabras, args.densidad, args.semilla)
+    # Los módulos de la aplicación usan rutas relativas a la raíz del repositorio
+    os.chdir(RAIZ)
+
+    latencias, fallidos, duracion = globals()[f"etapa_{etapa}"](corpus, args)
+
+    documentos = sum(len(rutas) for rutas in corpus.values())
+    por_documento = len(latencias) == documentos
+    return {
+        'documentos': documentos,
+        'fallidos': fallidos,
+        'tiempo_s': round(duracion, 3),
+        'documentos_por_s': round(documentos / duracion, 2) if duracion else None,
+        'p50_ms': round(_percentil(latencias, 50) * 1000, 2) if por_documento else None,
+        'p95_ms': round(_percentil(latencias, 95) * 1000, 2) if por_documento else None,
+        'pico_rss_mb': _pico_rss_mb(resource.RUSAGE_SELF) if resource else None,
+        'pico_rss_hijos_mb': _pico_rss_mb(resource.RUSAGE_CHILDREN) if resource else None
+    }
+
+# Cada etapa y tamaño se mide en un proceso nuevo para que el pico de memoria sea solo de esa etapa
+def medir_en_proceso(etapa, cantidad, args):
+    comando = [sys.executable, os.path.abspath(__file__), "--etapa-interna", etapa, "--tamanos", str(cantidad),
+               "--corpus", args.corpus, "--palabras", str(args.palabras), "--densidad", str(args.densidad),
+               "--semilla", str(args.semilla), "--latencia-llm", str(args.latencia_llm), "--puerto", str(args.puerto)]
+    try:
+        proceso = subprocess.run(comando, capture_output=True, text=True, timeout=args.timeout)
+    except subprocess.TimeoutExpired:
+        return {'error': f"Tiempo excedido ({args.timeout} s)"}
+    if proceso.returncode != 0:
+        lineas = proceso.stderr.strip().splitlines()
+        return {'error': lineas[-1] if lineas else f"Código de salida {proceso.returncode}"}
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+def entorno():
+    return {
+        'python': platform.python_version(),
+        'sistema': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+def imprimir(resultados, base=None):
+    print(f"{'etapa':<18}{'docs':>6}{'docs/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'RSS MB':>9}{'hijos MB':>10}{'fallidos':>10}  vs. base")
+    for tamano, etapas in resultados.items():
+        for etapa, metricas in etapas.items():
+            if 'error' in metricas:
+                print(f"{etapa:<18}{tamano:>6}  error: {metricas['error']}")
+                continue
+            comparacion = ''
+            anterior = ((base or {}).get(tamano) or {}).get(etapa) or {}
+            if anterior.get('documentos_por_s') and metricas['documentos_por_s']:
+                comparacion = f"{metricas['documentos_por_s'] / anterior['documentos_por_s'] - 1:+.0%} docs/s"
+            valores = [metricas[clave] if metricas[clave] is not None else '-' for clave in ('documentos_por_s', 'p50_ms', 'p95_ms', 'pico_rss_mb', 'pico_rss_hijos_mb')]
+            print(f"{etapa:<18}{metricas['documentos']:>6}" + ''.join(f"{valor:>10}" for valor in valores[:3])
+                  + f"{valores[3]:>9}{valores[4]:>10}{metricas['fallidos']:>10}  {comparacion}")
+
+# Mide cada etapa del pipeline con un corpus sintético y compara contra la línea base guardada
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark por etapa del pipeline con un corpus sintético")
+    parser.add_argument("--etapas", nargs="+", choices=ETAPAS, default=ETAPAS)
+    parser.add_argument("--tamanos", nargs="+", type=int, default=TAMANOS, help="Cantidad de CV por medición")
+    parser.add_argument("--corpus", default=ruta_corpus, help="Carpeta del corpus sintético (se reutiliza entre ejecuciones)")
+    parser.add_argument("--palabras", type=int, default=400, help="Palabras de texto libre por CV")
+    parser.add_argument("--densidad", type=float, default=0.1, help="Proporción de palabras que son habilidades técnicas")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--latencia-llm", type=float, default=0.05, help="Latencia media del servidor stub, en segundos")
+    parser.add_argument("--puerto", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=3600, help="Tiempo máximo por etapa y tamaño, en segundos")
+    parser.add_argument("--base", default=ruta_base, help="Archivo JSON con la línea base")
+    parser.add_argument("--guardar-base", action="store_true", help="Guarda los resultados como nueva línea base")
+    parser.add_argument("--etapa-interna", choices=ETAPAS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.corpus = os.path.abspath(args.corpus)
+
+    if args.etapa_interna:
+        print(json.dumps(ejecutar_etapa(args.etapa_interna, args.tamanos[0], args)))
+        sys.exit(0)
+
+    base = None
+    parametros_base = None
+    if os.path.exists(args.base):
+        with open(args.base, encoding='utf-8') as f:
+            guardada = json.load(f)
+        base, parametros_base = guardada.get('resultados'), guardada.get('parametros')
+
+    # El corpus se genera una sola vez, con la cantidad mayor y solo los formatos necesarios
+    formatos = {'txt'}
+    if 'image_to_text' in args.etapas:
+        formatos.add('png')
+    if 'document_to_text' in args.etapas:
+        formatos.update(['pdf', 'docx'])
+    print(f"Generando corpus en {args.corpus}...", file=sys.stderr)
+    generar_corpus(args.corpus, max(args.tamanos), sorted(formatos), args.palabras, args.densidad, args.semilla)
+
+    resultados = {}
+    for tamano in args.tamanos:
+        resultados[str(tamano)] = {}
+        for etapa in args.etapas:
+            print(f"Midiendo {etapa} con {tamano} CV...", file=sys.stderr)
+            resultados[str(tamano)][etapa] = medir_en_proceso(etapa, tamano, args)
+
+    imprimir(resultados, base)
+
+    if args.guardar_base:
+        os.makedirs(os.path.dirname(args.base), exist_ok=True)
+        parametros = {'palabras': args.palabras, 'densidad': args.densidad, 'semilla': args.semilla, 'latencia_llm': args.latencia_llm}
+        # Con los mismos parámetros, las etapas y tamaños que no se midieron se mantienen de la línea base anterior
+        if base and parametros_base == parametros:
+            for tamano, etapas in resultados.items():
+                base.setdefault(tamano, {}).update(etapas)
+            resultados = base
+        with open(args.base, 'w', encoding='utf-8') as f:
+            json.dump({'entorno': entorno(), 'parametros': parametros, 'resultados': resultados}, f, indent=2, sort_keys=True, ensure_ascii=False)
+            f.write('\n')
+        print(f"Línea base guardada en {args.base}")
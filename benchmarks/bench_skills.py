@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spacy
+from skills_utils import obtener_nlp, leer_patrones, model_skills_path
+
+RELLENO = "experiencia en desarrollo de proyectos con equipos multidisciplinarios, liderazgo y comunicacion efectiva durante".split()
+
+# Genera CV sintéticos con habilidades de los patrones mezcladas con texto de relleno
+def generar_textos(cantidad, palabras_por_cv, semilla=0):
+    random.seed(semilla)
+    frases = [' '.join(token.get('LOWER', token.get('TEXT', '')) for token in linea['pattern']) for linea in leer_patrones()]
+    textos = []
+    for _ in range(cantidad):
+        palabras = []
+        while len(palabras) < palabras_por_cv:
+            if random.random() < 0.15:
+                frase = random.choice(frases)
+                palabras.append(random.choice([frase, frase.title(), frase.upper()]) + random.choice(['', ',', '.', ')']))
+            else:
+                palabras.append(random.choice(RELLENO))
+        textos.append(' '.join(palabras))
+    return textos
+
+def medir(nlp, textos):
+    inicio = time.perf_counter()
+    resultados = [[(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents] for doc in nlp.pipe(textos)]
+    return resultados, (time.perf_counter() - inicio) / len(textos)
+
+# Compara el entity_ruler original con el índice compilado: mismos spans y tiempo por documento
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del índice de habilidades contra el entity_ruler")
+    parser.add_argument("--cv", type=int, default=200)
+    parser.add_argument("--palabras", type=int, default=1500, help="Palabras por CV")
+    args = parser.parse_args()
+
+    textos = generar_textos(args.cv, args.palabras)
+
+    inicio = time.perf_counter()
+    ruler = spacy.load(model_skills_path)
+    carga_ruler = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    indice = obtener_nlp()
+    carga_indice = time.perf_counter() - inicio
+
+    esperados, tiempo_ruler = medir(ruler, textos)
+    obtenidos, tiempo_indice = medir(indice, textos)
+
+    diferencias = sum(1 for esperado, obtenido in zip(esperados, obtenidos) if esperado != obtenido)
+    print(f"CV: {args.cv}  palabras por CV: {args.palabras}  entidades: {sum(map(len, esperados))}")
+    print(f"Carga     entity_ruler: {carga_ruler * 1000:.1f} ms  índice: {carga_indice * 1000:.1f} ms")
+    print(f"Por CV    entity_ruler: {tiempo_ruler * 1000:.2f} ms  índice: {tiempo_indice * 1000:.2f} ms  ({tiempo_ruler / tiempo_indice:.1f}x)")
+    print(f"CV con spans distintos: {diferencias}")
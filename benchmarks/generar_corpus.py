@@ -0,0 +1,215 @@
+import os
+import sys
+import json
+import random
+import zipfile
+import argparse
+from xml.sax.saxutils import escape
+from unidecode import unidecode
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from skills_utils import leer_patrones, patterns_path
+
+FORMATOS = ['txt', 'pdf', 'docx', 'png']
+# Páginas de cada PDF (se elige una al azar por CV): la mayoría de los CV tienen una o dos páginas
+PAGINAS_PDF = [1, 1, 1, 2, 2, 3, 5]
+
+NOMBRES = ['Camila', 'Javiera', 'Francisca', 'Constanza', 'Valentina', 'Matías', 'Benjamín', 'Vicente', 'Tomás', 'Joaquín', 'Sebastián', 'Ignacio']
+APELLIDOS = ['González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda', 'Morales', 'Fuentes']
+COMUNAS = ['Santiago', 'Providencia', 'Ñuñoa', 'Las Condes', 'Valparaíso', 'Concepción', 'Temuco', 'La Serena']
+TITULOS = ['Ingeniero Civil en Informática', 'Ingeniera en Computación', 'Analista Programador', 'Técnico en Informática', 'Ingeniero Comercial']
+INSTITUCIONES = ['Universidad de Chile', 'Pontificia Universidad Católica', 'Universidad de Santiago', 'Duoc UC', 'Inacap', 'Universidad Técnica Federico Santa María']
+CARGOS = ['Desarrollador Backend', 'Analista de Datos', 'Ingeniero de Software', 'Desarrolladora Full Stack', 'Jefe de Proyectos', 'Soporte TI']
+EMPRESAS = ['Falabella', 'Banco Estado', 'Entel', 'Cencosud', 'LATAM', 'Codelco', 'Sodimac']
+HABILIDADES_BLANDAS = ['trabajo en equipo', 'comunicación efectiva', 'liderazgo', 'proactividad', 'resolución de problemas', 'adaptabilidad', 'pensamiento crítico']
+IDIOMAS = ['inglés', 'francés', 'portugués', 'alemán']
+NIVELES = ['básico', 'intermedio', 'avanzado', 'nativo']
+RELLENO = ("Participé en el desarrollo y mantención de sistemas para distintas áreas de la empresa, coordinando requerimientos "
+           "con los usuarios, documentando los procesos y apoyando la puesta en producción de nuevas funcionalidades").split()
+
+# Frases de habilidades de los patrones del entity_ruler (solo patrones con texto)
+def frases_habilidades():
+    frases = set()
+    for linea in leer_patrones(os.path.join(RAIZ, patterns_path)):
+        patron = linea['pattern']
+        if isinstance(patron, str):
+            frases.add(patron)
+        elif all(list(token.values())[0] for token in patron):
+            frases.add(' '.join(str(list(token.values())[0]) for token in patron))
+    return sorted(frases)
+
+# Genera el texto de un CV sintético en español. densidad es la proporción de palabras del
+# texto libre que corresponden a habilidades técnicas
+def generar_cv(aleatorio, habilidades, palabras=400, densidad=0.1):
+    nombre = f"{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}"
+    usuario = unidecode(nombre.lower().split()[0]) + str(aleatorio.randint(1, 999))
+    egreso = aleatorio.randint(1995, 2023)
+
+    lineas = [
+        nombre,
+        f"Teléfono: +56 9 {aleatorio.randint(1000, 9999)} {aleatorio.randint(1000, 9999)}",
+        f"Email: {usuario}@correo.cl",
+        f"Dirección: {aleatorio.choice(COMUNAS)}, Chile",
+        f"LinkedIn: https://www.linkedin.com/in/{usuario}",
+        "",
+        "EDUCACIÓN",
+        f"{aleatorio.choice(TITULOS)}, {aleatorio.choice(INSTITUCIONES)}, {egreso}",
+        "",
+        "EXPERIENCIA LABORAL"
+    ]
+    for anno in sorted(aleatorio.sample(range(egreso, 2025), k=min(3, 2025 - egreso)), reverse=True):
+        lineas.append(f"{aleatorio.choice(CARGOS)} en {aleatorio.choice(EMPRESAS)} ({anno} - {anno + aleatorio.randint(1, 3)})")
+
+    # Texto libre con habilidades mezcladas
+    texto = []
+    while len(texto) < palabras:
+        if aleatorio.random() < densidad:
+            texto.append(aleatorio.choice(habilidades) + aleatorio.choice(['', ',', '.']))
+        else:
+            texto.append(aleatorio.choice(RELLENO))
+    lineas += [' '.join(texto[i:i + 14]) for i in range(0, len(texto), 14)]
+
+    lineas += [
+        "",
+        "HABILIDADES",
+        ', '.join(aleatorio.sample(HABILIDADES_BLANDAS, 3)),
+        ', '.join(aleatorio.sample(habilidades, min(8, len(habilidades)))),
+        "",
+        "CERTIFICADOS",
+        f"Certificación en {aleatorio.choice(habilidades)} ({aleatorio.randint(egreso, 2024)})",
+        "",
+        "IDIOMAS",
+        f"Español nativo, {aleatorio.choice(IDIOMAS)} {aleatorio.choice(NIVELES)}"
+    ]
+    return '\n'.join(lineas)
+
+# PDF mínimo con fuente Helvetica (WinAnsiEncoding), suficiente para pdfminer. Con paginas, las líneas
+# se reparten en esa cantidad de páginas en lugar de usar lineas_por_pagina
+def texto_a_pdf(texto, lineas_por_pagina=50, paginas=None):
+    lineas = texto.split('\n')
+    if paginas:
+        lineas_por_pagina = max(1, -(-len(lineas) // paginas))
+    paginas = [lineas[i:i + lineas_por_pagina] for i in range(0, len(lineas), lineas_por_pagina)] or [[]]
+
+    objetos = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    hojas = []
+    for pagina in paginas:
+        # Las páginas con muchas líneas usan un interlineado menor para no salirse de la hoja
+        interlineado = min(12, 760 / max(1, len(pagina)))
+        contenido = f"BT /F1 {min(10, interlineado * 0.8):.1f} Tf {interlineado:.1f} TL 50 800 Td\n"
+        for linea in pagina:
+            linea = linea.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            contenido += f"({linea}) Tj T*\n"
+        contenido = (contenido + "ET").encode('cp1252', errors='replace')
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(contenido) + contenido + b"\nendstream")
+        objetos.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objetos))
+        hojas.append(len(objetos))
+    objetos[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b' '.join(b"%d 0 R" % hoja for hoja in hojas), len(hojas))
+
+    salida = bytearray(b"%PDF-1.4\n")
+    posiciones = []
+    for numero, objeto in enumerate(objetos, 1):
+        posiciones.append(len(salida))
+        salida += b"%d 0 obj\n" % numero + objeto + b"\nendobj\n"
+    inicio_xref = len(salida)
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    salida += b''.join(b"%010d 00000 n \n" % posicion for posicion in posiciones)
+    salida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    return bytes(salida)
+
+# DOCX mínimo (un párrafo por línea), escrito directamente con zipfile
+def texto_a_docx(texto, ruta):
+    parrafos = ''.join(f'<w:p><w:r><w:t xml:space="preserve">{escape(linea)}</w:t></w:r></w:p>' for linea in texto.split('\n'))
+    with zipfile.ZipFile(ruta, 'w', zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr('[Content_Types].xml',
+                      '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                      '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                      '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                      '<Default Extension="xml" ContentType="application/xml"/>'
+                      '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+                      '</Types>')
+        docx.writestr('_rels/.rels',
+                      '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                      '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                      '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+                      '</Relationships>')
+        docx.writestr('word/document.xml',
+                      '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                      '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                      f'<w:body>{parrafos}</w:body></w:document>')
+
+# Imagen del CV, como un escaneo de una página
+def texto_a_png(texto, ruta, ancho=1240, alto=1754):
+    from PIL import Image, ImageDraw, ImageFont
+
+    imagen = Image.new('L', (ancho, alto), 255)
+    dibujo = ImageDraw.Draw(imagen)
+    try:
+        fuente = ImageFont.load_default(size=22)
+    except TypeError:
+        fuente = ImageFont.load_default()
+    y = 60
+    for linea in texto.split('\n'):
+        if y > alto - 60:
+            break
+        dibujo.text((60, y), linea, fill=0, font=fuente)
+        y += 30
+    imagen.save(ruta, format='PNG', optimize=False)
+
+# Genera el corpus en la carpeta indicada y devuelve las rutas por formato.
+# Con la misma semilla se obtienen los mismos CV, por lo que los archivos de un corpus
+# generado con los mismos parámetros se reutilizan
+def generar_corpus(carpeta, cantidad, formatos=FORMATOS, palabras=400, densidad=0.1, semilla=0):
+    aleatorio = random.Random(semilla)
+    # Las páginas usan su propia secuencia, para que los textos sean los mismos que sin variar las páginas
+    aleatorio_paginas = random.Random(f"{semilla}-paginas")
+    habilidades = frases_habilidades()
+    os.makedirs(carpeta, exist_ok=True)
+
+    parametros = {'palabras': palabras, 'densidad': densidad, 'semilla': semilla, 'paginas_pdf': PAGINAS_PDF}
+    ruta_parametros = os.path.join(carpeta, "corpus.json")
+    reutilizar = False
+    if os.path.exists(ruta_parametros):
+        with open(ruta_parametros, encoding='utf-8') as f:
+            reutilizar = json.load(f) == parametros
+
+    rutas = {formato: [] for formato in formatos}
+    for i in range(cantidad):
+        texto = generar_cv(aleatorio, habilidades, palabras, densidad)
+        paginas = aleatorio_paginas.choice(PAGINAS_PDF)
+        base = os.path.join(carpeta, f"cv_{i:05d}")
+        for formato in formatos:
+            ruta = f"{base}.{formato}"
+            rutas[formato].append(ruta)
+            if reutilizar and os.path.exists(ruta):
+                continue
+            if formato == 'txt':
+                with open(ruta, 'w', encoding='utf-8') as f:
+                    f.write(texto)
+            elif formato == 'pdf':
+                with open(ruta, 'wb') as f:
+                    f.write(texto_a_pdf(texto, paginas=paginas))
+            elif formato == 'docx':
+                texto_a_docx(texto, ruta)
+            else:
+                texto_a_png(texto, ruta)
+
+    with open(ruta_parametros, 'w', encoding='utf-8') as f:
+        json.dump(parametros, f)
+    return rutas
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un corpus de CV sintéticos en español (txt, PDF, DOCX y PNG)")
+    parser.add_argument("carpeta")
+    parser.add_argument("--cv", type=int, default=100, help="Cantidad de CV")
+    parser.add_argument("--formatos", nargs="+", choices=FORMATOS, default=FORMATOS)
+    parser.add_argument("--palabras", type=int, default=400, help="Palabras de texto libre por CV")
+    parser.add_argument("--densidad", type=float, default=0.1, help="Proporción de palabras que son habilidades técnicas")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    generar_corpus(args.carpeta, args.cv, args.formatos, args.palabras, args.densidad, args.semilla)
+    print(f"{args.cv} CV generados en {args.carpeta} ({', '.join(args.formatos)})")
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import hashlib
+import argparse
+import threading
+from metricas_utils import contar as contar_metrica
+
+cache_file_path = "cache/cv_cache.db"
+# Tamaño máximo de la caché en bytes (por defecto 512 MB)
+TAMANO_MAXIMO_CACHE = int(os.environ.get("CV_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Espacios de la caché
+ESPACIO_TEXTO = "texto"
+ESPACIO_DATOS = "datos"
+ESPACIO_HABILIDADES = "habilidades"
+
+# Contadores de aciertos y fallos del proceso actual
+estadisticas = {}
+
+def hash_bytes(datos):
+    return hashlib.sha256(datos).hexdigest()
+
+def hash_texto(texto, *versiones):
+    # Se normalizan los espacios para que cambios de formato no invaliden la caché
+    texto = ' '.join(texto.split())
+    contenido = '\x00'.join([texto, *[str(version) for version in versiones]])
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+# Una conexión por hilo y proceso, que se reutiliza entre consultas
+_local = threading.local()
+# Últimos accesos y aciertos/fallos pendientes de escribir; se guardan juntos cada ACCESOS_POR_ESCRITURA consultas
+ACCESOS_POR_ESCRITURA = 64
+_pendientes = {'accesos': {}, 'contadores': {}, 'consultas': 0}
+_bloqueo = threading.Lock()
+
+def _crear_tablas(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS entradas (
+            espacio TEXT NOT NULL,
+            clave TEXT NOT NULL,
+            valor TEXT NOT NULL,
+            tamano INTEGER NOT NULL,
+            ultimo_acceso REAL NOT NULL,
+            PRIMARY KEY (espacio, clave)
+        )
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_ultimo_acceso ON entradas (ultimo_acceso)")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS contadores (
+            espacio TEXT PRIMARY KEY,
+            aciertos INTEGER NOT NULL DEFAULT 0,
+            fallos INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # Tamaño total de las entradas, actualizado en cada inserción y borrado para no sumar la tabla completa
+    con.execute("CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor INTEGER NOT NULL)")
+    con.execute("INSERT OR IGNORE INTO meta (clave, valor) SELECT 'tamano_total', COALESCE(SUM(tamano), 0) FROM entradas")
+
+def _conectar():
+    con = getattr(_local, 'con', None)
+    # Los procesos hijos y los cambios de ruta abren su propia conexión
+    if con is not None and _local.pid == os.getpid():
+        if _local.ruta == cache_file_path:
+            return con
+        con.close()
+
+    directorio = os.path.dirname(cache_file_path)
+    if directorio and not os.path.exists(directorio):
+        os.makedirs(directorio)
+
+    con = sqlite3.connect(cache_file_path, timeout=30)
+    with con:
+        _crear_tablas(con)
+    _local.con, _local.pid, _local.ruta = con, os.getpid(), cache_file_path
+    return con
+
+def _contar(espacio, acierto):
+    contador = estadisticas.setdefault(espacio, {'aciertos': 0, 'fallos': 0})
+    columna = 'aciertos' if acierto else 'fallos'
+    contador[columna] += 1
+    contar_metrica(f"cache_{columna}", espacio=espacio)
+    pendiente = _pendientes['contadores'].setdefault(espacio, {'aciertos': 0, 'fallos': 0})
+    pendiente[columna] += 1
+
+# Escribe en una sola transacción los últimos accesos (para la política LRU) y los contadores pendientes
+def guardar_accesos():
+    with _bloqueo:
+        accesos, contadores = _pendientes['accesos'], _pendientes['contadores']
+        _pendientes.update({'accesos': {}, 'contadores': {}, 'consultas': 0})
+    if not accesos and not contadores:
+        return
+    with _conectar() as con:
+        con.executemany("UPDATE entradas SET ultimo_acceso = MAX(ultimo_acceso, ?) WHERE espacio = ? AND clave = ?",
+                        [(instante, espacio, clave) for (espacio, clave), instante in accesos.items()])
+        con.executemany("INSERT OR IGNORE INTO contadores (espacio) VALUES (?)", [(espacio,) for espacio in contadores])
+        con.executemany("UPDATE contadores SET aciertos = aciertos + ?, fallos = fallos + ? WHERE espacio = ?",
+                        [(contador['aciertos'], contador['fallos'], espacio) for espacio, contador in contadores.items()])
+
+# Obtiene un valor de la caché, o None si no existe
+def obtener_cache(espacio, clave):
+    fila = _conectar().execute("SELECT valor FROM entradas WHERE espacio = ? AND clave = ?", (espacio, clave)).fetchone()
+    with _bloqueo:
+        _contar(espacio, fila is not None)
+        if fila is not None:
+            _pendientes['accesos'][(espacio, clave)] = time.time()
+        _pendientes['consultas'] += 1
+        escribir = _pendientes['consultas'] >= ACCESOS_POR_ESCRITURA
+    if escribir:
+        guardar_accesos()
+    return json.loads(fila[0]) if fila is not None else None
+
+def guardar_cache(espacio, clave, valor):
+    valor = json.dumps(valor, ensure_ascii=False)
+    tamano = len(valor.encode('utf-8'))
+    # Los accesos pendientes se escriben antes, para que el desalojo considere el uso reciente
+    guardar_accesos()
+    with _conectar() as con:
+        anterior = con.execute("SELECT tamano FROM entradas WHERE espacio = ? AND clave = ?", (espacio, clave)).fetchone()
+        con.execute(
+            "INSERT OR REPLACE INTO entradas (espacio, clave, valor, tamano, ultimo_acceso) VALUES (?, ?, ?, ?, ?)",
+            (espacio, clave, valor, tamano, time.time())
+        )
+        _sumar_tamano(con, tamano - (anterior[0] if anterior else 0))
+        _desalojar(con)
+
+def _sumar_tamano(con, diferencia):
+    con.execute("UPDATE meta SET valor = valor + ? WHERE clave = 'tamano_total'", (diferencia,))
+
+# Elimina las entradas usadas hace más tiempo hasta respetar el tamaño máximo
+def _desalojar(con):
+    total = con.execute("SELECT valor FROM meta WHERE clave = 'tamano_total'").fetchone()[0]
+    if total <= TAMANO_MAXIMO_CACHE:
+        return
+
+    filas = con.execute("SELECT espacio, clave, tamano FROM entradas ORDER BY ultimo_acceso ASC")
+    desalojadas = []
+    liberado = 0
+    for espacio, clave, tamano in filas:
+        if total - liberado <= TAMANO_MAXIMO_CACHE:
+            break
+        desalojadas.append((espacio, clave))
+        liberado += tamano
+    con.executemany("DELETE FROM entradas WHERE espacio = ? AND clave = ?", desalojadas)
+    _sumar_tamano(con, -liberado)
+
+# Borra la caché completa o solo un espacio
+def invalidar_cache(espacio=None):
+    guardar_accesos()
+    with _conectar() as con:
+        if espacio is None:
+            con.execute("DELETE FROM entradas")
+            con.execute("DELETE FROM contadores")
+        else:
+            con.execute("DELETE FROM entradas WHERE espacio = ?", (espacio,))
+            con.execute("DELETE FROM contadores WHERE espacio = ?", (espacio,))
+        con.execute("UPDATE meta SET valor = (SELECT COALESCE(SUM(tamano), 0) FROM entradas) WHERE clave = 'tamano_total'")
+    if espacio is None:
+        estadisticas.clear()
+    else:
+        estadisticas.pop(espacio, None)
+
+def obtener_estadisticas():
+    guardar_accesos()
+    with _conectar() as con:
+        entradas = con.execute("SELECT espacio, COUNT(*), SUM(tamano) FROM entradas GROUP BY espacio").fetchall()
+        contadores = con.execute("SELECT espacio, aciertos, fallos FROM contadores").fetchall()
+
+    resumen = {}
+    for espacio, cantidad, tamano in entradas:
+        resumen[espacio] = {'entradas': cantidad, 'bytes': tamano, 'aciertos': 0, 'fallos': 0}
+    for espacio, aciertos, fallos in contadores:
+        resumen.setdefault(espacio, {'entradas': 0, 'bytes': 0})
+        resumen[espacio].update({'aciertos': aciertos, 'fallos': fallos})
+    return resumen
+
+# Los accesos que quedaron pendientes se escriben al terminar el proceso
+atexit.register(guardar_accesos)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Administración de la caché de extracción de CV")
+    parser.add_argument("--invalidar", nargs="?", const="todo", metavar="ESPACIO",
+                        help="Borra la caché completa o solo el espacio indicado (texto, datos, habilidades)")
+    parser.add_argument("--estadisticas", action="store_true", help="Muestra entradas, tamaño y aciertos/fallos")
+    args = parser.parse_args()
+
+    if args.invalidar:
+        invalidar_cache(None if args.invalidar == "todo" else args.invalidar)
+        print("Caché invalidada")
+    if args.estadisticas or not args.invalidar:
+        print(json.dumps(obtener_estadisticas(), indent=2))
@@ -1,23 +1,27 @@
+import os
 import pandas as pd
 import streamlit as st
 from unidecode import unidecode
 from ast import literal_eval
 from collections import Counter
-from wordcloud import WordCloud
 from io import BytesIO
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from sklearn.feature_extraction.text import CountVectorizer
 import plotly.express as px
-import matplotlib.pyplot as plt
-import spacy
+from skills_utils import extraer_habilidades_por_fila
 import re
-import os
-import nltk
-
-result_file_path = "export/cv_datas.csv"
-nltk.download('stopwords')
-nltk.download('wordnet')
+import string
+from functools import lru_cache
+import store_utils
+from indice_utils import construir_indices, filtrar_candidatos, MODO_CUALQUIERA, MODO_TODAS, MODO_MINIMO
+from ranking_utils import MotorRanking
+from metricas_utils import medir_etapa, ETAPA_DATASET
+from figuras_utils import obtener_figura, huella_figura, limpiar_figuras
+
+# Datos de NLTK en una carpeta local. No se descargan al importar el módulo: la primera vez que se
+# necesitan se buscan en esta carpeta (y en las rutas de NLTK) y solo si faltan se intenta descargarlos
+nltk_data_path = os.environ.get("CV_NLTK_DATA", "cache/nltk_data")
+# Con CV_OFFLINE=1 nunca se descargan; sin los datos se omiten las stopwords y la lematización
+NLTK_SIN_CONEXION = os.environ.get("CV_OFFLINE", "0") == "1"
+RECURSOS_NLTK = {'stopwords': 'corpora/stopwords', 'wordnet': 'corpora/wordnet'}
 
 def procesar_formato_datos(df):
     # Convertir todas los datos a minúsculas
@@ -38,66 +42,128 @@ def procesar_formato_datos(df):
 
     return df
 
-def extraer_habilidades_certificados(certificaciones):
-    # Cargar el modelo de lenguaje de SpaCy con el entity_ruler
-    nlp = spacy.load("model_skills")
-
-    habilidades_certificados = []
-    for certificacion in certificaciones:
-        doc = nlp(certificacion)
-        for ent in doc.ents:
-            if ent.label_ == 'SKILLS':
-                habilidades_certificados.append(ent.text)
-    return habilidades_certificados
+# Devuelve True si el recurso de NLTK está disponible en la carpeta local o en las rutas de NLTK
+@lru_cache(maxsize=None)
+def cargar_recurso_nltk(nombre):
+    import nltk
+    if nltk_data_path not in nltk.data.path:
+        nltk.data.path.insert(0, nltk_data_path)
+    try:
+        nltk.data.find(RECURSOS_NLTK[nombre])
+        return True
+    except LookupError:
+        pass
+    if NLTK_SIN_CONEXION:
+        return False
+    try:
+        return bool(nltk.download(nombre, download_dir=nltk_data_path, quiet=True, raise_on_error=True))
+    except Exception as e:
+        print(f"No se pudo descargar el recurso {nombre} de NLTK: {e}")
+        return False
+
+# Stopwords en español, se cargan una sola vez
+@lru_cache(maxsize=None)
+def obtener_stopwords():
+    if not cargar_recurso_nltk('stopwords'):
+        return frozenset()
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words('spanish'))
+
+# Lematizador de WordNet, o None si los datos no están disponibles
+@lru_cache(maxsize=None)
+def obtener_lematizador():
+    if not cargar_recurso_nltk('wordnet'):
+        return None
+    from nltk.stem import WordNetLemmatizer
+    return WordNetLemmatizer()
+
+# Tabla de lemas en memoria, cada palabra se lematiza una sola vez
+@lru_cache(maxsize=None)
+def lematizar(palabra):
+    lematizador = obtener_lematizador()
+    return lematizador.lemmatize(palabra) if lematizador is not None else palabra
 
 def normalizar_palabras(lista_frases):
-    lemmatizer = WordNetLemmatizer()
+    stopwords_es = obtener_stopwords()
     
-    # Aplicar lematización y filtrar palabras con menos de 4 caracteres
-    palabras = [palabra.lower() for frase in lista_frases for palabra in frase.split() if len(palabra) >= 6 and palabra.lower() not in stopwords.words('spanish')]
-    lemas = [lemmatizer.lemmatize(palabra) for palabra in palabras]
+    # Aplicar lematización y filtrar palabras con menos de 6 caracteres
+    palabras = [palabra.lower() for frase in lista_frases for palabra in frase.split() if len(palabra) >= 6 and palabra.lower() not in stopwords_es]
+    lemas = [lematizar(palabra) for palabra in palabras]
     
     return ' '.join(lemas)
 
-def extraer_habilidades_blandas(df):
-    # Aplicar la función a la columna 'Texto'
-    df['habilidades_blandas_lematizadas'] = df['habilidades_blandas'].apply(normalizar_palabras)
+# Versión vectorizada de normalizar_palabras para toda la columna de habilidades blandas
+def normalizar_habilidades_blandas(columna):
+    frases = columna.explode().dropna()
+    if frases.empty:
+        return pd.Series('', index=columna.index)
+
+    palabras = frases.astype(str).str.split().explode().dropna()
+    palabras = palabras[palabras.str.len() >= 6].str.lower()
+    palabras = palabras[~palabras.isin(obtener_stopwords())]
+
+    unicas = palabras.unique()
+    lemas = palabras.map(dict(zip(unicas, map(lematizar, unicas))))
+    return lemas.groupby(level=0).agg(' '.join).reindex(columna.index, fill_value='')
+
+# Tabla de frecuencias de las habilidades blandas lematizadas, para la nube de palabras
+def calcular_frecuencias_blandas(df):
+    palabras = df['habilidades_blandas_lematizadas'].str.split().explode().dropna()
+    palabras = palabras.str.strip(string.punctuation)
+    return palabras[palabras != ''].value_counts().to_dict()
+
+# Nube de palabras como imagen PNG
+def nube_a_png(wordcloud):
+    img_bytes = BytesIO()
+    wordcloud.to_image().save(img_bytes, format='PNG')
+    return img_bytes.getvalue()
+
+def nube_habilidades_blandas(frecuencias):
+    from wordcloud import WordCloud
+
+    # Crear la nube de palabras a partir de las frecuencias precalculadas
+    return nube_a_png(WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(frecuencias))
 
-    # Concatenar todas las habilidades blandas lematizadas en un solo texto
-    text = ' '.join(df['habilidades_blandas_lematizadas'])
+# clave identifica los datos del gráfico en la caché de figuras (None para no usar la caché)
+def extraer_habilidades_blandas(df, frecuencias=None, clave=None):
+    if frecuencias is None:
+        if 'habilidades_blandas_lematizadas' not in df:
+            df['habilidades_blandas_lematizadas'] = normalizar_habilidades_blandas(df['habilidades_blandas'])
+        frecuencias = calcular_frecuencias_blandas(df)
 
-    # Crear la nube de palabras
-    wordcloud = WordCloud(width=800, height=400, background_color='white').generate(text)
+    if not frecuencias:
+        st.warning("No hay habilidades blandas para mostrar")
+        return
 
     # Mostrar la nube de palabras
-    plt.figure(figsize=(10, 5))
-    plt.imshow(wordcloud, interpolation='bilinear')
-    plt.axis('off')
-    plt.title('Nube de Palabras de Habilidades Blandas')
-    st.pyplot(plt)
+    imagen = obtener_figura('habilidades_blandas', clave, lambda: nube_habilidades_blandas(frecuencias))
+    st.image(imagen, caption='Nube de Palabras de Habilidades Blandas')
 
 def procesar_columnas(df):
     # Columnas a enlistar
     columns_to_process = ['telefono', 'email', 'idiomas_que_habla', 'certificados', 'habilidades_blandas', 'titulo_actual_o_al_egresar', 'universidad_o_instituto', 'anno_de_termino_de_estudios', 'cargo_experiencia_laboral', 'empresa_en_la_que_trabajo', 'nivel_de_idioma', 'URL']
-    # Función para manejar NaN y enlistar
+    # Función para manejar NaN y enlistar, sin elementos vacíos
     for column in columns_to_process:
-        df[column] = df[column].apply(lambda x: [] if pd.isna(x) else [data.strip() for data in x.split(',')] if isinstance(x, str) else [])
+        df[column] = df[column].apply(lambda x: [data.strip() for data in x.split(',') if data.strip()] if isinstance(x, str) else [])
 
-    df['habilidades_certificados'] = df['certificados'].apply(extraer_habilidades_certificados)
+    # Todos los certificados se procesan en un solo lote con nlp.pipe
+    df['habilidades_certificados'] = extraer_habilidades_por_fila(df['certificados'].tolist())
     return df
 
 def procesar_habilidades_tecnicas(df):
-    # Convertir la cadena de lista a una lista de Python
+    # Convertir la cadena de lista a una lista de Python (el almacén Parquet ya entrega listas)
     df['habilidades_tecnicas'] = df['habilidades_tecnicas'].apply(lambda x: literal_eval(x) if isinstance(x, str) else x)
+    # Las listas no pasan por el formato a minúsculas de procesar_formato_datos
+    df['habilidades_tecnicas'] = df['habilidades_tecnicas'].apply(lambda x: [habilidad.lower() for habilidad in x])
     return df
 
 def calcular_frecuencia(df):
-    # Explode y calcular para las columnas relevantes
+    # Explode y calcular para las columnas relevantes, por candidato (dos postulantes pueden tener el mismo nombre)
     columns_to_explode = ['idiomas_que_habla', 'certificados', 'habilidades_blandas', 'habilidades_tecnicas']
     for column in columns_to_explode:
         df_exploded = df.explode(column).dropna(subset=[column])
-        count_column = df_exploded.groupby('nombres').size()
-        df = df.join(count_column.rename(f'cantidad_{column}'), on='nombres').fillna({f'cantidad_{column}': 0})
+        count_column = df_exploded.groupby('id_candidato').size()
+        df = df.join(count_column.rename(f'cantidad_{column}'), on='id_candidato').fillna({f'cantidad_{column}': 0})
     
     return df
 
@@ -105,17 +171,18 @@ def quitar_datos_no_deseado(lista_idiomas):
     idiomas_a_ignorar = ['sin informacion', 'espanol', 'chileno']
     return [idioma for idioma in lista_idiomas if idioma.lower() not in idiomas_a_ignorar]
 
-def filtrar_idiomas(df):
-    # Filtrar datos no deseados y NaN
-    df['idiomas_que_habla'] = df['idiomas_que_habla'].apply(quitar_datos_no_deseado)
+def filtrar_idiomas(indices):
+    # Obtener todos los idiomas únicos desde el índice (los datos no deseados se quitan en preparar_df)
+    return indices['idiomas'].valores()
 
-    # Obtener todos los idiomas únicos después de la limpieza
-    todos_idiomas = sorted(set(idioma for sublist in df['idiomas_que_habla'] for idioma in sublist))
+MODOS_FILTRADO = {
+    MODO_CUALQUIERA: 'Cualquiera de las seleccionadas',
+    MODO_TODAS: 'Todas las seleccionadas',
+    MODO_MINIMO: 'Una cantidad mínima'
+}
 
-    return todos_idiomas
-
-def obtener_filtros_postulante(df):
-    idiomas_seleccionados = filtrar_idiomas(df)
+def obtener_filtros_postulante(indices):
+    idiomas_seleccionados = filtrar_idiomas(indices)
 
     # Establecer el ancho deseado para la barra lateral
     st.markdown(
@@ -131,25 +198,32 @@ def obtener_filtros_postulante(df):
 
     st.sidebar.title('Filtrado de candidatos')
     
-    unique_skills = df['habilidades_tecnicas'].explode().unique()
-    non_nan_skills = [skill for skill in unique_skills if pd.notna(skill)]
-    sorted_skills = sorted(non_nan_skills)
+    # Las opciones y la cantidad de postulantes por opción vienen del índice
+    sorted_skills = indices['habilidades'].valores()
 
     # Sidebar con el menú de habilidades
-    selected_skills = st.sidebar.multiselect('Selecciona habilidades técnicas', sorted_skills)
+    selected_skills = st.sidebar.multiselect('Selecciona habilidades técnicas', sorted_skills,
+                                             format_func=lambda skill: f"{skill} ({indices['habilidades'].conteo(skill)})")
     # Sidebar con el menú de idiomas
-    selected_languages = st.sidebar.multiselect('Selecciona idiomas', idiomas_seleccionados)
+    selected_languages = st.sidebar.multiselect('Selecciona idiomas', idiomas_seleccionados,
+                                                format_func=lambda idioma: f"{idioma} ({indices['idiomas'].conteo(idioma)})")
+
+    # Sidebar con el modo de coincidencia
+    modo = st.sidebar.radio('Candidatos que cumplan con', list(MODOS_FILTRADO), format_func=MODOS_FILTRADO.get)
+    minimo = 1
+    if modo == MODO_MINIMO:
+        minimo = st.sidebar.number_input('Cantidad mínima de coincidencias', min_value=1,
+                                         max_value=max(1, len(selected_skills) + len(selected_languages)), value=1)
 
-    return selected_skills, selected_languages
+    return selected_skills, selected_languages, modo, minimo
 
-def aplicar_filtrado(df, selected_skills, selected_languages):
+def aplicar_filtrado(df, selected_skills, selected_languages, indices=None, modo=MODO_CUALQUIERA, minimo=1):
     # Lógica de filtrado
     if selected_skills or selected_languages:
-        # Filtrar el DataFrame según habilidades o idiomas seleccionados
-        filtered_df = df[
-            ((df['habilidades_tecnicas'].apply(lambda skills: any(skill in selected_skills for skill in skills)) if selected_skills else False)
-            | (df['idiomas_que_habla'].apply(lambda languages: any(language in selected_languages for language in languages)) if selected_languages else False))
-        ]
+        # Filtrar el DataFrame según habilidades o idiomas seleccionados, usando el índice invertido
+        indices = indices or construir_indices(df)
+        posiciones = filtrar_candidatos(indices, selected_skills, selected_languages, modo, minimo)
+        filtered_df = df.iloc[posiciones]
     else:
         # Si no se selecciona ningún filtro, mostrar todos los datos
         filtered_df = df
@@ -157,10 +231,6 @@ def aplicar_filtrado(df, selected_skills, selected_languages):
     return filtered_df
 
 def reorganizar_dataframe(filtered_df, selected_skills, df):
-    # Crear una columna con las habilidades únicas
-    filtered_df['habilidades_tecnicas_unicas'] = df['habilidades_tecnicas'].apply(lambda x: list(set(x)))
-    df['habilidades_tecnicas_unicas'] = df['habilidades_tecnicas'].apply(lambda x: list(set(x)))
-
     # Cuenta la frecuencia de cada habilidad para cada postulante
     for habilidad in selected_skills:
         filtered_df[habilidad] = df['habilidades_tecnicas'].apply(lambda x: Counter(x)[habilidad] if isinstance(x, list) else 0)
@@ -183,7 +253,7 @@ def extraer_anno_egreso(texto):
 def contar_elementos(lista):
     return len(lista)
 
-def grafico_idiomas(df_filtrado):
+def figura_idiomas(df_filtrado):
     df_exploded = df_filtrado.explode('idiomas_que_habla')
     df_exploded = df_exploded[~df_exploded['idiomas_que_habla'].isna()]
     idiomas_seleccionados = sorted(df_exploded['idiomas_que_habla'].unique())
@@ -201,18 +271,25 @@ def grafico_idiomas(df_filtrado):
 
     # Configurar diseño
     fig_idiomas.update_layout(barmode='stack', width=600)
+    return fig_idiomas
+
+def grafico_idiomas(df_filtrado, clave=None):
     # Mostrar el gráfico interactivo en Streamlit
-    st.plotly_chart(fig_idiomas)
+    st.plotly_chart(obtener_figura('idiomas', clave, lambda: figura_idiomas(df_filtrado)))
+
+def nube_habilidades_tecnicas(df_filtrado):
+    from wordcloud import WordCloud
 
-def generar_nube_palabras(df_filtrado):
     all_skills = [skill.lower() for sublist in df_filtrado['habilidades_tecnicas_unicas'] for skill in sublist]
     text = ' '.join(all_skills)
-    wordcloud = WordCloud(width=600, height=400, background_color='white').generate(text)
-    img_bytes = BytesIO()
-    wordcloud.to_image().save(img_bytes, format='PNG')
-    st.image(img_bytes, caption='Nube de palabras de habilidades técnicas de los postulantes')
+    return nube_a_png(WordCloud(width=600, height=400, background_color='white').generate(text))
+
+def generar_nube_palabras(df_filtrado, clave=None):
+    imagen = obtener_figura('habilidades_tecnicas', clave, lambda: nube_habilidades_tecnicas(df_filtrado))
+    st.image(imagen, caption='Nube de palabras de habilidades técnicas de los postulantes')
 
-def grafico_certificados(df_filtrado, habilidades_seleccionadas):
+# Gráfico de certificaciones, o None si no hay certificaciones para las habilidades seleccionadas
+def figura_certificados(df_filtrado, habilidades_seleccionadas):
     df_exploded = df_filtrado.explode('habilidades_certificados')
     df_exploded = df_exploded[~df_exploded['habilidades_certificados'].isna()]
     df_exploded = df_exploded[df_exploded['habilidades_certificados'] != 'certificate']    # Filtrar el DataFrame según las habilidades seleccionadas
@@ -235,12 +312,18 @@ def grafico_certificados(df_filtrado, habilidades_seleccionadas):
 
         # Configurar diseño
         fig_certificados.update_layout(barmode='stack', width=600,yaxis=dict(tickmode='linear', tickformat='d'))
+        return fig_certificados
+    return None
+
+def grafico_certificados(df_filtrado, habilidades_seleccionadas, clave=None):
+    fig_certificados = obtener_figura('certificados', clave, lambda: figura_certificados(df_filtrado, habilidades_seleccionadas))
+    if fig_certificados is not None:
         # Mostrar el gráfico interactivo en Streamlit
         st.plotly_chart(fig_certificados)
     else:
         st.warning("No hay certificaciones para las habilidades seleccionadas")
 
-def grafico_radar_skills(df_long):
+def figura_radar_skills(df_long):
     # Crea el gráfico interactivo de radar con Plotly Express y asigna un color a cada postulante
     fig = px.line_polar(df_long, r='Frecuencia', theta='Habilidad', line_close=True,
                         range_r=[0, df_long['Frecuencia'].max()],
@@ -259,11 +342,15 @@ def grafico_radar_skills(df_long):
 
     # Configura el formato del eje radial como enteros
     fig.update_layout(polar=dict(radialaxis=dict(tickmode='linear', tickformat='d', visible=True)), showlegend=True)
+    return fig
 
+# df_long puede llegar como una función que lo calcula, para calcularlo solo si el gráfico no está en caché
+def grafico_radar_skills(df_long, clave=None):
+    fig = obtener_figura('radar', clave, lambda: figura_radar_skills(df_long() if callable(df_long) else df_long))
     # Muestra el gráfico
     st.plotly_chart(fig)
 
-def grafico_experiencia(df):
+def figura_experiencia(df):
     # Ordenar el DataFrame por la cantidad de experiencia en orden descendente
     df = df.sort_values(by='cantidad_experiencia', ascending=False)
 
@@ -273,8 +360,32 @@ def grafico_experiencia(df):
                 title='Experiencia Laboral de Empleados')
     # Configurar diseño
     fig.update_layout(barmode='stack', width=600)
+    return fig
+
+def grafico_experiencia(df, clave=None):
     # Mostrar el gráfico
-    st.plotly_chart(fig)
+    st.plotly_chart(obtener_figura('experiencia', clave, lambda: figura_experiencia(df)))
+
+def obtener_descripcion_cargo():
+    st.sidebar.title('Ranking de candidatos')
+    descripcion = st.sidebar.text_area('Descripción del cargo')
+    k = st.sidebar.number_input('Cantidad de candidatos', min_value=1, max_value=100, value=10)
+    return descripcion, k
+
+def mostrar_ranking(df, motor, descripcion, k):
+    # El motor puede llegar como una función que lo construye, para cargarlo solo con la primera consulta
+    if callable(motor):
+        motor = motor()
+    ranking = motor.rankear(descripcion, k)
+    if ranking.empty:
+        st.warning("La descripción del cargo no contiene habilidades ni idiomas de los postulantes")
+        return
+
+    # Aporte de cada habilidad o idioma de la descripción al puntaje del candidato
+    ranking.insert(0, 'nombres', df['nombres'].iloc[ranking.index].to_numpy())
+    ranking = ranking.rename(columns={'nombres': 'Nombres', 'puntaje': 'Puntaje', 'experiencia': 'Experiencia'})
+    st.write(f"Mejores {len(ranking)} candidatos para el cargo:")
+    st.dataframe(ranking.reset_index(drop=True).round(3))
 
 def mostrar_tabla_resultados(df_filtrado):
     columnas_mostrar = ['nombres','universidad_o_instituto','habilidades_tecnicas_unicas','habilidades_blandas','idiomas_que_habla','certificados','URL']
@@ -286,54 +397,145 @@ def mostrar_tabla_resultados(df_filtrado):
     st.write(print_df)
 
 def borrar_resultados():
-    if os.path.exists(result_file_path):
-        try:
-            os.remove(result_file_path)
-            st.experimental_rerun()
-        except Exception as e:
-            st.error(f"No se pudo borrar el archivo {result_file_path}. Error {e}")
-
-# Desglosar la lista de idiomas
-def procesar_df(df):
+    try:
+        store_utils.borrar_resultados()
+        limpiar_dataset_preparado()
+        st.experimental_rerun()
+    except Exception as e:
+        st.error(f"No se pudieron borrar los resultados en {store_utils.store_path}. Error {e}")
+
+# Genera la exportación solo cuando se solicita
+def exportar_resultados():
+    formato = st.sidebar.selectbox('Formato de exportación', store_utils.FORMATOS_EXPORTACION)
+    if st.sidebar.button("Generar exportación"):
+        st.session_state['exportacion'] = (formato, store_utils.exportar_resultados(formato))
+
+    if 'exportacion' in st.session_state:
+        formato, datos = st.session_state['exportacion']
+        st.sidebar.download_button(f"Descargar cv_datas.{formato}", datos, file_name=f"cv_datas.{formato}")
+
+# Pasos que no dependen de los filtros, se calculan una sola vez por conjunto de resultados.
+# Todos los pasos son por fila, por lo que los resultados se pueden preparar por partes y unir.
+# prefijo distingue los ids que se asignan a las filas sin id_candidato en cada parte
+def preparar_df(df, prefijo='fila'):
+    with medir_etapa(ETAPA_DATASET, documentos=len(df)):
+        return _preparar_df(df, prefijo)
+
+# Un candidato que envió su CV varias veces (o casi igual, o en PDF y DOCX) se cuenta una sola vez,
+# con su último envío. Los resultados anteriores al id_candidato se consideran todos distintos
+def quitar_duplicados(df, prefijo='fila'):
+    ids = df['id_candidato'] if 'id_candidato' in df else pd.Series(None, index=df.index, dtype=object)
+    df = df.assign(id_candidato=ids.fillna(pd.Series([f"{prefijo}-{i}" for i in range(len(df))], index=df.index)))
+    return df.drop_duplicates('id_candidato', keep='last').reset_index(drop=True)
+
+# Une resultados ya preparados, en orden de envío, con el último envío de cada candidato
+def unir_preparados(partes):
+    return quitar_duplicados(pd.concat(partes, ignore_index=True))
+
+def _preparar_df(df, prefijo='fila'):
+    df = quitar_duplicados(df, prefijo)
     df = procesar_formato_datos(df)
     df = procesar_columnas(df)
     df = procesar_habilidades_tecnicas(df)
     # Aplicar la función a la columna del DataFrame
     df['solo_annos'] = df['anno_de_termino_de_estudios'].apply(extraer_anno_egreso)
-    annos = ['nombres','anno_de_termino_de_estudios','solo_annos']
     # Reemplazar valores vacíos con NaN
-    df['solo_annos'].replace('', pd.NA, inplace=True)
+    df['solo_annos'] = df['solo_annos'].replace('', pd.NA)
     # Aplicar la función a la columna 'experiencia_laboral'
     df['cantidad_experiencia'] = df['cargo_experiencia_laboral'].apply(contar_elementos)
-    
+
     df = calcular_frecuencia(df)
+    # Filtrar idiomas no deseados
+    df['idiomas_que_habla'] = df['idiomas_que_habla'].apply(quitar_datos_no_deseado)
+    # Crear una columna con las habilidades únicas
+    df['habilidades_tecnicas_unicas'] = df['habilidades_tecnicas'].apply(lambda x: list(set(x)))
+    # Normalizar las habilidades blandas para la nube de palabras
+    df['habilidades_blandas_lematizadas'] = normalizar_habilidades_blandas(df['habilidades_blandas'])
+    return df
+
+# Resultados preparados de un archivo del almacén. Los archivos no cambian una vez escritos, por lo
+# que al agregar CV solo se preparan los archivos nuevos (el estado cambia si un archivo se reescribe)
+@st.cache_resource(show_spinner=False)
+def cargar_parte_preparada(ruta, estado):
+    return preparar_df(store_utils.cargar_parte(ruta), prefijo=os.path.basename(ruta))
+
+# Resultados preparados en memoria, la clave es la huella del almacén,
+# por lo que cambia automáticamente cuando se agregan o borran resultados
+@st.cache_resource(max_entries=2, show_spinner="Preparando resultados...")
+def cargar_dataset_preparado(huella):
+    partes = [cargar_parte_preparada(ruta, estado) for ruta, estado in store_utils.estado_partes()]
+    if not partes:
+        return preparar_df(store_utils.cargar_resultados())
+    return unir_preparados(partes)
+
+@st.cache_resource(max_entries=2)
+def cargar_indices(huella):
+    return construir_indices(cargar_dataset_preparado(huella))
+
+@st.cache_resource(max_entries=2)
+def cargar_motor_ranking(huella):
+    return MotorRanking(cargar_dataset_preparado(huella))
+
+@st.cache_resource(max_entries=2)
+def cargar_frecuencias_blandas(huella):
+    return calcular_frecuencias_blandas(cargar_dataset_preparado(huella))
+
+def limpiar_dataset_preparado():
+    cargar_parte_preparada.clear()
+    cargar_dataset_preparado.clear()
+    cargar_indices.clear()
+    cargar_motor_ranking.clear()
+    cargar_frecuencias_blandas.clear()
+    limpiar_figuras()
+
+# Desglosar la lista de idiomas
+def procesar_df(df):
+    mostrar_dashboard(preparar_df(df))
+
+# Pasos que dependen de los filtros, se ejecutan en cada interacción. Con la huella de los resultados,
+# los gráficos se guardan en la caché de figuras según los candidatos filtrados y las habilidades
+# seleccionadas, y solo se vuelven a construir cuando estos cambian
+def mostrar_dashboard(df, indices=None, frecuencias_blandas=None, motor=None, huella=None):
+    # Copia superficial para no modificar el DataFrame en caché
+    df = df.copy(deep=False)
+    indices = indices or construir_indices(df)
+    motor = motor or (lambda: MotorRanking(df))
     # st.dataframe(df)
     col1, col2 = st.columns(2)
 
-    selected_skills, selected_languages = obtener_filtros_postulante(df)
-    filtered_df = aplicar_filtrado(df, selected_skills, selected_languages)
+    selected_skills, selected_languages, modo, minimo = obtener_filtros_postulante(indices)
+    filtered_df = aplicar_filtrado(df, selected_skills, selected_languages, indices, modo, minimo)
+
+    clave_filtrado = clave_habilidades = clave_resultados = None
+    if huella is not None:
+        candidatos = filtered_df['id_candidato'].tolist()
+        clave_filtrado = huella_figura(huella, candidatos)
+        clave_habilidades = huella_figura(huella, candidatos, selected_skills)
+        clave_resultados = huella_figura(huella)
 
-    df_long = reorganizar_dataframe(filtered_df,selected_skills,df)
+    descripcion, k = obtener_descripcion_cargo()
+    if descripcion.strip():
+        mostrar_ranking(df, motor, descripcion, k)
 
     with col1:
         with st.container():
-            grafico_idiomas(filtered_df)
+            grafico_idiomas(filtered_df, clave_filtrado)
         with st.container():
-            grafico_certificados(filtered_df,selected_skills)
+            grafico_certificados(filtered_df,selected_skills, clave_habilidades)
         with st.container():
-            grafico_experiencia(filtered_df)
+            grafico_experiencia(filtered_df, clave_filtrado)
 
     with col2:
         with st.container():
             # Agrega una condición para mostrar el gráfico de radar solo cuando se seleccionan 3 habilidades
-            generar_nube_palabras(filtered_df)
+            generar_nube_palabras(filtered_df, clave_filtrado)
         with st.container():
             if len(selected_skills) >= 3:
-                grafico_radar_skills(df_long)
+                grafico_radar_skills(lambda: reorganizar_dataframe(filtered_df,selected_skills,df), clave_habilidades)
             else:
                 st.warning("Selecciona más 3 habilidades técnicas para mostrar el gráfico de radar.")
         with st.container():
-            extraer_habilidades_blandas(df)
+            extraer_habilidades_blandas(df, frecuencias_blandas, clave_resultados)
 
     mostrar_tabla_resultados(filtered_df)
 
@@ -341,5 +543,6 @@ def procesar_df(df):
         f'<style>div.stButton button[data-baseweb="button"] {{background-color: red; color: white;}}</style>',
         unsafe_allow_html=True
     )
+    exportar_resultados()
     if st.sidebar.button("Borrar Resultados"):
         borrar_resultados()
\ No newline at end of file
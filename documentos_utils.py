@@ -0,0 +1,289 @@
+import os
+import time
+import tempfile
+import itertools
+import multiprocessing
+from io import BytesIO, StringIO
+from collections import deque
+from multiprocessing.connection import wait
+from metricas_utils import contar
+
+try:
+    # Solo disponible en sistemas POSIX, en Windows no se limita la memoria
+    import resource
+except ImportError:
+    resource = None
+
+# Cantidad de procesos de extracción simultáneos (documentos o grupos de páginas de un PDF)
+DOC_WORKERS = int(os.environ.get("CV_DOC_WORKERS", os.cpu_count() or 1))
+# Tiempo máximo de extracción por proceso, en segundos
+DOC_TIMEOUT = float(os.environ.get("CV_DOC_TIMEOUT", 60))
+# Memoria máxima por proceso, en MB (0 para no limitar)
+DOC_MEMORIA_MAXIMA = int(os.environ.get("CV_DOC_MEMORIA_MB", 1024))
+# Páginas que se leen como máximo de cada PDF
+PDF_MAX_PAGINAS = int(os.environ.get("CV_PDF_MAX_PAGINAS", 10))
+# Páginas por proceso; las páginas de un PDF largo se extraen en paralelo
+PDF_PAGINAS_POR_TAREA = int(os.environ.get("CV_PDF_PAGINAS_TAREA", 2))
+# Una página con menos caracteres que este valor no tiene capa de texto y se envía a OCR
+PDF_MIN_CARACTERES = int(os.environ.get("CV_PDF_MIN_CARACTERES", 20))
+# Resolución con la que se rasterizan las páginas escaneadas
+PDF_DPI = int(os.environ.get("CV_PDF_DPI", 200))
+
+def _es_pdf(filename):
+    return filename.lower().endswith('.pdf')
+
+# PyMuPDF es opcional: sin él no se rasterizan las páginas escaneadas
+def _importar_fitz():
+    try:
+        import fitz
+        return fitz
+    except ImportError:
+        return None
+
+# Texto de un PDF en memoria. pdfminer.high_level.extract_text solo acepta rutas en la versión
+# fijada en environment.yml, por lo que el convertidor se arma directamente sobre los bytes
+def pdf_a_texto(contenido, page_numbers=None, maxpages=0):
+    from pdfminer.layout import LAParams
+    from pdfminer.converter import TextConverter
+    from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+    from pdfminer.pdfpage import PDFPage
+
+    with StringIO() as salida:
+        recursos = PDFResourceManager()
+        conversor = TextConverter(recursos, salida, laparams=LAParams())
+        interprete = PDFPageInterpreter(recursos, conversor)
+        for pagina in PDFPage.get_pages(BytesIO(contenido), page_numbers, maxpages=maxpages, check_extractable=True):
+            interprete.process_page(pagina)
+        conversor.close()
+        return salida.getvalue()
+
+# Importa la librería de extracción según el tipo de documento
+def _importar_extractor(filename):
+    if _es_pdf(filename):
+        import pdfminer.converter
+        import pdfminer.pdfpage
+        _importar_fitz()
+        return pdf_a_texto
+    import textract
+    return textract.process
+
+# Obtiene el texto de un documento a partir de sus bytes (en los PDF, solo las primeras PDF_MAX_PAGINAS)
+def documento_a_texto(filename, contenido):
+    if _es_pdf(filename):
+        return _importar_extractor(filename)(contenido, maxpages=PDF_MAX_PAGINAS)
+
+    # textract necesita una ruta, por lo que se escribe un archivo temporal
+    extension = os.path.splitext(filename)[1]
+    with tempfile.NamedTemporaryFile(suffix=extension, delete=False) as f:
+        f.write(contenido)
+    try:
+        return _importar_extractor(filename)(f.name).decode('utf-8')
+    finally:
+        os.remove(f.name)
+
+def contar_paginas(contenido):
+    fitz = _importar_fitz()
+    if fitz is not None:
+        with fitz.open(stream=contenido, filetype='pdf') as documento:
+            return documento.page_count
+    from pdfminer.pdfpage import PDFPage
+    return sum(1 for _ in PDFPage.get_pages(BytesIO(contenido)))
+
+# Extrae el texto de las páginas indicadas de un PDF y rasteriza a PNG las que no tienen capa de texto.
+# Las páginas que no existen en el PDF se omiten (el primer grupo se pide antes de conocer el total).
+# Devuelve {'paginas': [(página, texto, imagen o None)], 'total': páginas del PDF si contar es True}
+def extraer_paginas_pdf(contenido, paginas, contar_total=False):
+    total = contar_paginas(contenido)
+    paginas = [pagina for pagina in paginas if pagina < total]
+    if not paginas:
+        return {'paginas': [], 'total': total if contar_total else None}
+
+    # pdfminer separa las páginas con un salto de página
+    textos = pdf_a_texto(contenido, page_numbers=paginas).split('\x0c')
+    textos += [''] * (len(paginas) - len(textos))
+
+    escaneadas = [pagina for pagina, texto in zip(paginas, textos) if len(texto.strip()) < PDF_MIN_CARACTERES]
+    imagenes = {}
+    fitz = _importar_fitz()
+    if escaneadas and fitz is not None:
+        with fitz.open(stream=contenido, filetype='pdf') as documento:
+            for pagina in escaneadas:
+                if pagina < documento.page_count:
+                    imagenes[pagina] = documento[pagina].get_pixmap(dpi=PDF_DPI).tobytes('png')
+
+    return {
+        'paginas': [(pagina, texto, imagenes.get(pagina)) for pagina, texto in zip(paginas, textos)],
+        'total': total if contar_total else None
+    }
+
+# Se ejecuta en un proceso aislado por tarea
+def _extraer_en_proceso(filename, funcion, argumentos, conexion, memoria_maxima):
+    try:
+        # Las librerías se cargan antes de limitar la memoria del proceso
+        _importar_extractor(filename)
+        if resource is not None and memoria_maxima:
+            limite = memoria_maxima * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+        conexion.send((funcion(*argumentos), None))
+    except BaseException as e:
+        conexion.send((None, f"{type(e).__name__}: {e}"))
+    finally:
+        conexion.close()
+
+# Termina un proceso de extracción y lo espera; si no termina a tiempo se mata
+def _detener_proceso(proceso, espera=5):
+    proceso.terminate()
+    proceso.join(espera)
+    if proceso.is_alive():
+        proceso.kill()
+        proceso.join()
+
+def _grupos_paginas(inicio, fin, tamano=PDF_PAGINAS_POR_TAREA):
+    return [list(range(pagina, min(pagina + tamano, fin))) for pagina in range(inicio, fin, tamano)]
+
+# Texto de un PDF a partir de sus páginas (y del OCR de las escaneadas), en orden
+def _unir_paginas(paginas, textos_ocr=None):
+    textos_ocr = textos_ocr or {}
+    return '\n'.join(textos_ocr.get(pagina) or texto for pagina, (texto, _) in sorted(paginas.items()))
+
+def _sin_texto(text):
+    return text is not None and not text.strip()
+
+# Extrae los documentos en procesos separados y entrega (clave, nombre, texto, error) a medida que terminan.
+# Los PDF se reparten en grupos de páginas que se extraen en paralelo. Si se entrega reconocer (por ejemplo
+# ocr_utils.reconocer_imagenes), las páginas sin capa de texto se rasterizan y se envían a OCR apenas termina
+# su PDF; esos documentos se entregan al final, mientras el OCR avanza junto con el resto de la extracción.
+# Un proceso que supera el tiempo o la memoria máxima hace fallar a su documento sin detener al resto,
+# y un documento sin texto se reporta como error en lugar de entregarse vacío
+def extraer_documentos(documentos, workers=DOC_WORKERS, timeout=DOC_TIMEOUT, memoria_maxima=DOC_MEMORIA_MAXIMA, reconocer=None):
+    pendientes = iter(documentos)
+    quedan_pendientes = True
+    identificadores = itertools.count()
+    # Documentos en curso: id -> estado, y tareas listas para lanzar: (id, función, argumentos)
+    estados = {}
+    tareas = deque()
+    activos = {}
+    esperando_ocr = []
+
+    # Registra el resultado de una tarea y devuelve el estado del documento si ya terminó
+    def completar(identificador, resultado, error):
+        estado = estados[identificador]
+        estado['faltan'] -= 1
+        if estado['error'] is None:
+            if error is not None:
+                estado['error'] = error
+            elif not estado['pdf']:
+                estado['texto'] = resultado
+            else:
+                for pagina, texto, imagen in resultado['paginas']:
+                    estado['paginas'][pagina] = (texto, imagen)
+                if resultado['total'] is not None:
+                    # El primer grupo informa la cantidad de páginas y se agregan las tareas del resto
+                    for grupo in _grupos_paginas(PDF_PAGINAS_POR_TAREA, min(resultado['total'], PDF_MAX_PAGINAS)):
+                        tareas.append((identificador, extraer_paginas_pdf, (estado['contenido'], grupo)))
+                        estado['faltan'] += 1
+        if estado['faltan'] > 0:
+            return None
+        return estados.pop(identificador)
+
+    # Entrega el documento terminado, o lo deja esperando el OCR de sus páginas escaneadas
+    def terminar(estado):
+        if estado['error'] is not None:
+            return estado['clave'], estado['filename'], None, estado['error']
+        if not estado['pdf']:
+            text = estado['texto']
+        else:
+            escaneadas = {pagina: imagen for pagina, (_, imagen) in estado['paginas'].items() if imagen is not None}
+            contar('pdf_paginas', len(estado['paginas']))
+            if escaneadas and reconocer is not None:
+                contar('pdf_paginas_ocr', len(escaneadas))
+                esperando_ocr.append((estado, list(escaneadas), reconocer(list(escaneadas.values()))))
+                return None
+            text = _unir_paginas(estado['paginas'])
+        if _sin_texto(text):
+            return estado['clave'], estado['filename'], None, "El documento no tiene texto"
+        return estado['clave'], estado['filename'], text, None
+
+    try:
+        while quedan_pendientes or tareas or activos:
+            # Se lanzan procesos hasta completar la cantidad de workers, primero las páginas de los PDF en curso
+            while len(activos) < workers:
+                if not tareas:
+                    try:
+                        clave, filename, contenido = next(pendientes)
+                    except StopIteration:
+                        quedan_pendientes = False
+                        break
+                    identificador = next(identificadores)
+                    pdf = _es_pdf(filename)
+                    estados[identificador] = {'clave': clave, 'filename': filename, 'contenido': contenido, 'pdf': pdf,
+                                              'faltan': 1, 'error': None, 'texto': None, 'paginas': {}}
+                    if pdf:
+                        primeras = list(range(min(PDF_PAGINAS_POR_TAREA, PDF_MAX_PAGINAS)))
+                        tareas.append((identificador, extraer_paginas_pdf, (contenido, primeras, True)))
+                    else:
+                        tareas.append((identificador, documento_a_texto, (filename, contenido)))
+
+                identificador, funcion, argumentos = tareas.popleft()
+                filename = estados[identificador]['filename']
+                receptor, emisor = multiprocessing.Pipe(duplex=False)
+                proceso = multiprocessing.Process(target=_extraer_en_proceso, args=(filename, funcion, argumentos, emisor, memoria_maxima), daemon=True)
+                proceso.start()
+                emisor.close()
+                activos[receptor] = (proceso, identificador, time.monotonic())
+
+            if not activos:
+                break
+
+            # Se espera hasta que alguna tarea termine o venza el primer plazo
+            limite = min(inicio for _, _, inicio in activos.values()) + timeout
+            listos = wait(list(activos), timeout=max(0, limite - time.monotonic()))
+
+            terminados = []
+            for receptor in listos:
+                proceso, identificador, _ = activos.pop(receptor)
+                try:
+                    resultado, error = receptor.recv()
+                except EOFError:
+                    proceso.join()
+                    resultado, error = None, f"El proceso terminó inesperadamente (código {proceso.exitcode})"
+                receptor.close()
+                proceso.join()
+                terminados.append(completar(identificador, resultado, error))
+
+            ahora = time.monotonic()
+            for receptor, (proceso, identificador, inicio) in list(activos.items()):
+                if ahora - inicio >= timeout:
+                    _detener_proceso(proceso)
+                    receptor.close()
+                    del activos[receptor]
+                    terminados.append(completar(identificador, None, f"Tiempo de extracción excedido ({timeout:g} s)"))
+
+            for estado in terminados:
+                if estado is not None:
+                    entrega = terminar(estado)
+                    if entrega is not None:
+                        yield entrega
+
+        # Documentos con páginas escaneadas, en el orden en que se enviaron a OCR
+        for estado, paginas, resultados_ocr in esperando_ocr:
+            textos_ocr = {}
+            errores = []
+            for pagina, (text, error) in zip(paginas, resultados_ocr):
+                if error is None:
+                    textos_ocr[pagina] = text
+                else:
+                    errores.append(error)
+            text = _unir_paginas(estado['paginas'], textos_ocr)
+            if _sin_texto(text):
+                yield estado['clave'], estado['filename'], None, f"El documento no tiene texto{': ' + errores[0] if errores else ''}"
+            else:
+                yield estado['clave'], estado['filename'], text, None
+    finally:
+        # Si se deja de consumir el generador, se detienen los procesos activos
+        for receptor, (proceso, _, _) in activos.items():
+            proceso.terminate()
+            receptor.close()
+        # Se esperan, para que no queden como procesos zombi en un worker de larga duración
+        for proceso, _, _ in activos.values():
+            _detener_proceso(proceso)
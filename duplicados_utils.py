@@ -0,0 +1,133 @@
+import os
+import re
+import zlib
+import sqlite3
+import hashlib
+import argparse
+import numpy as np
+from unidecode import unidecode
+
+# Índice MinHash/LSH persistente para detectar CV casi iguales (el mismo CV con cambios menores, o en
+# PDF y en DOCX). Cada CV recibe un id de candidato estable: el del primer CV de su grupo.
+
+duplicados_path = "cache/duplicados.db"
+# Similitud de Jaccard estimada a partir de la cual dos CV se consideran el mismo
+DUPLICADOS_UMBRAL = float(os.environ.get("CV_DUPLICADOS_UMBRAL", 0.8))
+
+# Palabras por shingle
+TAMANO_SHINGLE = 5
+# Firma de 128 valores en 16 bandas de 8 filas: los pares con similitud sobre ~0.7 comparten
+# alguna banda con alta probabilidad, y solo esos candidatos se comparan
+NUM_PERMUTACIONES = 128
+BANDAS = 16
+FILAS_POR_BANDA = NUM_PERMUTACIONES // BANDAS
+PRIMO = (1 << 31) - 1
+
+# Coeficientes fijos de las permutaciones, para que las firmas sean comparables entre ejecuciones
+_aleatorio = np.random.RandomState(1729)
+_COEFICIENTES_A = _aleatorio.randint(1, PRIMO, NUM_PERMUTACIONES).astype(np.uint64)
+_COEFICIENTES_B = _aleatorio.randint(0, PRIMO, NUM_PERMUTACIONES).astype(np.uint64)
+# Módulo como uint64 para que las operaciones no se conviertan a punto flotante
+_MODULO = np.uint64(PRIMO)
+
+def shingles(texto, tamano=TAMANO_SHINGLE):
+    palabras = re.findall(r"\w+", unidecode(texto.lower()))
+    if len(palabras) <= tamano:
+        return {' '.join(palabras)} if palabras else set()
+    return {' '.join(palabras[i:i + tamano]) for i in range(len(palabras) - tamano + 1)}
+
+# Firma MinHash del texto, o None si no tiene palabras
+def firma_minhash(texto):
+    conjunto = shingles(texto)
+    if not conjunto:
+        return None
+    valores = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in conjunto), dtype=np.uint64, count=len(conjunto)) % _MODULO
+    # (a * x + b) mod p para todas las permutaciones a la vez; los productos caben en 64 bits
+    return ((valores[:, None] * _COEFICIENTES_A + _COEFICIENTES_B) % _MODULO).min(axis=0).astype(np.uint32)
+
+def similitud(firma, otra):
+    return float(np.mean(firma == otra))
+
+def claves_bandas(firma):
+    return [hashlib.blake2b(firma[i * FILAS_POR_BANDA:(i + 1) * FILAS_POR_BANDA].tobytes(), digest_size=8).hexdigest()
+            for i in range(BANDAS)]
+
+class IndiceDuplicados:
+    def __init__(self, ruta=duplicados_path, umbral=DUPLICADOS_UMBRAL):
+        directorio = os.path.dirname(ruta)
+        if directorio and not os.path.exists(directorio):
+            os.makedirs(directorio)
+        self.umbral = umbral
+        self.con = sqlite3.connect(ruta, timeout=30)
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS documentos (
+                clave TEXT PRIMARY KEY,
+                candidato TEXT NOT NULL,
+                clave_datos TEXT NOT NULL,
+                firma BLOB
+            )
+        """)
+        self.con.execute("CREATE TABLE IF NOT EXISTS bandas (banda INTEGER NOT NULL, valor TEXT NOT NULL, clave TEXT NOT NULL)")
+        self.con.execute("CREATE INDEX IF NOT EXISTS idx_bandas ON bandas (banda, valor)")
+
+    def cerrar(self):
+        self.con.close()
+
+    # Documentos que comparten alguna banda con la firma y superan el umbral, del más parecido al menos
+    def buscar(self, firma):
+        candidatos = set()
+        for banda, valor in enumerate(claves_bandas(firma)):
+            candidatos.update(clave for clave, in self.con.execute("SELECT clave FROM bandas WHERE banda = ? AND valor = ?", (banda, valor)))
+        parecidos = []
+        for clave in candidatos:
+            candidato, clave_datos, firma_guardada = self.con.execute(
+                "SELECT candidato, clave_datos, firma FROM documentos WHERE clave = ?", (clave,)).fetchone()
+            valor = similitud(firma, np.frombuffer(firma_guardada, dtype=np.uint32))
+            if valor >= self.umbral:
+                parecidos.append((valor, candidato, clave_datos))
+        return sorted(parecidos, reverse=True)
+
+    # Registra un CV y devuelve (id de candidato, clave de datos del CV casi igual ya registrado o None).
+    # clave_datos es la clave con la que se guardan en caché los datos extraídos de este CV
+    def registrar(self, texto, clave_datos):
+        clave = hashlib.sha256(' '.join(texto.split()).encode('utf-8')).hexdigest()
+        fila = self.con.execute("SELECT candidato FROM documentos WHERE clave = ?", (clave,)).fetchone()
+        if fila is not None:
+            # El mismo texto ya se registró; sus datos están en la caché con su propia clave
+            return fila[0], None
+
+        firma = firma_minhash(texto)
+        parecidos = self.buscar(firma) if firma is not None else []
+        if parecidos:
+            _, candidato, original = parecidos[0]
+        else:
+            candidato, original = f"cv-{clave[:16]}", None
+
+        # Otro worker puede registrar el mismo texto a la vez; en ese caso se usa el registro que quedó guardado
+        with self.con:
+            insertado = self.con.execute("INSERT OR IGNORE INTO documentos (clave, candidato, clave_datos, firma) VALUES (?, ?, ?, ?)",
+                                         (clave, candidato, clave_datos, firma.tobytes() if firma is not None else None)).rowcount
+            if insertado and firma is not None:
+                self.con.executemany("INSERT INTO bandas (banda, valor, clave) VALUES (?, ?, ?)",
+                                     [(banda, valor, clave) for banda, valor in enumerate(claves_bandas(firma))])
+        if not insertado:
+            return self.con.execute("SELECT candidato FROM documentos WHERE clave = ?", (clave,)).fetchone()[0], None
+        return candidato, original
+
+    def estadisticas(self):
+        documentos, candidatos = self.con.execute("SELECT COUNT(*), COUNT(DISTINCT candidato) FROM documentos").fetchone()
+        return {'documentos': documentos, 'candidatos': candidatos}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice de CV casi duplicados")
+    parser.add_argument("--borrar", action="store_true", help="Borra el índice; los ids de candidato se vuelven a asignar")
+    args = parser.parse_args()
+
+    if args.borrar:
+        if os.path.exists(duplicados_path):
+            os.remove(duplicados_path)
+        print("Índice de duplicados borrado")
+    else:
+        indice = IndiceDuplicados()
+        print(indice.estadisticas())
+        indice.cerrar()
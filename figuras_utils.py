@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from metricas_utils import contar
+
+# Caché en memoria de los gráficos del dashboard (figuras de Plotly y nubes de palabras ya codificadas
+# en PNG). La clave es una huella de los resultados, los candidatos filtrados y las habilidades
+# seleccionadas, por lo que al volver a dibujar el dashboard después de cambiar un control que no
+# afecta a un gráfico este no se vuelve a construir. Se eliminan primero las figuras menos usadas.
+
+# Memoria máxima de la caché, en MB
+FIGURAS_MEMORIA_MB = int(os.environ.get("CV_FIGURAS_MEMORIA_MB", 64))
+
+# Huella de los datos de los que depende un gráfico
+def huella_figura(*partes):
+    contenido = json.dumps(partes, default=list, ensure_ascii=False)
+    return hashlib.blake2b(contenido.encode('utf-8'), digest_size=16).hexdigest()
+
+# Tamaño aproximado en memoria de una figura
+def tamano_figura(valor):
+    if valor is None:
+        return 0
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    if hasattr(valor, 'to_json'):
+        # Figuras de Plotly: el tamaño de su JSON, que es lo que se envía al navegador
+        return len(valor.to_json())
+    return sys.getsizeof(valor)
+
+class CacheFiguras:
+    def __init__(self, memoria_maxima=FIGURAS_MEMORIA_MB * 1024 * 1024):
+        self.memoria_maxima = memoria_maxima
+        self.lock = threading.Lock()
+        self.entradas = OrderedDict()
+        self.memoria = 0
+
+    # Devuelve la figura de la clave, o la construye con construir() y la guarda.
+    # Con clave None la figura se construye siempre
+    def obtener(self, nombre, clave, construir):
+        if clave is None:
+            return construir()
+        clave = (nombre, clave)
+        with self.lock:
+            if clave in self.entradas:
+                self.entradas.move_to_end(clave)
+                contar('figuras_aciertos', figura=nombre)
+                return self.entradas[clave][0]
+
+        contar('figuras_fallos', figura=nombre)
+        valor = construir()
+        tamano = tamano_figura(valor)
+        if tamano > self.memoria_maxima:
+            return valor
+
+        with self.lock:
+            if clave in self.entradas:
+                self.memoria -= self.entradas.pop(clave)[1]
+            self.entradas[clave] = (valor, tamano)
+            self.memoria += tamano
+            while self.memoria > self.memoria_maxima:
+                _, (_, liberado) = self.entradas.popitem(last=False)
+                self.memoria -= liberado
+        return valor
+
+    def limpiar(self):
+        with self.lock:
+            self.entradas.clear()
+            self.memoria = 0
+
+    def estadisticas(self):
+        with self.lock:
+            return {'figuras': len(self.entradas), 'memoria': self.memoria, 'memoria_maxima': self.memoria_maxima}
+
+# Caché compartida por todas las sesiones del proceso
+figuras = CacheFiguras()
+
+def obtener_figura(nombre, clave, construir):
+    return figuras.obtener(nombre, clave, construir)
+
+def limpiar_figuras():
+    figuras.limpiar()
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+MODO_CUALQUIERA = 'o'
+MODO_TODAS = 'y'
+MODO_MINIMO = 'minimo'
+
+# Índice invertido valor -> posiciones (ordenadas) de las filas que lo contienen
+class IndiceInvertido:
+    def __init__(self, listas):
+        listas = [lista if isinstance(lista, (list, tuple, np.ndarray)) else [] for lista in listas]
+        self.cantidad_filas = len(listas)
+        self.posiciones = {}
+
+        largos = np.fromiter((len(lista) for lista in listas), dtype=np.int64, count=len(listas))
+        if largos.sum() == 0:
+            return
+
+        filas = np.repeat(np.arange(len(listas), dtype=np.int64), largos)
+        valores = pd.Series([valor for lista in listas for valor in lista], dtype=object)
+        validos = valores.notna().to_numpy()
+        codigos, unicos = pd.factorize(valores[validos])
+        filas = filas[validos]
+
+        # Pares (valor, fila) únicos y ordenados, un postulante cuenta una vez por valor
+        pares = np.unique(codigos.astype(np.int64) * len(listas) + filas)
+        codigos, filas = np.divmod(pares, len(listas))
+        cortes = np.flatnonzero(np.diff(codigos)) + 1
+        for codigo, posiciones in zip(codigos[np.r_[0, cortes]], np.split(filas, cortes)):
+            self.posiciones[unicos[codigo]] = posiciones
+
+    def valores(self):
+        return sorted(self.posiciones)
+
+    def conteo(self, valor):
+        return len(self.posiciones.get(valor, ()))
+
+    def buscar(self, valor):
+        return self.posiciones.get(valor, np.empty(0, dtype=np.int64))
+
+# Combina las posiciones de varios valores: cualquiera (O), todas (Y) o al menos un mínimo de coincidencias
+def combinar_posiciones(listas_posiciones, cantidad_filas, modo=MODO_CUALQUIERA, minimo=1):
+    if not listas_posiciones:
+        return np.arange(cantidad_filas)
+
+    if modo == MODO_TODAS:
+        resultado = listas_posiciones[0]
+        for posiciones in listas_posiciones[1:]:
+            resultado = np.intersect1d(resultado, posiciones, assume_unique=True)
+        return resultado
+
+    coincidencias = np.bincount(np.concatenate(listas_posiciones), minlength=cantidad_filas)
+    if modo == MODO_MINIMO:
+        return np.flatnonzero(coincidencias >= minimo)
+    return np.flatnonzero(coincidencias > 0)
+
+# Índices de habilidades técnicas e idiomas, se construyen una vez por conjunto de resultados
+def construir_indices(df):
+    return {
+        'habilidades': IndiceInvertido(df['habilidades_tecnicas'].tolist()),
+        'idiomas': IndiceInvertido(df['idiomas_que_habla'].tolist())
+    }
+
+# Posiciones de los postulantes que cumplen con las habilidades e idiomas seleccionados
+def filtrar_candidatos(indices, habilidades, idiomas, modo=MODO_CUALQUIERA, minimo=1):
+    listas_posiciones = [indices['habilidades'].buscar(habilidad) for habilidad in habilidades]
+    listas_posiciones += [indices['idiomas'].buscar(idioma) for idioma in idiomas]
+    return combinar_posiciones(listas_posiciones, indices['habilidades'].cantidad_filas, modo, minimo)
@@ -0,0 +1,181 @@
+import os
+import re
+import ast
+import json
+import time
+import random
+import asyncio
+import openai
+from openai import AsyncOpenAI
+from metricas_utils import contar
+
+# Versiones que forman parte de la clave de caché de los datos extraídos
+MODELO_LLM = "gpt-3.5-turbo"
+VERSION_PROMPT = "2"
+MAX_TOKENS_RESPUESTA = 800
+
+# Cantidad máxima de solicitudes simultáneas
+LLM_CONCURRENCIA = int(os.environ.get("CV_LLM_CONCURRENCIA", 8))
+# Límites de la cuenta de OpenAI por minuto
+LLM_SOLICITUDES_POR_MINUTO = int(os.environ.get("CV_LLM_RPM", 500))
+LLM_TOKENS_POR_MINUTO = int(os.environ.get("CV_LLM_TPM", 60000))
+# Reintentos ante errores transitorios o respuestas que no son JSON
+LLM_REINTENTOS = int(os.environ.get("CV_LLM_REINTENTOS", 4))
+LLM_ESPERA_BASE = float(os.environ.get("CV_LLM_ESPERA_BASE", 1.0))
+
+CAMPOS_CV = ['nombres', 'telefono', 'email', 'direccion', 'titulo_actual_o_al_egresar', 'universidad_o_instituto', 'anno_de_termino_de_estudios', 'habilidades_blandas', 'cargo_experiencia_laboral', 'empresa_en_la_que_trabajo', 'certificados', 'idiomas_que_habla', 'nivel_de_idioma', 'URL']
+
+MENSAJE_CORRECCION = "La respuesta anterior no es un JSON válido. Responde únicamente con el diccionario en formato JSON, sin texto adicional."
+
+# Errores de la API que justifican reintentar la solicitud
+ERRORES_TRANSITORIOS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+# campos son los datos que se piden al modelo (los que no se extrajeron localmente)
+def construir_mensajes(cv_text, campos=CAMPOS_CV):
+    return [
+        {"role": "user", "content": f"Necesito que extraigas del texto los siguientes datos y me los entregues en formato diccionario python: {', '.join(campos)}. Si no tiene alguno de estos dejarlo vacío, si hay más de un dato separarlo por coma. Texto: {cv_text}"}
+    ]
+
+# Estimación aproximada de tokens (4 caracteres por token)
+def estimar_tokens(mensajes):
+    return sum(len(mensaje["content"]) for mensaje in mensajes) // 4 + MAX_TOKENS_RESPUESTA
+
+# Transforma la respuesta del modelo a un diccionario, reparando los errores de formato más comunes.
+# Devuelve None si no se puede reparar
+def parsear_respuesta(contenido):
+    if not contenido:
+        return None
+
+    # Se quitan los bloques de código markdown y el texto fuera del diccionario
+    texto = re.sub(r"```(?:json|python)?", "", contenido).strip()
+    inicio, fin = texto.find("{"), texto.rfind("}")
+    if inicio == -1 or fin <= inicio:
+        return None
+    texto = texto[inicio:fin + 1]
+
+    try:
+        datos = json.loads(texto)
+    except json.JSONDecodeError:
+        # El prompt pide un diccionario python, por lo que puede venir con comillas simples
+        try:
+            datos = ast.literal_eval(texto)
+        except (ValueError, SyntaxError):
+            # Se eliminan las comas finales antes de cerrar
+            try:
+                datos = json.loads(re.sub(r",\s*([}\]])", r"\1", texto))
+            except json.JSONDecodeError:
+                return None
+
+    return datos if isinstance(datos, dict) else None
+
+# Tokens informados por la API para una respuesta
+def registrar_uso(response):
+    contar('llm_solicitudes')
+    uso = getattr(response, 'usage', None)
+    if uso is not None:
+        contar('llm_tokens_prompt', uso.prompt_tokens or 0)
+        contar('llm_tokens_respuesta', uso.completion_tokens or 0)
+
+class ErrorExtraccion(Exception):
+    pass
+
+# Token bucket para respetar los límites de solicitudes y tokens por minuto
+class LimitadorTasa:
+    def __init__(self, solicitudes_por_minuto=LLM_SOLICITUDES_POR_MINUTO, tokens_por_minuto=LLM_TOKENS_POR_MINUTO):
+        self.capacidad_solicitudes = solicitudes_por_minuto
+        self.capacidad_tokens = tokens_por_minuto
+        self.solicitudes = float(solicitudes_por_minuto)
+        self.tokens = float(tokens_por_minuto)
+        self.ultima_recarga = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        transcurrido = ahora - self.ultima_recarga
+        self.ultima_recarga = ahora
+        self.solicitudes = min(self.capacidad_solicitudes, self.solicitudes + transcurrido * self.capacidad_solicitudes / 60)
+        self.tokens = min(self.capacidad_tokens, self.tokens + transcurrido * self.capacidad_tokens / 60)
+
+    async def adquirir(self, tokens):
+        # Una solicitud más grande que el límite se deja pasar con el depósito lleno
+        tokens = min(tokens, self.capacidad_tokens)
+        async with self.lock:
+            while True:
+                self._recargar()
+                if self.solicitudes >= 1 and self.tokens >= tokens:
+                    self.solicitudes -= 1
+                    self.tokens -= tokens
+                    return
+                faltan_solicitudes = max(0, 1 - self.solicitudes) * 60 / self.capacidad_solicitudes
+                faltan_tokens = max(0, tokens - self.tokens) * 60 / self.capacidad_tokens
+                await asyncio.sleep(max(faltan_solicitudes, faltan_tokens))
+
+def _espera_reintento(intento):
+    # Backoff exponencial con variación aleatoria
+    return LLM_ESPERA_BASE * (2 ** intento) * (0.5 + random.random())
+
+# Extrae los datos de un CV con reintentos, volviendo a pedir el JSON si la respuesta es inválida
+async def extraer_datos_async(client, cv_text, limitador, semaforo, reintentos=LLM_REINTENTOS, campos=CAMPOS_CV):
+    mensajes = construir_mensajes(cv_text, campos)
+    ultimo_error = None
+
+    for intento in range(reintentos + 1):
+        if intento > 0:
+            contar('llm_reintentos')
+            await asyncio.sleep(_espera_reintento(intento - 1))
+
+        async with semaforo:
+            await limitador.adquirir(estimar_tokens(mensajes))
+            try:
+                response = await client.chat.completions.create(
+                    model=MODELO_LLM,
+                    messages=mensajes,
+                    temperature=0.2,
+                    max_tokens=MAX_TOKENS_RESPUESTA
+                )
+            except ERRORES_TRANSITORIOS as e:
+                contar('llm_errores', tipo=type(e).__name__)
+                ultimo_error = e
+                continue
+
+        registrar_uso(response)
+        contenido = response.choices[0].message.content
+        datos = parsear_respuesta(contenido)
+        if datos is not None:
+            return datos
+
+        contar('llm_errores', tipo='json_invalido')
+        ultimo_error = ErrorExtraccion("La respuesta no es un diccionario válido")
+        mensajes = construir_mensajes(cv_text, campos) + [
+            {"role": "assistant", "content": contenido or ""},
+            {"role": "user", "content": MENSAJE_CORRECCION}
+        ]
+
+    raise ErrorExtraccion(f"No se pudieron extraer los datos tras {reintentos + 1} intentos: {ultimo_error}")
+
+async def _extraer_lote_async(textos, concurrencia, limitador, client, campos):
+    # Un cliente creado para el lote se cierra al terminar, para liberar sus conexiones
+    propio = client is None
+    client = client or AsyncOpenAI(max_retries=0)
+    semaforo = asyncio.Semaphore(concurrencia)
+    limitador = limitador or LimitadorTasa()
+
+    async def procesar(cv_text, campos_cv):
+        try:
+            return await extraer_datos_async(client, cv_text, limitador, semaforo, campos=campos_cv), None
+        except Exception as e:
+            return None, e
+
+    try:
+        return await asyncio.gather(*[procesar(cv_text, campos_cv) for cv_text, campos_cv in zip(textos, campos)])
+    finally:
+        if propio:
+            await client.close()
+
+# Extrae los datos de varios CV en paralelo y entrega (datos, error) en el mismo orden que los textos.
+# campos, si se entrega, tiene los datos que se piden para cada texto. Un CV que falla no detiene al resto del lote
+def extraer_datos_lote(textos, concurrencia=LLM_CONCURRENCIA, limitador=None, client=None, campos=None):
+    if not textos:
+        return []
+    campos = campos or [CAMPOS_CV] * len(textos)
+    return asyncio.run(_extraer_lote_async(textos, concurrencia, limitador, client, campos))
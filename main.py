@@ -1,36 +1,92 @@
+import time
+import uuid
 import streamlit as st
-import os
-import shutil
 import pandas as pd
-from utils import image_to_text, document_to_text, normalize_text, procesar_cv
-from df_utils import procesar_df
+from df_utils import mostrar_dashboard, cargar_dataset_preparado, cargar_indices, cargar_frecuencias_blandas, cargar_motor_ranking
+from store_utils import existen_resultados, huella_resultados
+from trabajos_utils import ColaTrabajos, GrupoWorkers, ESTADOS_ACTIVOS, ESTADO_FALLIDO
 
-result_file_path = "export/cv_datas.csv"
+# Segundos entre actualizaciones del avance de los trabajos en curso
+INTERVALO_PANEL = 1.0
 
-def create_directories():
-    # Crear un directorio temporal para almacenar los archivos subidos
-    if not os.path.exists("temp"):
-        os.makedirs("temp")
+# Entrega el nombre y los bytes de cada archivo subido
+def leer_archivos_subidos(uploaded_files):
+    for uploaded_file in uploaded_files:
+        yield uploaded_file.name, uploaded_file.getvalue()
 
-    # Crea un directorio para almacener los documentos extraidos
-    if not os.path.exists("output"):
-        os.makedirs("output")
+# Cola de trabajos y workers locales, compartidos por todas las sesiones del servidor
+@st.cache_resource
+def obtener_cola():
+    return ColaTrabajos()
 
-def process_uploaded_files(uploaded_files):
-    for uploaded_file in uploaded_files:
-        with open(os.path.join("temp", uploaded_file.name), "wb") as f:
-            f.write(uploaded_file.read())
-        print('Transformación a texto del archivo: ', uploaded_file.name)
-        if uploaded_file.name.endswith(('.jpg', '.jpeg', '.png')):
-            # Extrae texto de las imagenes
-            image_to_text("temp", "output")
-            # image_to_text("temp", "output")
-        elif uploaded_file.name.endswith(('.pdf', '.doc', '.docx', '.txt')):
-            # Extrae texto de los documentos
-            document_to_text("temp", "output")
-        else:
-            # Muestra mensaje de error
-            st.warning(f"El archivo {uploaded_file.name} no es archivo compatible")
+@st.cache_resource
+def obtener_workers():
+    return GrupoWorkers()
+
+# Envía los archivos subidos como un trabajo de la sesión; el procesamiento no bloquea la interfaz
+def process_uploaded_files(uploaded_files, sesion):
+    obtener_workers().asegurar()
+    return obtener_cola().crear(sesion, leer_archivos_subidos(uploaded_files))
+
+# Muestra los archivos que no se pudieron procesar
+def mostrar_fallos(fallos, contenedor=st):
+    if fallos:
+        contenedor.error(f"{len(fallos)} archivo(s) no se pudieron procesar")
+        contenedor.table(pd.DataFrame(fallos))
+
+# Tabla por etapa a partir del resumen de métricas
+def tabla_metricas(resumen):
+    filas = []
+    for etapa, valores in resumen['etapas'].items():
+        filas.append({
+            'etapa': etapa,
+            'CV': valores['documentos'],
+            'tiempo (s)': round(valores['tiempo_s'], 2),
+            'CPU (s)': round(valores['cpu_s'], 2),
+            'entrada (KB)': round(valores['bytes_entrada'] / 1024, 1),
+            'salida (KB)': round(valores['bytes_salida'] / 1024, 1),
+            'fallos': valores['fallos']
+        })
+    return pd.DataFrame(filas).set_index('etapa') if filas else pd.DataFrame()
+
+# Avance de los trabajos de la sesión en la barra lateral, con cancelación de los que están en curso.
+# Devuelve True si alguno sigue en curso
+def mostrar_trabajos(cola, trabajos):
+    if not trabajos:
+        return False
+    st.sidebar.subheader("Procesamiento")
+    activos = False
+    for trabajo in trabajos:
+        terminados = trabajo['procesados'] + trabajo['fallidos']
+        creado = time.strftime('%H:%M:%S', time.localtime(trabajo['creado']))
+        if trabajo['estado'] in ESTADOS_ACTIVOS:
+            activos = True
+            avance = terminados / trabajo['total'] if trabajo['total'] else 0.0
+            st.sidebar.progress(avance, text=f"Trabajo de las {creado}: {terminados}/{trabajo['total']} archivos "
+                                             f"({trabajo['extraidos']} con texto extraído)")
+            if st.sidebar.button("Cancelar", key=f"cancelar-{trabajo['id']}"):
+                cola.cancelar(trabajo['id'])
+            continue
+
+        st.sidebar.caption(f"Trabajo de las {creado} {trabajo['estado']}: {trabajo['procesados']} procesados, "
+                           f"{trabajo['fallidos']} fallidos, {trabajo['agregados']} CV nuevos o actualizados")
+        if trabajo['estado'] == ESTADO_FALLIDO:
+            st.sidebar.error(trabajo['error'])
+        if trabajo['fallos']:
+            mostrar_fallos(trabajo['fallos'], st.sidebar.expander(f"Archivos fallidos ({len(trabajo['fallos'])})"))
+    return activos
+
+# Métricas del último trabajo de la sesión, con descarga en líneas JSON y en formato Prometheus
+def mostrar_metricas(metricas):
+    if metricas is None:
+        return
+    resumen, jsonl, prometheus = metricas
+    with st.sidebar.expander("Métricas del último procesamiento"):
+        st.dataframe(tabla_metricas(resumen))
+        if resumen['contadores']:
+            st.json(resumen['contadores'])
+        st.download_button("Descargar métricas (JSON lines)", jsonl, file_name="metricas.jsonl")
+        st.download_button("Descargar métricas (Prometheus)", prometheus, file_name="metricas.prom")
 
 def main():
     # Titulo página
@@ -41,29 +97,41 @@ def main():
     # Campo para cargar archivos
     uploaded_files = st.file_uploader("Cargar archivos", accept_multiple_files=True)
 
-    if not os.path.exists(result_file_path):
-        # Verifica si se han subido archivos
-        if uploaded_files is not None and len(uploaded_files)>0:
-            if st.button("Procesar CV"):
-                st.write("Procesando archivos...")
-                process_uploaded_files(uploaded_files)
-                # shutil.rmtree("temp")
-
-                # Mostrar mensaje de éxito
-                st.success(f"Archivos transformados con éxito!")
-                normalize_text("output")
-
-                # Procesa los currículum
-                procesar_cv("output")
-                # Elimina archivos temporales
-                shutil.rmtree("output")
-        else:
-            st.warning("Por favor, carga al menos un archivo.")
-            st.button("Procesar CV",disabled=True)
-    else:
-        df = pd.read_csv(result_file_path)
-        procesar_df(df)    
+    # Cada sesión ve y cancela solo sus trabajos
+    sesion = st.session_state.setdefault('sesion', uuid.uuid4().hex)
+    cola = obtener_cola()
+
+    hay_resultados = existen_resultados()
+    # Verifica si se han subido archivos
+    if uploaded_files is not None and len(uploaded_files)>0:
+        # Con resultados existentes, los CV subidos se procesan solos y se agregan a los resultados
+        if st.button("Agregar CV" if hay_resultados else "Procesar CV"):
+            process_uploaded_files(uploaded_files, sesion)
+            st.success(f"{len(uploaded_files)} archivo(s) enviados a procesar, el avance se muestra en la barra lateral")
+    elif not hay_resultados:
+        st.warning("Por favor, carga al menos un archivo.")
+        st.button("Procesar CV",disabled=True)
+
+    trabajos = cola.trabajos(sesion)
+    activos = mostrar_trabajos(cola, trabajos)
+    if activos:
+        # Si el servidor se reinició, los workers se vuelven a iniciar y retoman los trabajos pendientes
+        obtener_workers().asegurar()
+
+    if existen_resultados():
+        # Solo se vuelve a preparar el dataset si cambiaron los resultados, y solo con los archivos nuevos del almacén
+        huella = huella_resultados()
+        df = cargar_dataset_preparado(huella)
+        # El motor de ranking se construye con la primera descripción de cargo, y los gráficos
+        # se guardan en caché según la huella y los filtros
+        mostrar_dashboard(df, cargar_indices(huella), cargar_frecuencias_blandas(huella), lambda: cargar_motor_ranking(huella), huella)
+    mostrar_metricas(cola.metricas(trabajos[0]['id']) if trabajos else None)
+
+    # Mientras haya trabajos en curso, la página se vuelve a dibujar para mostrar su avance
+    # y los resultados de cada lote apenas se guardan
+    if activos:
+        time.sleep(INTERVALO_PANEL)
+        st.experimental_rerun()
 
 if __name__ == "__main__":
-    create_directories()
     main()
\ No newline at end of file
@@ -0,0 +1,185 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Métricas por etapa del pipeline: tiempo de pared, tiempo de CPU, bytes de entrada y salida,
+# contadores (tokens, reintentos, caché) y fallos por archivo. Se acumulan en memoria en el proceso
+# actual y se exportan como líneas JSON o en el formato de texto de Prometheus.
+
+ETAPA_OCR = "image_to_text"
+ETAPA_DOCUMENTOS = "document_to_text"
+ETAPA_TEXTO = "leer_texto"
+ETAPA_NORMALIZACION = "normalize_text"
+ETAPA_PREEXTRACCION = "preextraccion"
+ETAPA_LLM = "extraer_datos_cv"
+ETAPA_HABILIDADES = "habilidades"
+ETAPA_ALMACEN = "guardar_resultados"
+ETAPA_DATASET = "procesar_df"
+
+PREFIJO_PROMETHEUS = "cv_pipeline"
+
+def _etiquetas_prometheus(etiquetas):
+    if not etiquetas:
+        return ''
+    valores = []
+    for clave, valor in etiquetas:
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        valores.append(f'{clave}="{valor}"')
+    return '{' + ','.join(valores) + '}'
+
+class RegistroMetricas:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.oyentes = []
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self.lock:
+            self.inicio = time.time()
+            self.etapas = {}
+            self.contadores = {}
+            self.eventos = []
+            self.fallos = []
+
+    def _etapa(self, etapa):
+        return self.etapas.setdefault(etapa, {'llamadas': 0, 'documentos': 0, 'tiempo_s': 0.0, 'cpu_s': 0.0,
+                                              'bytes_entrada': 0, 'bytes_salida': 0, 'fallos': 0})
+
+    # Registra una medición de una etapa. documentos es la cantidad de CV que cubre la medición
+    # (las etapas que procesan por lote registran una medición por lote); detalle son datos
+    # propios de la etapa que se agregan a la línea JSON de la medición
+    def registrar(self, etapa, tiempo_s, cpu_s=0.0, bytes_entrada=0, bytes_salida=0, documentos=1, archivo=None, error=None, detalle=None):
+        evento = {
+            'ts': round(time.time(), 3),
+            'etapa': etapa,
+            'archivo': archivo,
+            'documentos': documentos,
+            'tiempo_s': round(tiempo_s, 6),
+            'cpu_s': round(cpu_s, 6),
+            'bytes_entrada': bytes_entrada,
+            'bytes_salida': bytes_salida,
+            'error': None if error is None else str(error)
+        }
+        if detalle:
+            evento['detalle'] = detalle
+        with self.lock:
+            resumen = self._etapa(etapa)
+            resumen['llamadas'] += 1
+            resumen['documentos'] += documentos
+            resumen['tiempo_s'] += tiempo_s
+            resumen['cpu_s'] += cpu_s
+            resumen['bytes_entrada'] += bytes_entrada
+            resumen['bytes_salida'] += bytes_salida
+            if error is not None:
+                resumen['fallos'] += 1
+                self.fallos.append({'etapa': etapa, 'archivo': archivo, 'error': str(error)})
+            self.eventos.append(evento)
+        self._notificar(evento)
+
+    # Fallo de un archivo dentro de una etapa medida por lote
+    def registrar_fallo(self, etapa, archivo, error):
+        with self.lock:
+            self._etapa(etapa)['fallos'] += 1
+            self.fallos.append({'etapa': etapa, 'archivo': archivo, 'error': str(error)})
+
+    def contar(self, nombre, valor=1, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self.lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+
+    def _notificar(self, evento):
+        for oyente in list(self.oyentes):
+            oyente(evento)
+
+    def resumen(self):
+        with self.lock:
+            etapas = {etapa: dict(valores) for etapa, valores in self.etapas.items()}
+            contadores = {}
+            for (nombre, etiquetas), valor in self.contadores.items():
+                contadores[nombre + ''.join(f"[{clave}={etiqueta}]" for clave, etiqueta in etiquetas)] = valor
+            return {'duracion_s': time.time() - self.inicio, 'etapas': etapas, 'contadores': contadores, 'fallos': list(self.fallos)}
+
+    # Una línea JSON por medición, seguida de una línea con el resumen
+    def exportar_jsonl(self):
+        with self.lock:
+            eventos = list(self.eventos)
+        lineas = [json.dumps(evento, ensure_ascii=False) for evento in eventos]
+        lineas.append(json.dumps({'resumen': self.resumen()}, ensure_ascii=False))
+        return '\n'.join(lineas) + '\n'
+
+    def exportar_prometheus(self):
+        lineas = []
+        with self.lock:
+            etapas = {etapa: dict(valores) for etapa, valores in self.etapas.items()}
+            contadores = dict(self.contadores)
+
+        for metrica, ayuda in [('llamadas', "Mediciones registradas por etapa"),
+                               ('documentos', "CV procesados por etapa"),
+                               ('tiempo_s', "Tiempo de pared acumulado por etapa, en segundos"),
+                               ('cpu_s', "Tiempo de CPU del proceso acumulado por etapa, en segundos"),
+                               ('bytes_entrada', "Bytes de entrada por etapa"),
+                               ('bytes_salida', "Bytes de salida por etapa"),
+                               ('fallos', "Archivos fallidos por etapa")]:
+            nombre = f"{PREFIJO_PROMETHEUS}_etapa_{metrica}_total"
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} counter")
+            for etapa, valores in sorted(etapas.items()):
+                lineas.append(f"{nombre}{_etiquetas_prometheus([('etapa', etapa)])} {valores[metrica]:g}")
+
+        for nombre in sorted({nombre for nombre, _ in contadores}):
+            completo = f"{PREFIJO_PROMETHEUS}_{nombre}_total"
+            lineas.append(f"# TYPE {completo} counter")
+            for (otro, etiquetas), valor in sorted(contadores.items()):
+                if otro == nombre:
+                    lineas.append(f"{completo}{_etiquetas_prometheus(etiquetas)} {valor:g}")
+        return '\n'.join(lineas) + '\n'
+
+# Registro del proceso actual
+registro = RegistroMetricas()
+
+def registrar_etapa(etapa, tiempo_s, cpu_s=0.0, bytes_entrada=0, bytes_salida=0, documentos=1, archivo=None, error=None, detalle=None):
+    registro.registrar(etapa, tiempo_s, cpu_s, bytes_entrada, bytes_salida, documentos, archivo, error, detalle)
+
+def registrar_fallo(etapa, archivo, error):
+    registro.registrar_fallo(etapa, archivo, error)
+
+def contar(nombre, valor=1, **etiquetas):
+    registro.contar(nombre, valor, **etiquetas)
+
+# Mide el bloque como una ejecución de la etapa. El diccionario entregado permite indicar
+# los bytes de salida y otras claves, que se registran como detalle de la medición;
+# si el bloque lanza una excepción se registra como fallo y se propaga
+@contextmanager
+def medir_etapa(etapa, bytes_entrada=0, documentos=1, archivo=None):
+    medicion = {'bytes_salida': 0}
+    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+    error = None
+    try:
+        yield medicion
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        detalle = {clave: valor for clave, valor in medicion.items() if clave != 'bytes_salida'}
+        registrar_etapa(etapa, time.perf_counter() - inicio, time.process_time() - inicio_cpu,
+                        bytes_entrada, medicion['bytes_salida'], documentos, archivo, error, detalle)
+
+def reiniciar_metricas():
+    registro.reiniciar()
+
+def resumen_metricas():
+    return registro.resumen()
+
+# Agrega una función que recibe cada medición apenas se registra (por ejemplo, para mostrar el avance)
+def suscribir(oyente):
+    registro.oyentes.append(oyente)
+
+def desuscribir(oyente):
+    if oyente in registro.oyentes:
+        registro.oyentes.remove(oyente)
+
+def exportar_metricas(ruta, formato='jsonl'):
+    contenido = registro.exportar_prometheus() if formato == 'prometheus' else registro.exportar_jsonl()
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(contenido)
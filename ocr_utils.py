@@ -0,0 +1,109 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Cantidad de procesos OCR, cada uno carga el modelo una sola vez
+OCR_WORKERS = int(os.environ.get("CV_OCR_WORKERS", os.cpu_count() or 1))
+# Cantidad de imágenes que se envían juntas a cada proceso
+OCR_TAMANO_LOTE = int(os.environ.get("CV_OCR_LOTE", 4))
+# Las imágenes con un lado mayor a este valor (en píxeles) se reducen antes del OCR
+OCR_LADO_MAXIMO = int(os.environ.get("CV_OCR_LADO_MAXIMO", 2000))
+
+# Modelo OCR del proceso actual
+ocr = None
+# Pool de procesos compartido por todas las ejecuciones
+pool = None
+
+def _iniciar_worker():
+    global ocr
+    from paddleocr import PaddleOCR
+    ocr = PaddleOCR(use_angle_cls=True, use_gpu=False, lang='es', show_log=False)
+
+# Decodifica la imagen y reduce los escaneos de gran tamaño
+def preprocesar_imagen(contenido, lado_maximo=OCR_LADO_MAXIMO):
+    import cv2
+    import numpy as np
+
+    imagen = cv2.imdecode(np.frombuffer(contenido, np.uint8), cv2.IMREAD_COLOR)
+    if imagen is None:
+        raise ValueError("No se pudo decodificar la imagen")
+
+    alto, ancho = imagen.shape[:2]
+    escala = lado_maximo / max(alto, ancho)
+    if escala < 1:
+        imagen = cv2.resize(imagen, (round(ancho * escala), round(alto * escala)), interpolation=cv2.INTER_AREA)
+    return imagen
+
+def texto_resultado_ocr(result):
+    return ''.join(line[1][0] + ' ' for line in result)
+
+# Se ejecuta en el proceso OCR, devuelve (texto, error) por cada imagen del lote
+def _reconocer_lote(lote):
+    resultados = []
+    for contenido in lote:
+        try:
+            result = ocr.ocr(preprocesar_imagen(contenido), cls=False)
+            resultados.append((texto_resultado_ocr(result), None))
+        except Exception as e:
+            resultados.append((None, str(e)))
+    return resultados
+
+def obtener_pool_ocr():
+    global pool
+    if pool is None:
+        pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, initializer=_iniciar_worker)
+    return pool
+
+def cerrar_pool_ocr():
+    global pool
+    if pool is not None:
+        pool.shutdown()
+        pool = None
+
+def _agrupar(elementos, tamano_lote):
+    lote = []
+    for elemento in elementos:
+        lote.append(elemento)
+        if len(lote) == tamano_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+# Descarta el pool si un proceso terminó abruptamente (memoria, segfault o error al cargar el modelo);
+# la siguiente llamada crea uno nuevo
+def _descartar_pool(roto):
+    global pool
+    if pool is roto:
+        pool = None
+    roto.shutdown(wait=False, cancel_futures=True)
+
+def _enviar_lotes(lotes):
+    ejecutor = obtener_pool_ocr()
+    try:
+        return ejecutor, [ejecutor.submit(_reconocer_lote, lote) for lote in lotes]
+    except BrokenProcessPool:
+        # El pool quedó roto en una llamada anterior
+        _descartar_pool(ejecutor)
+        ejecutor = obtener_pool_ocr()
+        return ejecutor, [ejecutor.submit(_reconocer_lote, lote) for lote in lotes]
+
+def _resultados(ejecutor, lotes, futuros):
+    for lote, futuro in zip(lotes, futuros):
+        try:
+            yield from futuro.result()
+        except BrokenProcessPool as e:
+            # Solo fallan las imágenes de los lotes que estaban en el pool roto, no el resto del lote de archivos
+            _descartar_pool(ejecutor)
+            error = f"El proceso de OCR terminó inesperadamente: {e}"
+            yield from ((None, error) for _ in lote)
+
+# Reconoce el texto de las imágenes (bytes) en paralelo y entrega (texto, error) en el mismo orden.
+# Los lotes se envían al pool de inmediato, por lo que el OCR avanza mientras se consumen otros resultados
+def reconocer_imagenes(imagenes, tamano_lote=OCR_TAMANO_LOTE):
+    lotes = list(_agrupar(imagenes, tamano_lote))
+    if not lotes:
+        return iter(())
+
+    ejecutor, futuros = _enviar_lotes(lotes)
+    return _resultados(ejecutor, lotes, futuros)
@@ -0,0 +1,127 @@
+import os
+import re
+from unidecode import unidecode
+
+# Extracción local, antes de consultar a OpenAI, de los campos que se obtienen de forma confiable con
+# expresiones regulares (teléfono, email, URL, año de egreso e idiomas). El modelo solo recibe los campos
+# que faltan y una ventana del texto sin líneas repetidas ni texto de relleno.
+
+# Largo máximo del texto que se envía al modelo, en caracteres (0 para no recortar)
+LLM_MAX_CARACTERES = int(os.environ.get("CV_LLM_MAX_CARACTERES", 8000))
+
+PATRON_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PATRON_URL = re.compile(r"(?:https?://|www\.)[^\s,;()<>]+|\b(?:linkedin\.com|github\.com|gitlab\.com)/[^\s,;()<>]+", re.I)
+# Teléfonos de 8 a 12 dígitos, con prefijo internacional opcional y separadores comunes
+PATRON_TELEFONO = re.compile(r"(?<![\w+])(?:\+\d{1,3}[\s.-]?)?(?:\(?\d{1,3}\)?[\s.-]?)?\d{3,4}[\s.-]?\d{3,4}(?![\w@]|-[\dkK])")
+PATRON_ANNO = re.compile(r"\b(?:19[5-9]\d|20\d{2})\b")
+
+# Líneas de la sección de estudios en las que se busca el año de egreso
+PATRON_ESTUDIOS = re.compile(r"universidad|instituto|ingenier|licenciad|tecnico|titulo|egres|carrera|magister|doctorado|diplomado|colegio|duoc|inacap", re.I)
+# Encabezados de otras secciones, que terminan la sección de estudios
+PATRON_OTRA_SECCION = re.compile(r"^\s*(experiencia|habilidades|competencias|certificad|cursos|idiomas|referencias|proyectos|perfil)", re.I)
+PATRON_SECCION_ESTUDIOS = re.compile(r"^\s*(educacion|formacion|estudios|antecedentes academicos)", re.I)
+
+# Idiomas que se reconocen en el texto, sin tildes
+IDIOMAS = {
+    'espanol': 'espanol', 'castellano': 'espanol', 'ingles': 'ingles', 'english': 'ingles', 'frances': 'frances',
+    'portugues': 'portugues', 'aleman': 'aleman', 'italiano': 'italiano', 'chino': 'chino', 'mandarin': 'chino',
+    'japones': 'japones', 'coreano': 'coreano', 'ruso': 'ruso'
+}
+PATRON_IDIOMA = re.compile(r"\b(" + '|'.join(IDIOMAS) + r")\b", re.I)
+PATRON_SECCION_IDIOMAS = re.compile(r"^\s*(idiomas?|languages?)\b", re.I)
+# Niveles que acompañan a un idioma fuera de su sección
+PATRON_NIVEL_IDIOMA = re.compile(r"\b(nativ[oa]|lengua materna|basic[oa]|intermedi[oa]|avanzad[oa]|fluid[oa]|bilingue|conversacional|nivel"
+                                 r"|native|fluent|basic|intermediate|advanced|[abc][12]|toefl|toeic|ielts)\b", re.I)
+
+# Etiquetas de las líneas de contacto
+PATRON_ETIQUETA_CONTACTO = re.compile(r"\b(e-?mail|correo( electronico)?|telefono|fono|celular|movil|whatsapp|linkedin|github|web|sitio web|portafolio)\b\s*:?", re.I)
+# Líneas de relleno que no aportan datos al modelo
+PATRON_RELLENO = re.compile(r"^\s*(curriculum( vitae)?|cv|hoja de vida|pagina \d+( de \d+)?|\d+\s*/\s*\d+|referencias a peticion|datos personales)\s*:?\s*$", re.I)
+
+# Campos que se intentan completar localmente
+CAMPOS_LOCALES = ['telefono', 'email', 'URL', 'anno_de_termino_de_estudios', 'idiomas_que_habla']
+
+def _unicos(valores):
+    return list(dict.fromkeys(valores))
+
+# Los años y rangos de años (2019 2021, (2015-2019)) coinciden con el patrón pero no son teléfonos
+def _es_telefono(telefono):
+    digitos = re.sub(r"\D", "", telefono)
+    return 8 <= len(digitos) <= 12 and not re.fullmatch(r"(?:19|20)\d{2}(?:19|20)\d{2}", digitos)
+
+def _quitar_telefonos(texto):
+    return PATRON_TELEFONO.sub(lambda coincidencia: '' if _es_telefono(coincidencia.group(0)) else coincidencia.group(0), texto)
+
+def extraer_telefonos(texto):
+    # Se quitan emails y URL para no confundir sus números con teléfonos
+    texto = PATRON_URL.sub(' ', PATRON_EMAIL.sub(' ', texto))
+    telefonos = [coincidencia.group(0).strip() for coincidencia in PATRON_TELEFONO.finditer(texto)]
+    return _unicos(telefono for telefono in telefonos if _es_telefono(telefono))
+
+# Año de egreso: el mayor año que aparece en la sección de estudios o en líneas que mencionan estudios.
+# A diferencia de df_utils.extraer_anno_egreso, no considera los años de la experiencia laboral
+def extraer_anno_egreso(texto):
+    anos = []
+    en_estudios = False
+    for linea in texto.splitlines():
+        sin_tildes = unidecode(linea)
+        if PATRON_SECCION_ESTUDIOS.match(sin_tildes):
+            en_estudios = True
+        elif PATRON_OTRA_SECCION.match(sin_tildes):
+            en_estudios = False
+        if en_estudios or PATRON_ESTUDIOS.search(sin_tildes):
+            anos += [int(ano) for ano in PATRON_ANNO.findall(linea)]
+    return str(max(anos)) if anos else ''
+
+# Idiomas de la sección de idiomas o de líneas que indican un nivel ("inglés avanzado"). Un nombre de
+# idioma sin ese contexto suele ser parte de otro nombre ("Colegio Alemán") y no se considera
+def extraer_idiomas(texto):
+    idiomas = []
+    en_idiomas = False
+    for linea in unidecode(texto).splitlines():
+        if PATRON_SECCION_IDIOMAS.match(linea):
+            en_idiomas = True
+        elif PATRON_OTRA_SECCION.match(linea) or PATRON_SECCION_ESTUDIOS.match(linea):
+            en_idiomas = False
+        if en_idiomas or PATRON_NIVEL_IDIOMA.search(linea):
+            idiomas += [IDIOMAS[idioma.lower()] for idioma in PATRON_IDIOMA.findall(linea)]
+    return _unicos(idiomas)
+
+# Campos que se pueden extraer localmente; los que no se encuentran quedan fuera del diccionario
+def extraer_campos_locales(texto):
+    campos = {
+        'telefono': ', '.join(extraer_telefonos(texto)),
+        'email': ', '.join(_unicos(PATRON_EMAIL.findall(texto))),
+        'URL': ', '.join(_unicos(url.rstrip('.') for url in PATRON_URL.findall(texto))),
+        'anno_de_termino_de_estudios': extraer_anno_egreso(texto),
+        'idiomas_que_habla': ', '.join(extraer_idiomas(texto))
+    }
+    return {campo: valor for campo, valor in campos.items() if valor}
+
+# Texto para el modelo: sin líneas vacías, repetidas o de relleno, ni líneas que solo contienen datos
+# ya extraídos (email, URL o teléfono), recortado a max_caracteres
+def recortar_texto(texto, max_caracteres=LLM_MAX_CARACTERES):
+    lineas = []
+    vistas = set()
+    for linea in texto.splitlines():
+        linea = ' '.join(linea.split())
+        clave = linea.lower()
+        if not linea or clave in vistas or PATRON_RELLENO.match(unidecode(linea)):
+            continue
+        vistas.add(clave)
+        sin_contacto = _quitar_telefonos(PATRON_URL.sub('', PATRON_EMAIL.sub('', linea)))
+        restante = PATRON_ETIQUETA_CONTACTO.sub('', unidecode(sin_contacto))
+        if sin_contacto != linea and len(re.sub(r"[\W_]", "", restante)) < 3:
+            continue
+        lineas.append(linea)
+
+    recortado = '\n'.join(lineas)
+    if max_caracteres and len(recortado) > max_caracteres:
+        recortado = recortado[:max_caracteres].rsplit('\n', 1)[0]
+    return recortado
+
+# Devuelve (campos extraídos localmente, texto para el modelo, campos que se piden al modelo)
+def preextraer(texto, campos_cv, max_caracteres=LLM_MAX_CARACTERES):
+    locales = extraer_campos_locales(texto)
+    pendientes = [campo for campo in campos_cv if campo not in locales]
+    return locales, recortar_texto(texto, max_caracteres), pendientes
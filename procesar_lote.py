@@ -0,0 +1,173 @@
+import os
+import sys
+import glob
+import json
+import hashlib
+import argparse
+
+# Procesamiento de CV sin la interfaz: extracción de texto -> normalización -> OpenAI -> habilidades.
+# Cada lote se guarda apenas termina y un manifiesto por archivo permite reanudar una ejecución interrumpida.
+# Uso: python procesar_lote.py cvs/ "otros/**/*.pdf" --salida export/cv_datas --lote 50
+
+NOMBRE_MANIFIESTO = "manifiesto.json"
+VERSION_MANIFIESTO = 1
+
+ESTADO_PROCESADO = "procesado"
+ESTADO_FALLIDO = "fallido"
+
+# Opciones de paralelismo y la variable de entorno que configura cada una
+OPCIONES_WORKERS = {
+    'workers_ocr': "CV_OCR_WORKERS",
+    'workers_documentos': "CV_DOC_WORKERS",
+    'concurrencia_llm': "CV_LLM_CONCURRENCIA",
+    'procesos_habilidades': "CV_SKILLS_N_PROCESS"
+}
+
+# Archivos de las carpetas (recursivamente), patrones glob y rutas indicadas, sin repetir
+def expandir_entradas(entradas, es_compatible):
+    rutas = set()
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for carpeta, _, nombres in os.walk(entrada):
+                rutas.update(os.path.join(carpeta, nombre) for nombre in nombres)
+        elif os.path.isfile(entrada):
+            rutas.add(entrada)
+        else:
+            rutas.update(ruta for ruta in glob.glob(entrada, recursive=True) if os.path.isfile(ruta))
+    return sorted(os.path.abspath(ruta) for ruta in rutas if es_compatible(ruta))
+
+class Manifiesto:
+    def __init__(self, carpeta):
+        self.ruta = os.path.join(carpeta, NOMBRE_MANIFIESTO)
+        self.archivos = {}
+        self.en_curso = None
+        if os.path.exists(self.ruta):
+            with open(self.ruta, encoding='utf-8') as f:
+                datos = json.load(f)
+            self.archivos = datos.get('archivos', {})
+            self.en_curso = datos.get('en_curso')
+
+        # Un lote interrumpido cuenta como terminado solo si su archivo de resultados alcanzó a escribirse
+        if self.en_curso is not None:
+            parte = self.en_curso['parte']
+            if parte is None or os.path.exists(os.path.join(carpeta, parte)):
+                self.archivos.update(self.en_curso['archivos'])
+            self.en_curso = None
+            self.guardar()
+
+    def guardar(self):
+        os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+        with open(self.ruta + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({'version': VERSION_MANIFIESTO, 'archivos': self.archivos, 'en_curso': self.en_curso}, f, ensure_ascii=False)
+        os.replace(self.ruta + ".tmp", self.ruta)
+
+    def pendiente(self, ruta, huella, reintentar_fallidos=False):
+        entrada = self.archivos.get(ruta)
+        if entrada is None or entrada['hash'] != huella:
+            return True
+        return entrada['estado'] == ESTADO_FALLIDO and reintentar_fallidos
+
+    # Se registra el lote antes de escribir sus resultados y se confirma después
+    def iniciar_lote(self, parte, archivos):
+        self.en_curso = {'parte': parte, 'archivos': archivos}
+        self.guardar()
+
+    def confirmar_lote(self):
+        self.archivos.update(self.en_curso['archivos'])
+        self.en_curso = None
+        self.guardar()
+
+# Lee los archivos pendientes y los agrupa en lotes de (ruta, contenido, huella)
+def lotes_pendientes(rutas, manifiesto, tamano_lote, reintentar_fallidos=False):
+    lote = []
+    for ruta in rutas:
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+        huella = hashlib.sha256(contenido).hexdigest()
+        if not manifiesto.pendiente(ruta, huella, reintentar_fallidos):
+            continue
+        lote.append((ruta, contenido, huella))
+        if len(lote) >= tamano_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def procesar_lote(lote, manifiesto, salida):
+    from utils import extraer_textos, extraer_datos_textos, procesados_con_cambios, guardar_resultados
+    from store_utils import nombre_parte
+
+    fallos = []
+    textos = extraer_textos(((ruta, contenido) for ruta, contenido, _ in lote), fallos)
+    procesados = extraer_datos_textos(textos, fallos)
+
+    errores = {fallo['archivo']: str(fallo['error']) for fallo in fallos}
+    archivos = {}
+    for ruta, _, huella in lote:
+        if ruta in errores:
+            archivos[ruta] = {'hash': huella, 'estado': ESTADO_FALLIDO, 'error': errores[ruta]}
+        else:
+            archivos[ruta] = {'hash': huella, 'estado': ESTADO_PROCESADO}
+
+    # Igual que en la aplicación, los CV sin cambios respecto del almacén no se vuelven a agregar
+    # (por ejemplo, si se borró el manifiesto). Si no queda ninguno no se escribe un archivo
+    nuevos = procesados_con_cambios(procesados, salida)
+    parte = nombre_parte() if not nuevos.empty else None
+    manifiesto.iniciar_lote(parte, archivos)
+    if parte is not None:
+        guardar_resultados(nuevos, salida, parte)
+    manifiesto.confirmar_lote()
+    return len(procesados), fallos
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Procesa CV desde carpetas o patrones glob, sin la interfaz, reanudando ejecuciones interrumpidas")
+    parser.add_argument("entradas", nargs="+", help="Carpetas, archivos o patrones glob (entre comillas) con los CV")
+    parser.add_argument("--salida", default=None, help="Carpeta del almacén de resultados (por defecto el que usa la aplicación)")
+    parser.add_argument("--lote", type=int, default=50, help="Archivos por lote; cada lote se guarda al terminar")
+    parser.add_argument("--reintentar-fallidos", action="store_true", help="Vuelve a procesar los archivos que fallaron en ejecuciones anteriores")
+    parser.add_argument("--workers-ocr", type=int, help="Procesos del pool de OCR")
+    parser.add_argument("--workers-documentos", type=int, help="Procesos simultáneos para PDF y Word")
+    parser.add_argument("--concurrencia-llm", type=int, help="Solicitudes simultáneas a OpenAI")
+    parser.add_argument("--procesos-habilidades", type=int, help="Procesos de nlp.pipe para las habilidades")
+    parser.add_argument("--metricas", help="Archivo donde se guardan las métricas por etapa al terminar")
+    parser.add_argument("--formato-metricas", choices=["jsonl", "prometheus"], default="jsonl", help="Formato del archivo de métricas")
+    args = parser.parse_args(argumentos)
+
+    # La configuración de los módulos se lee al importarlos, por lo que se fija antes
+    for opcion, variable in OPCIONES_WORKERS.items():
+        if getattr(args, opcion) is not None:
+            os.environ[variable] = str(getattr(args, opcion))
+
+    from utils import es_archivo_compatible
+    from store_utils import store_path
+    from ocr_utils import cerrar_pool_ocr
+    from metricas_utils import exportar_metricas
+
+    salida = args.salida or store_path
+    rutas = expandir_entradas(args.entradas, es_archivo_compatible)
+    manifiesto = Manifiesto(salida)
+    print(f"{len(rutas)} archivos compatibles, resultados en {salida}")
+
+    total_procesados = 0
+    total_fallos = 0
+    try:
+        for numero, lote in enumerate(lotes_pendientes(rutas, manifiesto, args.lote, args.reintentar_fallidos), 1):
+            procesados, fallos = procesar_lote(lote, manifiesto, salida)
+            total_procesados += procesados
+            total_fallos += len(fallos)
+            print(f"Lote {numero}: {procesados} procesados, {len(fallos)} fallidos")
+            for fallo in fallos:
+                print(f"  {fallo['archivo']}: {fallo['error']}")
+    except KeyboardInterrupt:
+        print("Ejecución interrumpida, se reanuda desde el último lote guardado al volver a ejecutar el comando")
+        return 130
+    finally:
+        cerrar_pool_ocr()
+        if args.metricas:
+            exportar_metricas(args.metricas, args.formato_metricas)
+
+    print(f"Total: {total_procesados} procesados, {total_fallos} fallidos")
+    return 1 if total_fallos else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import re
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+# Peso de cada fuente de características en el puntaje
+PESOS_FUENTE = {'tecnica': 1.0, 'certificado': 0.5, 'idioma': 0.5}
+# Peso de la experiencia laboral (normalizada entre 0 y 1) en el puntaje
+PESO_EXPERIENCIA = 0.1
+# Largo máximo, en palabras, de un término buscado en la descripción del cargo
+MAX_PALABRAS_TERMINO = 4
+
+# Palabras de la descripción, conserva términos como c++, c#, node.js o ci/cd
+PATRON_TOKEN = r"(?u)[\w+#]+(?:[./\-][\w+#]+)*"
+
+COLUMNAS_FUENTE = {
+    'tecnica': 'habilidades_tecnicas',
+    'certificado': 'habilidades_certificados',
+    'idioma': 'idiomas_que_habla'
+}
+
+def _identidad(tokens):
+    return tokens
+
+def _clave(texto):
+    return ' '.join(re.findall(PATRON_TOKEN, unidecode(texto.lower())))
+
+def _caracteristicas(df):
+    listas = {fuente: df[columna].tolist() if columna in df else [[]] * len(df) for fuente, columna in COLUMNAS_FUENTE.items()}
+    for fila in zip(*listas.values()):
+        yield [f"{fuente}:{valor}" for fuente, valores in zip(listas, fila) if isinstance(valores, list) for valor in valores if valor]
+
+# Motor de ranking: matriz dispersa TF-IDF (CSR) de candidatos x características, se construye
+# una vez por conjunto de resultados y cada consulta es un producto matriz-vector
+class MotorRanking:
+    def __init__(self, df):
+        # scikit-learn se carga solo al construir el motor
+        from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+
+        self.cantidad_filas = len(df)
+        self.vectorizador = CountVectorizer(analyzer=_identidad)
+        if df.empty:
+            self.matriz = None
+            self.terminos = {}
+            return
+
+        try:
+            conteos = self.vectorizador.fit_transform(_caracteristicas(df))
+        except ValueError:
+            # Ningún candidato tiene características
+            self.matriz = None
+            self.terminos = {}
+            return
+        self.matriz = TfidfTransformer(sublinear_tf=True).fit_transform(conteos).tocsr()
+
+        # Columnas y pesos de cada término, agrupados por su forma normalizada
+        self.terminos = {}
+        for columna, caracteristica in enumerate(self.vectorizador.get_feature_names_out()):
+            fuente, termino = caracteristica.split(':', 1)
+            clave = _clave(termino)
+            if clave:
+                self.terminos.setdefault(clave, []).append((columna, PESOS_FUENTE[fuente]))
+
+        experiencia = np.log1p(df['cantidad_experiencia'].to_numpy(dtype=float)) if 'cantidad_experiencia' in df else np.zeros(len(df))
+        self.experiencia = experiencia / experiencia.max() if experiencia.max() > 0 else experiencia
+
+        # Vectorizador de la descripción del cargo, solo cuenta los términos conocidos
+        largo_maximo = min(MAX_PALABRAS_TERMINO, max(len(clave.split()) for clave in self.terminos))
+        self.vectorizador_descripcion = CountVectorizer(vocabulary=sorted(self.terminos), ngram_range=(1, largo_maximo),
+                                                        token_pattern=PATRON_TOKEN, preprocessor=lambda texto: unidecode(texto.lower()))
+
+    # Términos conocidos que aparecen en la descripción del cargo
+    def terminos_descripcion(self, descripcion):
+        if self.matriz is None or not descripcion:
+            return []
+        conteos = self.vectorizador_descripcion.transform([descripcion])
+        nombres = self.vectorizador_descripcion.get_feature_names_out()
+        return [nombres[columna] for columna in conteos.indices]
+
+    # Los k candidatos con mayor puntaje para la descripción del cargo. Devuelve un DataFrame indexado por
+    # la posición de cada candidato con el puntaje total, el aporte de la experiencia y el aporte de cada término
+    def rankear(self, descripcion, k=10, peso_experiencia=PESO_EXPERIENCIA):
+        terminos = self.terminos_descripcion(descripcion)
+        if not terminos:
+            return pd.DataFrame(columns=['puntaje', 'experiencia'])
+
+        columnas = [columna for termino in terminos for columna, _ in self.terminos[termino]]
+        pesos = np.array([peso for termino in terminos for _, peso in self.terminos[termino]])
+        etiquetas = [termino for termino in terminos for _ in self.terminos[termino]]
+
+        # Producto matriz dispersa x vector, solo con las columnas de los términos buscados
+        submatriz = self.matriz[:, columnas]
+        coincidencias = submatriz @ pesos
+        puntajes = coincidencias + peso_experiencia * self.experiencia
+        # Solo se consideran los candidatos que tienen al menos uno de los términos
+        puntajes[coincidencias <= 0] = -np.inf
+
+        # Selección de los k mayores sin ordenar todo el arreglo
+        k = min(k, np.count_nonzero(coincidencias > 0))
+        if k == 0:
+            return pd.DataFrame(columns=['puntaje', 'experiencia'])
+        mejores = np.argpartition(-puntajes, k - 1)[:k]
+        mejores = mejores[np.argsort(-puntajes[mejores], kind='stable')]
+
+        aportes = submatriz[mejores].toarray() * pesos
+        ranking = pd.DataFrame(aportes, index=mejores, columns=etiquetas).T.groupby(level=0, sort=False).sum().T
+        ranking.insert(0, 'experiencia', peso_experiencia * self.experiencia[mejores])
+        ranking.insert(0, 'puntaje', puntajes[mejores])
+        return ranking
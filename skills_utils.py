@@ -0,0 +1,178 @@
+import os
+import json
+import hashlib
+import argparse
+
+model_skills_path = "model_skills"
+patterns_path = os.path.join(model_skills_path, "skills_pattern", "patterns.jsonl")
+# Índice compilado de los patrones del entity_ruler
+indice_path = os.path.join(model_skills_path, "skills_index.json")
+
+# Procesos usados por nlp.pipe (1 evita el costo de iniciar procesos en lotes pequeños)
+SKILLS_N_PROCESS = int(os.environ.get("CV_SKILLS_N_PROCESS", 1))
+SKILLS_BATCH_SIZE = int(os.environ.get("CV_SKILLS_BATCH_SIZE", 256))
+
+# Atributos de token que se pueden compilar a un PhraseMatcher
+ATRIBUTOS_COMPILABLES = {'LOWER': 'LOWER', 'TEXT': 'ORTH', 'ORTH': 'ORTH'}
+
+# Modelo compartido, se carga la primera vez que se usa
+nlp = None
+
+# Versión del modelo de habilidades, cambia si se modifican los patrones
+def version_modelo_habilidades():
+    with open(patterns_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def leer_patrones(ruta=patterns_path):
+    with open(ruta, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+# Revisa un patrón del entity_ruler y devuelve (atributo, palabras, advertencia), o el motivo
+# por el que se descarta. Solo se descartan los patrones que el entity_ruler nunca puede encontrar
+def _validar_patron(patron, tokenizer):
+    if isinstance(patron, str):
+        palabras = [token.text for token in tokenizer(patron)]
+        return ('ORTH', palabras, None) if palabras else 'patrón vacío'
+
+    atributos = set()
+    palabras = []
+    advertencia = None
+    for token in patron:
+        if len(token) != 1:
+            return 'token con más de un atributo'
+        atributo, valor = next(iter(token.items()))
+        if atributo not in ATRIBUTOS_COMPILABLES or not isinstance(valor, str):
+            return f'atributo no soportado: {atributo}'
+        if valor.strip() == '':
+            return 'token vacío, nunca coincide'
+        if ' ' in valor:
+            return 'valor con espacios, nunca coincide con un token'
+        if atributo == 'LOWER' and valor != valor.lower():
+            return 'valor LOWER con mayúsculas, nunca coincide'
+        if len(tokenizer(valor)) != 1:
+            advertencia = 'el tokenizador divide el valor, probablemente nunca coincide'
+        atributos.add(ATRIBUTOS_COMPILABLES[atributo])
+        palabras.append(valor)
+
+    if len(atributos) != 1:
+        return 'mezcla atributos LOWER y TEXT'
+    return atributos.pop(), palabras, advertencia
+
+# Compila los patrones del entity_ruler en un índice para PhraseMatcher, descartando los inválidos
+def compilar_indice(ruta=indice_path):
+    import spacy
+    tokenizer = spacy.load(model_skills_path, exclude=["skills_pattern"]).tokenizer
+
+    patrones = []
+    invalidos = []
+    advertencias = []
+    vistos = set()
+    for linea in leer_patrones():
+        resultado = _validar_patron(linea['pattern'], tokenizer)
+        if isinstance(resultado, str):
+            invalidos.append({'patron': linea, 'motivo': resultado})
+            continue
+        atributo, palabras, advertencia = resultado
+        if advertencia:
+            advertencias.append({'patron': linea, 'motivo': advertencia})
+        clave = (linea['label'], atributo, tuple(palabras))
+        if clave not in vistos:
+            vistos.add(clave)
+            patrones.append([linea['label'], atributo, palabras])
+
+    indice = {'version': version_modelo_habilidades(), 'patrones': patrones, 'invalidos': invalidos, 'advertencias': advertencias}
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(indice, f, ensure_ascii=False)
+    return indice
+
+# Carga el índice compilado, volviendo a compilarlo si los patrones cambiaron
+def cargar_indice(ruta=indice_path):
+    if os.path.exists(ruta):
+        with open(ruta, encoding='utf-8') as f:
+            indice = json.load(f)
+        if indice.get('version') == version_modelo_habilidades():
+            return indice
+    return compilar_indice(ruta)
+
+# Componente de SpaCy que reemplaza al entity_ruler usando el índice compilado.
+# Resuelve las coincidencias superpuestas igual que el entity_ruler: primero las más largas
+class MatcherHabilidades:
+    def __init__(self, vocab, patrones):
+        from spacy.matcher import PhraseMatcher
+        from spacy.tokens import Doc
+
+        self.matchers = {}
+        agrupados = {}
+        for label, atributo, palabras in patrones:
+            agrupados.setdefault((atributo, label), []).append(Doc(vocab, words=palabras))
+        for (atributo, label), docs in agrupados.items():
+            matcher = self.matchers.setdefault(atributo, PhraseMatcher(vocab, attr=atributo))
+            matcher.add(label, docs)
+
+    def __call__(self, doc):
+        from spacy.tokens import Span
+
+        matches = {(match_id, start, end) for matcher in self.matchers.values() for match_id, start, end in matcher(doc) if start != end}
+        matches = sorted(matches, key=lambda m: (m[2] - m[1], -m[1]), reverse=True)
+
+        entidades = [ent for ent in doc.ents]
+        nuevas = []
+        vistos = set()
+        for match_id, start, end in matches:
+            if any(token.ent_type for token in doc[start:end]):
+                continue
+            if start not in vistos and end - 1 not in vistos:
+                nuevas.append(Span(doc, start, end, label=match_id))
+                vistos.update(range(start, end))
+        doc.ents = entidades + nuevas
+        return doc
+
+def _registrar_componente():
+    from spacy.language import Language
+
+    if not Language.has_factory("skills_index"):
+        @Language.factory("skills_index", default_config={"ruta": indice_path})
+        def crear_matcher_habilidades(nlp, name, ruta):
+            return MatcherHabilidades(nlp.vocab, cargar_indice(ruta)['patrones'])
+
+def obtener_nlp():
+    global nlp
+    if nlp is None:
+        import spacy
+        _registrar_componente()
+        # Se usa el tokenizador del modelo y el índice compilado en lugar del entity_ruler
+        nlp = spacy.load(model_skills_path, exclude=["skills_pattern"])
+        nlp.add_pipe("skills_index")
+    return nlp
+
+# Extrae las habilidades de todos los textos en un solo lote, en el mismo orden que los textos
+def extraer_habilidades(textos, n_process=SKILLS_N_PROCESS, batch_size=SKILLS_BATCH_SIZE):
+    textos = [texto if isinstance(texto, str) else '' for texto in textos]
+    if not textos:
+        return []
+
+    docs = obtener_nlp().pipe(textos, n_process=n_process, batch_size=batch_size)
+    return [[ent.text for ent in doc.ents if ent.label_ == 'SKILLS'] for doc in docs]
+
+# Extrae las habilidades de listas de textos (por ejemplo, los certificados de cada postulante),
+# procesando todas las listas en un solo lote y devolviendo una lista de habilidades por fila
+def extraer_habilidades_por_fila(filas, n_process=SKILLS_N_PROCESS, batch_size=SKILLS_BATCH_SIZE):
+    filas = [fila if isinstance(fila, list) else [] for fila in filas]
+    textos = [texto for fila in filas for texto in fila]
+    habilidades = iter(extraer_habilidades(textos, n_process, batch_size))
+    return [[habilidad for _ in fila for habilidad in next(habilidades)] for fila in filas]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compila los patrones de habilidades en un índice para PhraseMatcher")
+    parser.add_argument("--compilar", action="store_true", help="Compila el índice y muestra los patrones inválidos")
+    args = parser.parse_args()
+
+    if args.compilar:
+        indice = compilar_indice()
+        print(f"Patrones compilados: {len(indice['patrones'])}")
+        for titulo in ('invalidos', 'advertencias'):
+            print(f"Patrones {titulo}: {len(indice[titulo])}")
+            for patron in indice[titulo]:
+                print(f"  {json.dumps(patron['patron'], ensure_ascii=False)}: {patron['motivo']}")
+    else:
+        parser.print_help()
@@ -0,0 +1,194 @@
+import os
+import time
+import shutil
+import hashlib
+import argparse
+from io import BytesIO
+from ast import literal_eval
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Almacén principal: un archivo Parquet por lote procesado, solo se agregan archivos
+store_path = "export/cv_datas"
+# Resultados en el formato anterior (se migran la primera vez que se cargan)
+legacy_csv_path = "export/cv_datas.csv"
+export_path = "export"
+
+ESQUEMA_VERSION = 3
+
+# id_candidato (desde la versión 2 del esquema) agrupa los envíos casi iguales de un mismo CV, y
+# huella_cv (desde la versión 3) es el hash del texto del CV, para no volver a agregar un CV sin cambios
+COLUMNAS_TEXTO = ['id_candidato', 'huella_cv', 'nombres', 'telefono', 'email', 'direccion', 'titulo_actual_o_al_egresar', 'universidad_o_instituto', 'anno_de_termino_de_estudios', 'habilidades_blandas', 'cargo_experiencia_laboral', 'empresa_en_la_que_trabajo', 'certificados', 'idiomas_que_habla', 'nivel_de_idioma', 'URL']
+COLUMNAS_LISTA = ['habilidades_tecnicas']
+
+ESQUEMA = pa.schema(
+    [pa.field(columna, pa.string()) for columna in COLUMNAS_TEXTO]
+    + [pa.field(columna, pa.list_(pa.string())) for columna in COLUMNAS_LISTA],
+    metadata={b'esquema_version': str(ESQUEMA_VERSION).encode()}
+)
+
+FORMATOS_EXPORTACION = ['csv', 'xlsx', 'json']
+
+# El modelo puede devolver listas o números en campos de texto, se dejan como texto separado por comas.
+# Los campos vacíos se guardan como nulos, igual que al leer el CSV anterior
+def _a_texto(valor):
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return None
+    if isinstance(valor, (list, tuple)):
+        valor = ', '.join(str(elemento) for elemento in valor if str(elemento).strip())
+    valor = str(valor)
+    return valor if valor.strip() else None
+
+def _a_lista(valor):
+    if isinstance(valor, str):
+        valor = literal_eval(valor) if valor.startswith('[') else [valor]
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return []
+    return [str(elemento) for elemento in valor]
+
+# Ajusta los resultados al esquema del almacén
+def normalizar_resultados(df):
+    normalizado = pd.DataFrame(index=range(len(df)))
+    for columna in COLUMNAS_TEXTO:
+        valores = df[columna] if columna in df else [None] * len(df)
+        normalizado[columna] = [_a_texto(valor) for valor in valores]
+    for columna in COLUMNAS_LISTA:
+        valores = df[columna] if columna in df else [None] * len(df)
+        normalizado[columna] = [_a_lista(valor) for valor in valores]
+    return normalizado
+
+def nombre_parte():
+    return f"parte-{time.time_ns()}-v{ESQUEMA_VERSION}.parquet"
+
+# Agrega un lote de resultados como un nuevo archivo, sin reescribir los anteriores.
+# El nombre del archivo se puede fijar de antemano (por ejemplo, para registrarlo en un manifiesto)
+def agregar_resultados(df, ruta_almacen=None, nombre=None):
+    df = normalizar_resultados(df)
+    ruta_almacen = ruta_almacen or store_path
+    if not os.path.exists(ruta_almacen):
+        os.makedirs(ruta_almacen)
+
+    tabla = pa.Table.from_pandas(df, schema=ESQUEMA, preserve_index=False)
+    ruta = os.path.join(ruta_almacen, nombre or nombre_parte())
+    # Se escribe a un archivo temporal para que un lector nunca vea un archivo incompleto
+    pq.write_table(tabla, ruta + ".tmp")
+    os.replace(ruta + ".tmp", ruta)
+    print("Resultados guardados en", ruta)
+    return df
+
+def _partes(ruta_almacen=None):
+    ruta_almacen = ruta_almacen or store_path
+    if not os.path.exists(ruta_almacen):
+        return []
+    return sorted(os.path.join(ruta_almacen, nombre) for nombre in os.listdir(ruta_almacen) if nombre.endswith(".parquet"))
+
+# Convierte los resultados guardados con el formato CSV anterior al almacén Parquet
+def migrar_csv():
+    if os.path.exists(legacy_csv_path) and not _partes():
+        agregar_resultados(pd.read_csv(legacy_csv_path, keep_default_na=False))
+
+def existen_resultados():
+    migrar_csv()
+    return len(_partes()) > 0
+
+# Archivos del almacén, en orden de escritura, con su estado (tamaño y fecha de modificación).
+# Un archivo no cambia una vez escrito, por lo que el estado identifica su contenido
+def estado_partes():
+    migrar_csv()
+    estados = []
+    for ruta in _partes():
+        info = os.stat(ruta)
+        estados.append((ruta, f"{info.st_size}:{info.st_mtime_ns}"))
+    return estados
+
+# Huella del contenido del almacén, cambia cuando se agrega, modifica o borra un archivo
+def huella_resultados():
+    estado = [f"{os.path.basename(ruta)}:{estado}" for ruta, estado in estado_partes()]
+    return hashlib.sha256('|'.join(estado).encode('utf-8')).hexdigest()
+
+# Lee un archivo del almacén con el esquema actual, o solo las columnas indicadas
+def _leer_parte(ruta, columnas=None):
+    esquema = ESQUEMA if columnas is None else pa.schema([ESQUEMA.field(columna) for columna in columnas])
+    guardado = pq.read_schema(ruta)
+    version = int((guardado.metadata or {}).get(b'esquema_version', b'1'))
+    if version > ESQUEMA_VERSION:
+        raise ValueError(f"El archivo {ruta} usa la versión de esquema {version}, no soportada por esta versión")
+    tabla = pq.read_table(ruta, columns=[columna for columna in esquema.names if columna in guardado.names])
+    # Las columnas que no existían en versiones anteriores se agregan vacías
+    for campo in esquema:
+        if campo.name not in tabla.column_names:
+            tabla = tabla.append_column(campo, pa.nulls(len(tabla), campo.type))
+    return tabla.select(esquema.names).cast(esquema)
+
+# Resultados de una tabla del almacén, con las columnas de listas como listas de Python
+def _tabla_a_df(tabla):
+    df = tabla.drop_columns(COLUMNAS_LISTA).to_pandas()
+    for columna in COLUMNAS_LISTA:
+        df[columna] = [lista or [] for lista in tabla.column(columna).to_pylist()]
+    return df
+
+# Carga todos los resultados
+def cargar_resultados():
+    migrar_csv()
+    partes = _partes()
+    if not partes:
+        return normalizar_resultados(pd.DataFrame())
+    return _tabla_a_df(pa.concat_tables([_leer_parte(ruta) for ruta in partes]))
+
+# Carga los resultados de un archivo del almacén
+def cargar_parte(ruta):
+    return _tabla_a_df(_leer_parte(ruta))
+
+# Huella del último envío de cada candidato, leyendo solo esas dos columnas del almacén
+# (por defecto el de la aplicación)
+def ultimas_huellas(ruta_almacen=None):
+    if ruta_almacen is None:
+        migrar_csv()
+    huellas = {}
+    for ruta in _partes(ruta_almacen):
+        tabla = _leer_parte(ruta, ['id_candidato', 'huella_cv'])
+        huellas.update(zip(tabla.column('id_candidato').to_pylist(), tabla.column('huella_cv').to_pylist()))
+    huellas.pop(None, None)
+    return huellas
+
+# Quita del lote los CV cuyo último envío guardado tiene el mismo texto; los demás se agregan
+# y reemplazan al envío anterior del candidato
+def quitar_sin_cambios(df, ruta_almacen=None):
+    if df.empty or 'id_candidato' not in df or 'huella_cv' not in df:
+        return df
+    huellas = ultimas_huellas(ruta_almacen)
+    nuevos = [huella is None or huellas.get(candidato) != huella for candidato, huella in zip(df['id_candidato'], df['huella_cv'])]
+    return df[nuevos].reset_index(drop=True)
+
+def borrar_resultados():
+    if os.path.exists(store_path):
+        shutil.rmtree(store_path)
+    if os.path.exists(legacy_csv_path):
+        os.remove(legacy_csv_path)
+
+# Genera una exportación solo cuando se solicita
+def exportar_resultados(formato, df=None):
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+    df = cargar_resultados() if df is None else df
+
+    salida = BytesIO()
+    if formato == 'xlsx':
+        df.to_excel(salida, index=False)
+    elif formato == 'csv':
+        df.to_csv(salida, index=False)
+    else:
+        salida.write(df.to_json(orient='records', force_ascii=False).encode('utf-8'))
+    return salida.getvalue()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta los resultados del almacén Parquet")
+    parser.add_argument("--exportar", choices=FORMATOS_EXPORTACION, action="append", required=True)
+    args = parser.parse_args()
+
+    for formato in args.exportar:
+        ruta = os.path.join(export_path, f"cv_datas.{formato}")
+        with open(ruta, "wb") as f:
+            f.write(exportar_resultados(formato))
+        print(f"Resultados exportados a {ruta}")
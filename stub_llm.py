@@ -0,0 +1,106 @@
+import re
+import json
+import time
+import random
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Servidor local compatible con la API de OpenAI (/v1/chat/completions) para pruebas y benchmarks sin conexión.
+# Uso: OPENAI_BASE_URL=http://localhost:8000/v1 OPENAI_API_KEY=stub streamlit run main.py
+
+class ConfiguracionStub:
+    latencia = 0.5
+    variacion_latencia = 0.2
+    tasa_error = 0.0
+    tasa_json_invalido = 0.0
+
+def _datos_simulados(texto):
+    email = re.search(r"[\w.+-]+@[\w-]+\.[\w.]+", texto)
+    telefono = re.search(r"\+?\d[\d\s]{7,}\d", texto)
+    anos = re.findall(r"\b(?:19|20)\d{2}\b", texto)
+    palabras = texto.split()
+    return {
+        "nombres": ' '.join(palabras[:2]),
+        "telefono": telefono.group(0) if telefono else "",
+        "email": email.group(0) if email else "",
+        "direccion": "",
+        "titulo_actual_o_al_egresar": "",
+        "universidad_o_instituto": "",
+        "anno_de_termino_de_estudios": max(anos) if anos else "",
+        "habilidades_blandas": "trabajo en equipo, comunicacion",
+        "cargo_experiencia_laboral": "",
+        "empresa_en_la_que_trabajo": "",
+        "certificados": "",
+        "idiomas_que_habla": "espanol",
+        "nivel_de_idioma": "",
+        "URL": ""
+    }
+
+class ManejadorStub(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _responder(self, codigo, cuerpo, encabezados=None):
+        contenido = json.dumps(cuerpo).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(contenido)))
+        for clave, valor in (encabezados or {}).items():
+            self.send_header(clave, valor)
+        self.end_headers()
+        self.wfile.write(contenido)
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith("/chat/completions"):
+            self._responder(404, {"error": {"message": "Ruta no encontrada"}})
+            return
+
+        largo = int(self.headers.get("Content-Length", 0))
+        solicitud = json.loads(self.rfile.read(largo) or b"{}")
+        texto = ' '.join(mensaje.get("content", "") for mensaje in solicitud.get("messages", []))
+
+        time.sleep(max(0, random.gauss(ConfiguracionStub.latencia, ConfiguracionStub.variacion_latencia * ConfiguracionStub.latencia)))
+
+        # Errores transitorios simulados
+        if random.random() < ConfiguracionStub.tasa_error:
+            if random.random() < 0.5:
+                self._responder(429, {"error": {"message": "Rate limit simulado", "type": "rate_limit_error"}}, {"Retry-After": "0"})
+            else:
+                self._responder(500, {"error": {"message": "Error simulado", "type": "server_error"}})
+            return
+
+        contenido = json.dumps(_datos_simulados(texto), ensure_ascii=False)
+        if random.random() < ConfiguracionStub.tasa_json_invalido:
+            # Respuesta truncada que no se puede reparar
+            contenido = "Aquí están los datos: " + contenido[:len(contenido) // 2]
+
+        tokens_prompt = len(texto) // 4
+        tokens_respuesta = len(contenido) // 4
+        self._responder(200, {
+            "id": f"chatcmpl-stub-{random.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": solicitud.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": contenido}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": tokens_prompt, "completion_tokens": tokens_respuesta, "total_tokens": tokens_prompt + tokens_respuesta}
+        })
+
+def crear_servidor(puerto=8000, latencia=0.5, tasa_error=0.0, tasa_json_invalido=0.0):
+    ConfiguracionStub.latencia = latencia
+    ConfiguracionStub.tasa_error = tasa_error
+    ConfiguracionStub.tasa_json_invalido = tasa_json_invalido
+    servidor = ThreadingHTTPServer(("127.0.0.1", puerto), ManejadorStub)
+    servidor.daemon_threads = True
+    return servidor
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local compatible con OpenAI para pruebas")
+    parser.add_argument("--puerto", type=int, default=8000)
+    parser.add_argument("--latencia", type=float, default=0.5, help="Latencia media por solicitud, en segundos")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Proporción de respuestas 429/500")
+    parser.add_argument("--tasa-json-invalido", type=float, default=0.0, help="Proporción de respuestas que no son JSON")
+    args = parser.parse_args()
+
+    servidor = crear_servidor(args.puerto, args.latencia, args.tasa_error, args.tasa_json_invalido)
+    print(f"Servidor stub en http://127.0.0.1:{args.puerto}/v1")
+    servidor.serve_forever()
@@ -0,0 +1,54 @@
+import string
+from collections import Counter
+import pandas as pd
+import pytest
+import df_utils
+
+STOPWORDS = frozenset({'nuestras', 'aquellos'})
+LEMAS = {'comunicaciones': 'comunicacion', 'liderazgos': 'liderazgo'}
+
+# Stopwords y lemas fijos, sin depender de los datos de NLTK
+@pytest.fixture
+def lematizados(monkeypatch):
+    llamadas = []
+
+    def lematizar(palabra):
+        llamadas.append(palabra)
+        return LEMAS.get(palabra, palabra)
+
+    monkeypatch.setattr(df_utils, 'obtener_stopwords', lambda: STOPWORDS)
+    monkeypatch.setattr(df_utils, 'lematizar', lematizar)
+    return llamadas
+
+def _columna():
+    return pd.Series([
+        ['Trabajo en equipo', 'Comunicaciones efectivas'],
+        [],
+        ['LIDERAZGOS  y proactividad', 'aquellos resultados'],
+        ['trabajo', 'comunicaciones nuestras'],
+        ['Adaptabilidad, liderazgos.']
+    ], index=[3, 5, 8, 13, 21])
+
+def test_normalizacion_vectorizada_igual_a_por_fila(lematizados):
+    columna = _columna()
+    esperado = columna.apply(df_utils.normalizar_palabras)
+    vectorizado = df_utils.normalizar_habilidades_blandas(columna)
+    assert vectorizado.index.tolist() == columna.index.tolist()
+    assert vectorizado.tolist() == esperado.tolist()
+    assert vectorizado[8] == 'liderazgo proactividad resultados'
+
+def test_cada_palabra_se_lematiza_una_vez(lematizados):
+    df_utils.normalizar_habilidades_blandas(_columna())
+    assert Counter(lematizados)['comunicaciones'] == 1
+
+def test_columna_sin_habilidades(lematizados):
+    assert df_utils.normalizar_habilidades_blandas(pd.Series([[], []])).tolist() == ['', '']
+
+def test_frecuencias_blandas(lematizados):
+    df = pd.DataFrame({'habilidades_blandas': _columna()})
+    df['habilidades_blandas_lematizadas'] = df_utils.normalizar_habilidades_blandas(df['habilidades_blandas'])
+    # Igual que contar las palabras del texto unido de todas las filas, sin puntuación
+    palabras = ' '.join(df['habilidades_blandas'].apply(df_utils.normalizar_palabras)).split()
+    esperado = Counter(palabra.strip(string.punctuation) for palabra in palabras)
+    assert df_utils.calcular_frecuencias_blandas(df) == esperado
+    assert esperado['trabajo'] == 2 and esperado['comunicacion'] == 2
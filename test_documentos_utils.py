@@ -0,0 +1,59 @@
+from benchmarks.generar_corpus import texto_a_pdf
+from documentos_utils import extraer_paginas_pdf, extraer_documentos, documento_a_texto, contar_paginas
+
+def _pdf(paginas, en_blanco=()):
+    lineas = []
+    for pagina in range(paginas):
+        lineas += [''] * 5 if pagina in en_blanco else [f"Página {pagina + 1} del CV de prueba, con texto suficiente"] * 5
+    return texto_a_pdf('\n'.join(lineas), lineas_por_pagina=5)
+
+# Reemplaza al pool de OCR: devuelve el tamaño de cada imagen recibida
+def _reconocer(imagenes):
+    return [(f"OCR {len(imagen)} bytes", None) for imagen in imagenes]
+
+def _extraer(documentos, **opciones):
+    opciones.setdefault('memoria_maxima', 0)
+    return {clave: (texto, error) for clave, _, texto, error in extraer_documentos(documentos, **opciones)}
+
+def test_documento_a_texto_desde_memoria():
+    assert 'Página 1 del CV' in documento_a_texto('cv.pdf', _pdf(1))
+
+def test_paginas_inexistentes_se_omiten():
+    contenido = _pdf(1)
+    assert contar_paginas(contenido) == 1
+    resultado = extraer_paginas_pdf(contenido, [0, 1], contar_total=True)
+    assert resultado['total'] == 1
+    assert [(pagina, imagen) for pagina, _, imagen in resultado['paginas']] == [(0, None)]
+    assert extraer_paginas_pdf(contenido, [2, 3]) == {'paginas': [], 'total': None}
+
+def test_pdf_de_una_y_varias_paginas():
+    resultados = _extraer([(1, 'una.pdf', _pdf(1)), (3, 'tres.pdf', _pdf(3)), (5, 'cinco.pdf', _pdf(5))], reconocer=_reconocer)
+    for paginas in (1, 3, 5):
+        texto, error = resultados[paginas]
+        assert error is None
+        assert [f"Página {i + 1} del CV" in texto for i in range(paginas + 1)] == [True] * paginas + [False]
+        assert 'OCR' not in texto
+
+def test_pagina_escaneada_pasa_por_ocr():
+    texto, error = _extraer([(0, 'mixto.pdf', _pdf(3, en_blanco={1}))], reconocer=_reconocer)[0]
+    assert error is None
+    lineas = [linea for linea in texto.splitlines() if linea.strip()]
+    assert lineas[0].startswith('Página 1') and lineas[-1].startswith('Página 3')
+    assert sum(linea.startswith('OCR') for linea in lineas) == 1
+
+def test_pdf_sin_texto_falla():
+    texto, error = _extraer([(0, 'vacio.pdf', _pdf(1, en_blanco={0}))])[0]
+    assert texto is None
+    assert error == "El documento no tiene texto"
+
+def test_documento_invalido_no_detiene_el_lote():
+    resultados = _extraer([(0, 'roto.pdf', b'no es un pdf'), (1, 'bien.pdf', _pdf(2))])
+    assert resultados[0][0] is None and resultados[0][1]
+    assert resultados[1][1] is None
+
+def test_abandonar_el_generador_detiene_los_procesos():
+    import multiprocessing
+    documentos = extraer_documentos([(i, f"cv{i}.pdf", _pdf(3)) for i in range(4)], workers=4, memoria_maxima=0)
+    next(documentos)
+    documentos.close()
+    assert multiprocessing.active_children() == []
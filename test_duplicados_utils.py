@@ -0,0 +1,94 @@
+import random
+import pytest
+from duplicados_utils import IndiceDuplicados, firma_minhash, similitud, shingles
+
+PALABRAS = ("desarrollo mantencion sistemas empresa coordinando requerimientos usuarios documentando procesos "
+            "apoyando puesta produccion nuevas funcionalidades python java sql docker analisis datos equipo").split()
+
+def _cv(semilla, palabras=300):
+    aleatorio = random.Random(semilla)
+    return ' '.join(aleatorio.choice(PALABRAS) for _ in range(palabras))
+
+@pytest.fixture
+def indice(tmp_path):
+    indice = IndiceDuplicados(str(tmp_path / "duplicados.db"))
+    yield indice
+    indice.cerrar()
+
+def test_shingles():
+    assert shingles("Uno dos tres") == {'uno dos tres'}
+    assert shingles("a b c d e f", tamano=5) == {'a b c d e', 'b c d e f'}
+    assert shingles("  ") == set()
+    assert firma_minhash("") is None
+
+def test_similitud_estimada():
+    texto = _cv(1)
+    cambiado = texto.replace(texto.split()[10], "Teléfono +56 9 8765 4321", 1)
+    assert similitud(firma_minhash(texto), firma_minhash(texto)) == 1.0
+    # No se distinguen mayúsculas
+    assert similitud(firma_minhash(texto), firma_minhash(texto.upper())) == 1.0
+    assert similitud(firma_minhash(texto), firma_minhash(cambiado)) >= 0.8
+    assert similitud(firma_minhash(texto), firma_minhash(_cv(2))) < 0.3
+
+def test_registrar_agrupa_cv_casi_iguales(indice):
+    texto = _cv(1)
+    candidato, original = indice.registrar(texto, 'datos-1')
+    assert candidato.startswith('cv-') and original is None
+
+    # El mismo texto con otro formato conserva su propia clave de datos
+    assert indice.registrar('  ' + texto.replace(' ', '\n'), 'datos-1b') == (candidato, None)
+
+    # Un cambio menor reutiliza los datos del CV original
+    palabras = texto.split()
+    palabras[5] = 'actualizado'
+    assert indice.registrar(' '.join(palabras), 'datos-2') == (candidato, 'datos-1')
+
+    otro, original = indice.registrar(_cv(2), 'datos-3')
+    assert otro != candidato and original is None
+    assert indice.estadisticas() == {'documentos': 3, 'candidatos': 2}
+
+def test_ids_estables_entre_ejecuciones(tmp_path):
+    ruta = str(tmp_path / "duplicados.db")
+    primero = IndiceDuplicados(ruta)
+    candidato, _ = primero.registrar(_cv(1), 'datos-1')
+    primero.cerrar()
+
+    segundo = IndiceDuplicados(ruta)
+    palabras = _cv(1).split()
+    palabras[-1] = 'cambio'
+    assert segundo.registrar(' '.join(palabras), 'datos-2') == (candidato, 'datos-1')
+    segundo.cerrar()
+
+# Conexión en la que la primera búsqueda del documento no lo encuentra, como si otro worker lo
+# registrara entre esa búsqueda y la inserción
+class _ConexionDesfasada:
+    def __init__(self, con):
+        self.con = con
+        self.ocultar = True
+
+    def execute(self, sql, *parametros):
+        if self.ocultar and sql.startswith("SELECT candidato FROM documentos"):
+            self.ocultar = False
+            return self.con.execute("SELECT NULL WHERE 0")
+        return self.con.execute(sql, *parametros)
+
+    def __getattr__(self, nombre):
+        return getattr(self.con, nombre)
+
+    def __enter__(self):
+        return self.con.__enter__()
+
+    def __exit__(self, *excepcion):
+        return self.con.__exit__(*excepcion)
+
+def test_registro_simultaneo_del_mismo_texto(tmp_path):
+    ruta = str(tmp_path / "duplicados.db")
+    primero, segundo = IndiceDuplicados(ruta), IndiceDuplicados(ruta)
+    texto = _cv(1)
+    candidato, _ = primero.registrar(texto, 'datos-1')
+
+    segundo.con = _ConexionDesfasada(segundo.con)
+    assert segundo.registrar(texto, 'datos-2') == (candidato, None)
+    assert segundo.estadisticas() == {'documentos': 1, 'candidatos': 1}
+    primero.cerrar()
+    segundo.cerrar()
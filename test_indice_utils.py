@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from indice_utils import IndiceInvertido, construir_indices, filtrar_candidatos, MODO_CUALQUIERA, MODO_TODAS, MODO_MINIMO
+
+def _df():
+    return pd.DataFrame({
+        'habilidades_tecnicas': [['python', 'sql', 'python'], ['java'], [], ['python', 'java'], None],
+        'idiomas_que_habla': [['ingles'], [], ['ingles', 'frances'], ['frances'], ['ingles']]
+    })
+
+def test_indice_invertido():
+    indice = IndiceInvertido(_df()['habilidades_tecnicas'].tolist())
+    assert indice.cantidad_filas == 5
+    assert indice.valores() == ['java', 'python', 'sql']
+    # Un postulante cuenta una vez por valor aunque lo repita
+    assert indice.buscar('python').tolist() == [0, 3]
+    assert indice.conteo('python') == 2
+    assert indice.conteo('go') == 0
+    assert indice.buscar('go').tolist() == []
+
+def test_indice_sin_valores():
+    indice = IndiceInvertido([[], None, []])
+    assert indice.valores() == []
+    assert indice.buscar('python').tolist() == []
+
+def test_filtrar_cualquiera():
+    indices = construir_indices(_df())
+    assert filtrar_candidatos(indices, ['sql', 'java'], [], MODO_CUALQUIERA).tolist() == [0, 1, 3]
+    assert filtrar_candidatos(indices, ['java'], ['frances'], MODO_CUALQUIERA).tolist() == [1, 2, 3]
+
+def test_filtrar_todas():
+    indices = construir_indices(_df())
+    assert filtrar_candidatos(indices, ['python', 'java'], [], MODO_TODAS).tolist() == [3]
+    assert filtrar_candidatos(indices, ['python'], ['ingles'], MODO_TODAS).tolist() == [0]
+    assert filtrar_candidatos(indices, ['go'], ['ingles'], MODO_TODAS).tolist() == []
+
+def test_filtrar_minimo():
+    indices = construir_indices(_df())
+    posiciones = filtrar_candidatos(indices, ['python', 'java', 'sql'], ['frances'], MODO_MINIMO, minimo=2)
+    assert posiciones.tolist() == [0, 3]
+
+def test_sin_filtros_devuelve_todos():
+    indices = construir_indices(_df())
+    assert np.array_equal(filtrar_candidatos(indices, [], []), np.arange(5))
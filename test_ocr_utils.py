@@ -0,0 +1,29 @@
+import os
+import ocr_utils
+
+# Inicializadores de prueba en lugar de cargar PaddleOCR: uno hace terminar el proceso y el otro deja
+# un modelo que devuelve el largo de la imagen
+class _Modelo:
+    def ocr(self, imagen, cls=False):
+        return [(None, (f"{len(imagen)} bytes", 1.0))]
+
+def _morir():
+    os._exit(1)
+
+def _cargar_modelo():
+    ocr_utils.ocr = _Modelo()
+
+def test_pool_roto_no_detiene_el_lote(monkeypatch):
+    monkeypatch.setattr(ocr_utils, 'preprocesar_imagen', lambda contenido: contenido)
+    monkeypatch.setattr(ocr_utils, '_iniciar_worker', _morir)
+    try:
+        resultados = list(ocr_utils.reconocer_imagenes([b'a', b'bb', b'ccc'], tamano_lote=2))
+        assert [texto for texto, _ in resultados] == [None, None, None]
+        assert all('terminó inesperadamente' in error for _, error in resultados)
+        assert ocr_utils.pool is None
+
+        # La siguiente llamada usa un pool nuevo
+        monkeypatch.setattr(ocr_utils, '_iniciar_worker', _cargar_modelo)
+        assert list(ocr_utils.reconocer_imagenes([b'a', b'bb', b'ccc'], tamano_lote=2)) == [('1 bytes ', None), ('2 bytes ', None), ('3 bytes ', None)]
+    finally:
+        ocr_utils.cerrar_pool_ocr()
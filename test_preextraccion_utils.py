@@ -0,0 +1,64 @@
+from preextraccion_utils import extraer_telefonos, extraer_idiomas, extraer_anno_egreso, extraer_campos_locales, recortar_texto, preextraer
+
+CV = """Curriculum Vitae
+Camila Rojas Soto
+Teléfono: +56 9 1234 5678
+Email: camila.rojas@correo.cl
+LinkedIn: https://www.linkedin.com/in/camilarojas
+
+EDUCACIÓN
+Colegio Alemán de Santiago, 2008
+Ingeniera Civil en Informática, Universidad de Chile, 2015
+
+EXPERIENCIA LABORAL
+Desarrolladora Backend en Entel (2015-2019)
+2019-2023
+Jefa de Proyectos en Falabella
+
+IDIOMAS
+Español nativo
+Inglés avanzado
+Página 1 de 2
+"""
+
+def test_telefonos_sin_rangos_de_annos():
+    assert extraer_telefonos(CV) == ['+56 9 1234 5678']
+    assert extraer_telefonos("Analista (2015-2019), Soporte 2019 2021, Periodo 2012.2014") == []
+    assert extraer_telefonos("Fono: 22 345 6789") == ['22 345 6789']
+
+def test_idiomas_con_contexto():
+    assert extraer_idiomas(CV) == ['espanol', 'ingles']
+    # Sin sección de idiomas ni nivel, el nombre del idioma es parte de otro nombre
+    assert extraer_idiomas("Colegio Alemán\nInstituto Chileno Francés de Cultura") == []
+    assert extraer_idiomas("Portugués intermedio, inglés C1") == ['portugues', 'ingles']
+
+def test_anno_egreso_solo_de_estudios():
+    assert extraer_anno_egreso(CV) == '2015'
+
+def test_campos_locales():
+    assert extraer_campos_locales(CV) == {
+        'telefono': '+56 9 1234 5678',
+        'email': 'camila.rojas@correo.cl',
+        'URL': 'https://www.linkedin.com/in/camilarojas',
+        'anno_de_termino_de_estudios': '2015',
+        'idiomas_que_habla': 'espanol, ingles'
+    }
+
+def test_recortar_mantiene_fechas_y_quita_contacto():
+    recortado = recortar_texto(CV).splitlines()
+    assert 'Desarrolladora Backend en Entel (2015-2019)' in recortado
+    assert '2019-2023' in recortado
+    assert not any('1234' in linea or '@' in linea or 'linkedin' in linea.lower() for linea in recortado)
+    assert 'Curriculum Vitae' not in recortado
+    assert 'Página 1 de 2' not in recortado
+
+def test_recortar_sin_lineas_repetidas_y_al_largo_maximo():
+    texto = "Python\nPython\n" + "\n".join(f"Línea {i}" for i in range(100))
+    recortado = recortar_texto(texto, max_caracteres=50)
+    assert recortado.splitlines()[:2] == ['Python', 'Línea 0']
+    assert len(recortado) <= 50
+
+def test_preextraer_pide_solo_campos_faltantes():
+    locales, _, pendientes = preextraer(CV, ['nombres', 'telefono', 'email', 'idiomas_que_habla', 'certificados'])
+    assert set(locales) == {'telefono', 'email', 'URL', 'anno_de_termino_de_estudios', 'idiomas_que_habla'}
+    assert pendientes == ['nombres', 'certificados']
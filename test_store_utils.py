@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+import store_utils
+import df_utils
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_utils, 'store_path', str(tmp_path / "cv_datas"))
+    monkeypatch.setattr(store_utils, 'legacy_csv_path', str(tmp_path / "cv_datas.csv"))
+    # Sin datos de NLTK no se intenta descargarlos
+    monkeypatch.setattr(df_utils, 'NLTK_SIN_CONEXION', True)
+    monkeypatch.setattr(df_utils, 'nltk_data_path', str(tmp_path / "nltk_data"))
+    return tmp_path
+
+def _cv(**campos):
+    datos = {'id_candidato': 'cv-1', 'nombres': 'ana rojas', 'habilidades_tecnicas': ['python']}
+    datos.update(campos)
+    return datos
+
+@pytest.mark.parametrize('valor', ['', '   ', [], None])
+def test_campo_vacio_se_guarda_como_nulo(valor):
+    assert store_utils._a_texto(valor) is None
+
+def test_lista_se_guarda_como_texto():
+    assert store_utils._a_texto(['inglés', '', 'francés']) == 'inglés, francés'
+
+def test_campos_vacios_no_se_cuentan(almacen):
+    store_utils.agregar_resultados(pd.DataFrame([
+        _cv(certificados='', idiomas_que_habla='  '),
+        _cv(id_candidato='cv-2', certificados='scrum, ', idiomas_que_habla='inglés, francés')
+    ]))
+    guardados = store_utils.cargar_resultados()
+    assert guardados['certificados'].isna().tolist() == [True, False]
+
+    df = df_utils.preparar_df(guardados)
+    assert df['certificados'].tolist() == [[], ['scrum']]
+    assert df['idiomas_que_habla'].tolist() == [[], ['ingles', 'frances']]
+    assert df['cantidad_certificados'].tolist() == [0, 1]
+    assert df['cantidad_idiomas_que_habla'].tolist() == [0, 2]
+
+def test_migracion_csv_con_campos_vacios(almacen):
+    pd.DataFrame([_cv(certificados='', habilidades_tecnicas="['python']")]).to_csv(store_utils.legacy_csv_path, index=False)
+    df = df_utils.preparar_df(store_utils.cargar_resultados())
+    assert df['certificados'].tolist() == [[]]
+    assert df['cantidad_certificados'].tolist() == [0]
@@ -0,0 +1,482 @@
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import shutil
+import signal
+import sqlite3
+import argparse
+import threading
+import subprocess
+from contextlib import contextmanager
+
+# Cola de trabajos para procesar CV fuera del hilo de la interfaz. Cada trabajo tiene su propia carpeta
+# (archivos subidos y métricas), lo ejecuta un proceso worker local por lotes y registra el estado de
+# cada archivo, que la interfaz consulta para mostrar el avance. Los resultados se agregan al almacén
+# compartido, que solo agrega archivos nuevos, por lo que varios trabajos pueden terminar a la vez.
+
+trabajos_path = os.environ.get("CV_TRABAJOS_DIR", "cache/trabajos")
+# Procesos worker que inicia la aplicación; cada uno ejecuta un trabajo a la vez
+TRABAJOS_WORKERS = int(os.environ.get("CV_TRABAJOS_WORKERS", 2))
+# Archivos por lote; los resultados de cada lote se guardan al terminar y la cancelación se revisa entre archivos
+TRABAJOS_LOTE = int(os.environ.get("CV_TRABAJOS_LOTE", 20))
+# Segundos entre consultas de un worker sin trabajos pendientes
+TRABAJOS_INTERVALO = float(os.environ.get("CV_TRABAJOS_INTERVALO", 1.0))
+# Un worker renueva cada tanto la reserva de su trabajo; si pasa este plazo (en segundos) sin renovarla,
+# el worker se considera detenido y el trabajo vuelve a la cola
+TRABAJOS_PLAZO = float(os.environ.get("CV_TRABAJOS_PLAZO", 60))
+# Pools de procesos de cada worker (OCR y documentos), que se reparten entre los workers de la aplicación
+POOLS_WORKER = ["CV_OCR_WORKERS", "CV_DOC_WORKERS"]
+
+ESTADO_PENDIENTE = "pendiente"
+ESTADO_EN_CURSO = "en_curso"
+ESTADO_TERMINADO = "terminado"
+ESTADO_CANCELADO = "cancelado"
+ESTADO_FALLIDO = "fallido"
+ESTADOS_ACTIVOS = (ESTADO_PENDIENTE, ESTADO_EN_CURSO)
+
+# Estados de cada archivo de un trabajo
+ARCHIVO_PENDIENTE = "pendiente"
+ARCHIVO_EXTRAIDO = "extraido"
+ARCHIVO_PROCESADO = "procesado"
+ARCHIVO_FALLIDO = "fallido"
+
+class TrabajoCancelado(Exception):
+    pass
+
+def _proceso_activo(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+class ColaTrabajos:
+    def __init__(self, ruta=trabajos_path):
+        self.ruta = ruta
+        self.ruta_db = os.path.join(ruta, "trabajos.db")
+        if not os.path.exists(ruta):
+            os.makedirs(ruta)
+        with self._conexion() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS trabajos (
+                    id TEXT PRIMARY KEY,
+                    sesion TEXT NOT NULL,
+                    estado TEXT NOT NULL,
+                    creado REAL NOT NULL,
+                    inicio REAL,
+                    fin REAL,
+                    pid INTEGER,
+                    cancelar INTEGER NOT NULL DEFAULT 0,
+                    agregados INTEGER NOT NULL DEFAULT 0,
+                    error TEXT
+                )
+            """)
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS archivos (
+                    trabajo TEXT NOT NULL,
+                    posicion INTEGER NOT NULL,
+                    nombre TEXT NOT NULL,
+                    clave TEXT NOT NULL,
+                    estado TEXT NOT NULL,
+                    error TEXT,
+                    PRIMARY KEY (trabajo, posicion)
+                )
+            """)
+            con.execute("CREATE INDEX IF NOT EXISTS idx_trabajos_sesion ON trabajos (sesion, creado)")
+            # Colas creadas antes de la reserva con plazo
+            columnas = [columna for _, columna, *_ in con.execute("PRAGMA table_info(trabajos)")]
+            if 'latido' not in columnas:
+                con.execute("ALTER TABLE trabajos ADD COLUMN latido REAL")
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta_db, timeout=30)
+
+    # Conexión que confirma los cambios al salir del bloque y luego se cierra
+    @contextmanager
+    def _conexion(self):
+        con = self._conectar()
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    # Carpeta del trabajo: archivos subidos en entrada/ y métricas al terminar
+    def carpeta(self, trabajo):
+        return os.path.join(self.ruta, trabajo)
+
+    # Crea un trabajo con los archivos (nombre, contenido) y devuelve su id.
+    # Los archivos se guardan con un prefijo de posición, por lo que los nombres repetidos no se pisan
+    def crear(self, sesion, archivos):
+        trabajo = uuid.uuid4().hex
+        entrada = os.path.join(self.carpeta(trabajo), "entrada")
+        os.makedirs(entrada)
+        filas = []
+        for posicion, (nombre, contenido) in enumerate(archivos):
+            clave = f"{posicion:05d}-{os.path.basename(nombre)}"
+            with open(os.path.join(entrada, clave), 'wb') as f:
+                f.write(contenido)
+            filas.append((trabajo, posicion, nombre, clave, ARCHIVO_PENDIENTE))
+
+        # El trabajo se registra después de escribir sus archivos, para que un worker no lo tome incompleto
+        with self._conexion() as con:
+            con.executemany("INSERT INTO archivos (trabajo, posicion, nombre, clave, estado) VALUES (?, ?, ?, ?, ?)", filas)
+            con.execute("INSERT INTO trabajos (id, sesion, estado, creado) VALUES (?, ?, ?, ?)",
+                        (trabajo, sesion, ESTADO_PENDIENTE, time.time()))
+        return trabajo
+
+    # Toma el trabajo pendiente más antiguo para el proceso pid, o devuelve None
+    def tomar(self, pid):
+        con = self._conectar()
+        con.isolation_level = None
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            fila = con.execute("SELECT id FROM trabajos WHERE estado = ? ORDER BY creado LIMIT 1", (ESTADO_PENDIENTE,)).fetchone()
+            if fila is not None:
+                ahora = time.time()
+                con.execute("UPDATE trabajos SET estado = ?, pid = ?, inicio = ?, latido = ? WHERE id = ?", (ESTADO_EN_CURSO, pid, ahora, ahora, fila[0]))
+            con.execute("COMMIT")
+            return fila[0] if fila is not None else None
+        finally:
+            con.close()
+
+    # Renueva la reserva de los trabajos en curso del proceso pid
+    def latir(self, pid):
+        with self._conexion() as con:
+            con.execute("UPDATE trabajos SET latido = ? WHERE estado = ? AND pid = ?", (time.time(), ESTADO_EN_CURSO, pid))
+
+    # Devuelve a la cola los trabajos en curso del proceso pid, que se está deteniendo
+    def liberar(self, pid):
+        with self._conexion() as con:
+            return self._reencolar(con, "pid = ?", (pid,))
+
+    # Los trabajos cuya reserva venció (el worker terminó inesperadamente) vuelven a la cola; sus archivos
+    # ya procesados se mantienen. Devuelve la cantidad de trabajos reencolados
+    def reencolar_abandonados(self, plazo=TRABAJOS_PLAZO):
+        with self._conexion() as con:
+            return self._reencolar(con, "(latido IS NULL OR latido < ?)", (time.time() - plazo,))
+
+    # La condición se evalúa en las mismas sentencias que reencolan, para no devolver a la cola un
+    # trabajo que otro worker acaba de tomar
+    def _reencolar(self, con, condicion, parametros):
+        condicion = f"estado = ? AND {condicion}"
+        con.execute(f"UPDATE archivos SET estado = ? WHERE estado = ? AND trabajo IN (SELECT id FROM trabajos WHERE {condicion})",
+                    (ARCHIVO_PENDIENTE, ARCHIVO_EXTRAIDO, ESTADO_EN_CURSO, *parametros))
+        return con.execute(f"UPDATE trabajos SET estado = ?, pid = NULL, latido = NULL WHERE {condicion}",
+                           (ESTADO_PENDIENTE, ESTADO_EN_CURSO, *parametros)).rowcount
+
+    # Un trabajo pendiente se cancela de inmediato; uno en curso se detiene en el siguiente archivo
+    def cancelar(self, trabajo):
+        with self._conexion() as con:
+            con.execute("UPDATE trabajos SET cancelar = 1 WHERE id = ?", (trabajo,))
+            cancelado = con.execute("UPDATE trabajos SET estado = ?, fin = ? WHERE id = ? AND estado = ?",
+                                    (ESTADO_CANCELADO, time.time(), trabajo, ESTADO_PENDIENTE)).rowcount
+        if cancelado:
+            self.borrar_entrada(trabajo)
+
+    def cancelado(self, trabajo):
+        with self._conexion() as con:
+            fila = con.execute("SELECT cancelar FROM trabajos WHERE id = ?", (trabajo,)).fetchone()
+        return fila is not None and bool(fila[0])
+
+    def archivos_pendientes(self, trabajo):
+        with self._conexion() as con:
+            return con.execute("SELECT clave FROM archivos WHERE trabajo = ? AND estado IN (?, ?) ORDER BY posicion",
+                               (trabajo, ARCHIVO_PENDIENTE, ARCHIVO_EXTRAIDO)).fetchall()
+
+    def actualizar_archivos(self, trabajo, estados):
+        with self._conexion() as con:
+            con.executemany("UPDATE archivos SET estado = ?, error = ? WHERE trabajo = ? AND clave = ?",
+                            [(estado, error, trabajo, clave) for clave, (estado, error) in estados.items()])
+
+    def sumar_agregados(self, trabajo, cantidad):
+        with self._conexion() as con:
+            con.execute("UPDATE trabajos SET agregados = agregados + ? WHERE id = ?", (cantidad, trabajo))
+
+    def terminar(self, trabajo, estado, error=None):
+        with self._conexion() as con:
+            con.execute("UPDATE trabajos SET estado = ?, fin = ?, error = ? WHERE id = ?", (estado, time.time(), error, trabajo))
+        self.borrar_entrada(trabajo)
+
+    # Los archivos subidos se borran cuando el trabajo termina
+    def borrar_entrada(self, trabajo):
+        shutil.rmtree(os.path.join(self.carpeta(trabajo), "entrada"), ignore_errors=True)
+
+    # Estado de un trabajo con la cantidad de archivos en cada estado y los archivos fallidos
+    def estado(self, trabajo):
+        with self._conexion() as con:
+            fila = con.execute("SELECT id, estado, creado, inicio, fin, agregados, error FROM trabajos WHERE id = ?", (trabajo,)).fetchone()
+            if fila is None:
+                return None
+            conteos = dict(con.execute("SELECT estado, COUNT(*) FROM archivos WHERE trabajo = ? GROUP BY estado", (trabajo,)).fetchall())
+            fallos = con.execute("SELECT nombre, error FROM archivos WHERE trabajo = ? AND estado = ? ORDER BY posicion",
+                                 (trabajo, ARCHIVO_FALLIDO)).fetchall()
+        return {
+            'id': fila[0], 'estado': fila[1], 'creado': fila[2], 'inicio': fila[3], 'fin': fila[4], 'agregados': fila[5], 'error': fila[6],
+            'total': sum(conteos.values()),
+            'extraidos': conteos.get(ARCHIVO_EXTRAIDO, 0),
+            'procesados': conteos.get(ARCHIVO_PROCESADO, 0),
+            'fallidos': conteos.get(ARCHIVO_FALLIDO, 0),
+            'fallos': [{'archivo': nombre, 'error': error} for nombre, error in fallos]
+        }
+
+    # Trabajos de una sesión, del más reciente al más antiguo
+    def trabajos(self, sesion, limite=10):
+        with self._conexion() as con:
+            ids = [trabajo for trabajo, in con.execute("SELECT id FROM trabajos WHERE sesion = ? ORDER BY creado DESC LIMIT ?", (sesion, limite))]
+        return [self.estado(trabajo) for trabajo in ids]
+
+    # Métricas del trabajo: (resumen, líneas JSON, formato Prometheus), o None si aún no se exportan
+    def metricas(self, trabajo):
+        carpeta = self.carpeta(trabajo)
+        ruta_jsonl = os.path.join(carpeta, "metricas.jsonl")
+        ruta_prometheus = os.path.join(carpeta, "metricas.prom")
+        if not os.path.exists(ruta_jsonl) or not os.path.exists(ruta_prometheus):
+            return None
+        with open(ruta_jsonl, encoding='utf-8') as f:
+            jsonl = f.read()
+        with open(ruta_prometheus, encoding='utf-8') as f:
+            prometheus = f.read()
+        return json.loads(jsonl.strip().splitlines()[-1])['resumen'], jsonl, prometheus
+
+    # Borra los trabajos terminados hace más de dias días, con sus carpetas
+    def limpiar(self, dias=7):
+        limite = time.time() - dias * 86400
+        with self._conexion() as con:
+            ids = [trabajo for trabajo, in con.execute("SELECT id FROM trabajos WHERE estado NOT IN (?, ?) AND fin < ?",
+                                                        (*ESTADOS_ACTIVOS, limite))]
+            for trabajo in ids:
+                con.execute("DELETE FROM archivos WHERE trabajo = ?", (trabajo,))
+                con.execute("DELETE FROM trabajos WHERE id = ?", (trabajo,))
+        for trabajo in ids:
+            shutil.rmtree(self.carpeta(trabajo), ignore_errors=True)
+        return len(ids)
+
+# Lee los archivos pendientes del trabajo y los agrupa en lotes de (clave, contenido)
+def _lotes(cola, trabajo, tamano_lote):
+    entrada = os.path.join(cola.carpeta(trabajo), "entrada")
+    lote = []
+    for clave, in cola.archivos_pendientes(trabajo):
+        with open(os.path.join(entrada, clave), 'rb') as f:
+            lote.append((clave, f.read()))
+        if len(lote) >= tamano_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+# Guarda las métricas del proceso en la carpeta del trabajo, en ambos formatos
+def _exportar_metricas(cola, trabajo):
+    from metricas_utils import registro
+
+    carpeta = cola.carpeta(trabajo)
+    for nombre, contenido in [("metricas.jsonl", registro.exportar_jsonl()), ("metricas.prom", registro.exportar_prometheus())]:
+        ruta = os.path.join(carpeta, nombre)
+        with open(ruta + ".tmp", 'w', encoding='utf-8') as f:
+            f.write(contenido)
+        os.replace(ruta + ".tmp", ruta)
+
+# Ejecuta un trabajo en el proceso actual: extracción de texto, OpenAI y habilidades por lotes,
+# guardando los resultados de cada lote y el estado de cada archivo a medida que avanza
+def ejecutar_trabajo(cola, trabajo, tamano_lote=TRABAJOS_LOTE):
+    from utils import extraer_textos, extraer_datos_textos, agregar_procesados, es_archivo_compatible
+    from metricas_utils import reiniciar_metricas, suscribir, desuscribir, ETAPA_NORMALIZACION, ETAPA_OCR, ETAPA_DOCUMENTOS, ETAPA_TEXTO
+
+    # Cada archivo termina la extracción con su normalización o con un fallo
+    def avance(evento):
+        if evento['archivo'] is None:
+            return
+        if evento['etapa'] == ETAPA_NORMALIZACION and evento['error'] is None:
+            cola.actualizar_archivos(trabajo, {evento['archivo']: (ARCHIVO_EXTRAIDO, None)})
+        elif evento['error'] is not None and evento['etapa'] in (ETAPA_OCR, ETAPA_DOCUMENTOS, ETAPA_TEXTO):
+            cola.actualizar_archivos(trabajo, {evento['archivo']: (ARCHIVO_FALLIDO, evento['error'])})
+
+    # La cancelación se revisa cada vez que un archivo termina la extracción
+    def con_cancelacion(textos):
+        try:
+            for texto in textos:
+                if cola.cancelado(trabajo):
+                    raise TrabajoCancelado()
+                yield texto
+        finally:
+            textos.close()
+
+    reiniciar_metricas()
+    suscribir(avance)
+    try:
+        for lote in _lotes(cola, trabajo, tamano_lote):
+            if cola.cancelado(trabajo):
+                raise TrabajoCancelado()
+            incompatibles = {clave: (ARCHIVO_FALLIDO, "El archivo no es compatible") for clave, _ in lote if not es_archivo_compatible(clave)}
+            cola.actualizar_archivos(trabajo, incompatibles)
+
+            fallos = []
+            textos = extraer_textos(((clave, contenido) for clave, contenido in lote if clave not in incompatibles), fallos)
+            procesados = extraer_datos_textos(con_cancelacion(textos), fallos)
+            cola.sumar_agregados(trabajo, agregar_procesados(procesados))
+
+            estados = {clave: (ARCHIVO_PROCESADO, None) for clave, _ in procesados}
+            estados.update({fallo['archivo']: (ARCHIVO_FALLIDO, str(fallo['error'])) for fallo in fallos})
+            estados.update({clave: (ARCHIVO_FALLIDO, "No se obtuvieron datos del archivo")
+                            for clave, _ in lote if clave not in estados and clave not in incompatibles})
+            cola.actualizar_archivos(trabajo, estados)
+            # Las métricas se actualizan con cada lote, para mostrarlas mientras el trabajo avanza
+            _exportar_metricas(cola, trabajo)
+        cola.terminar(trabajo, ESTADO_TERMINADO)
+    except TrabajoCancelado:
+        cola.terminar(trabajo, ESTADO_CANCELADO)
+    except Exception as e:
+        cola.terminar(trabajo, ESTADO_FALLIDO, f"{type(e).__name__}: {e}")
+    finally:
+        desuscribir(avance)
+        _exportar_metricas(cola, trabajo)
+
+# Renueva la reserva del trabajo en curso en un hilo aparte, hasta que se activa detener
+def _latir(cola, pid, detener, plazo=TRABAJOS_PLAZO):
+    while not detener.wait(plazo / 4):
+        try:
+            cola.latir(pid)
+        except sqlite3.Error as e:
+            print(f"No se pudo renovar la reserva: {e}")
+
+# Bucle de un proceso worker: toma y ejecuta trabajos hasta que se detiene el proceso o, si se indica
+# padre, hasta que termina el proceso que lo inició (la aplicación)
+def ejecutar_worker(ruta=trabajos_path, intervalo=TRABAJOS_INTERVALO, padre=None):
+    from ocr_utils import cerrar_pool_ocr
+
+    cola = ColaTrabajos(ruta)
+    detener = threading.Event()
+    threading.Thread(target=_latir, args=(cola, os.getpid(), detener), daemon=True).start()
+    # Al detener el worker, su trabajo en curso vuelve de inmediato a la cola
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while padre is None or _proceso_activo(padre):
+            # Cualquier worker devuelve a la cola los trabajos de workers detenidos
+            cola.reencolar_abandonados()
+            trabajo = cola.tomar(os.getpid())
+            if trabajo is None:
+                time.sleep(intervalo)
+                continue
+            print(f"Ejecutando el trabajo {trabajo}")
+            ejecutar_trabajo(cola, trabajo)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        detener.set()
+        cola.liberar(os.getpid())
+        cerrar_pool_ocr()
+
+def _worker_activo(pid):
+    # Un worker hijo que terminó se recoge, para que no quede como proceso zombi
+    if hasattr(os, 'WNOHANG'):
+        try:
+            terminado, _ = os.waitpid(pid, os.WNOHANG)
+            if terminado:
+                return False
+        except ChildProcessError:
+            pass
+    return _proceso_activo(pid)
+
+# Espera a que termine un worker iniciado por otra instancia del grupo (o por un proceso anterior)
+def _esperar_worker(pid, timeout=30):
+    limite = time.monotonic() + timeout
+    while _worker_activo(pid) and time.monotonic() < limite:
+        time.sleep(0.1)
+
+# Procesos worker locales de la aplicación. Se inician como procesos independientes (no con
+# multiprocessing), ya que un worker a su vez crea procesos para el OCR y los documentos.
+# Hay un solo grupo por cola: el proceso dueño y sus workers se registran en workers.json, por lo que
+# al volver a crear el grupo se reutilizan los workers activos y otro proceso no inicia workers propios.
+# Los workers terminan al salir la aplicación o, si esta termina sin avisar, al notar que ya no existe
+class GrupoWorkers:
+    def __init__(self, cantidad=TRABAJOS_WORKERS, ruta=trabajos_path):
+        self.cantidad = cantidad
+        self.ruta = ruta
+        self.ruta_registro = os.path.join(ruta, "workers.json")
+        self.lock = threading.Lock()
+        self.procesos = {}
+        self.registrado = False
+
+    def _activo(self, pid):
+        proceso = self.procesos.get(pid)
+        return proceso.poll() is None if proceso is not None else _worker_activo(pid)
+
+    def _leer_registro(self):
+        try:
+            with open(self.ruta_registro, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'dueno': None, 'workers': []}
+
+    def _guardar_registro(self, workers):
+        os.makedirs(self.ruta, exist_ok=True)
+        with open(self.ruta_registro + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({'dueno': os.getpid(), 'workers': workers}, f)
+        os.replace(self.ruta_registro + ".tmp", self.ruta_registro)
+
+    # Los pools de OCR y de documentos se reparten entre los workers, para no crear un pool por núcleo en cada uno
+    def _entorno(self):
+        entorno = dict(os.environ)
+        for variable in POOLS_WORKER:
+            total = int(os.environ.get(variable, os.cpu_count() or 1))
+            entorno[variable] = str(max(1, total // self.cantidad))
+        return entorno
+
+    # Inicia los workers que faltan o que terminaron. Devuelve False si otro proceso activo es dueño del grupo
+    def asegurar(self):
+        with self.lock:
+            registro = self._leer_registro()
+            dueno = registro['dueno']
+            if dueno is not None and dueno != os.getpid() and _proceso_activo(dueno):
+                return False
+            workers = [pid for pid in registro['workers'] if self._activo(pid)]
+            self.procesos = {pid: proceso for pid, proceso in self.procesos.items() if pid in workers}
+            while len(workers) < self.cantidad:
+                comando = [sys.executable, os.path.abspath(__file__), "--worker", "--ruta", self.ruta, "--padre", str(os.getpid())]
+                proceso = subprocess.Popen(comando, env=self._entorno())
+                self.procesos[proceso.pid] = proceso
+                workers.append(proceso.pid)
+            self._guardar_registro(workers)
+            if not self.registrado:
+                atexit.register(self.detener)
+                self.registrado = True
+            return True
+
+    def detener(self):
+        with self.lock:
+            registro = self._leer_registro()
+            if registro['dueno'] != os.getpid():
+                return
+            workers = [pid for pid in registro['workers'] if self._activo(pid)]
+            for pid in workers:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            for pid in workers:
+                if pid in self.procesos:
+                    self.procesos[pid].wait()
+                else:
+                    _esperar_worker(pid)
+            self.procesos = {}
+            self._guardar_registro([])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker y mantenimiento de la cola de trabajos")
+    parser.add_argument("--worker", action="store_true", help="Ejecuta un worker que procesa los trabajos de la cola")
+    parser.add_argument("--ruta", default=trabajos_path, help="Carpeta de la cola de trabajos")
+    parser.add_argument("--padre", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--limpiar", type=float, metavar="DIAS", help="Borra los trabajos terminados hace más de DIAS días")
+    args = parser.parse_args()
+
+    if args.worker:
+        ejecutar_worker(args.ruta, padre=args.padre)
+    elif args.limpiar is not None:
+        print(f"{ColaTrabajos(args.ruta).limpiar(args.limpiar)} trabajos borrados")
+    else:
+        parser.print_help()
@@ -1,68 +1,120 @@
 import os
 import re
-import textract
+import time
 import streamlit as st
-import json
 import pandas as pd
-from paddleocr import PaddleOCR
 from unicodedata import normalize
-from pdfminer.high_level import extract_text
 from dotenv import load_dotenv
-from openai import OpenAI
-import spacy
-from df_utils import procesar_df
-
-# Cargar el modelo de lenguaje de SpaCy con el entity_ruler
-nlp = spacy.load("model_skills")
+from ocr_utils import reconocer_imagenes
+from documentos_utils import extraer_documentos
+from skills_utils import extraer_habilidades, version_modelo_habilidades
+from llm_utils import construir_mensajes, estimar_tokens, parsear_respuesta, extraer_datos_lote, registrar_uso, ErrorExtraccion, CAMPOS_CV, MODELO_LLM, VERSION_PROMPT, MAX_TOKENS_RESPUESTA
+from preextraccion_utils import preextraer, extraer_campos_locales
+from duplicados_utils import IndiceDuplicados
+from store_utils import agregar_resultados, quitar_sin_cambios
+from cache_utils import obtener_cache, guardar_cache, hash_bytes, hash_texto, ESPACIO_TEXTO, ESPACIO_DATOS, ESPACIO_HABILIDADES
+from metricas_utils import medir_etapa, registrar_etapa, registrar_fallo, contar, ETAPA_OCR, ETAPA_DOCUMENTOS, ETAPA_TEXTO, ETAPA_NORMALIZACION, ETAPA_PREEXTRACCION, ETAPA_LLM, ETAPA_HABILIDADES, ETAPA_ALMACEN
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Extrae texto de las imagenes
-def image_to_text(folder_path, output_folder):
-    ocr = PaddleOCR(use_angle_cls=True, use_gpu=False, lang='es')
+VERSION_HABILIDADES = version_modelo_habilidades()
 
-    for filename in os.listdir(folder_path):
-        if filename.endswith(('.jpg', '.jpeg', '.png')):
-            # Ruta completa de la imagen de entrada
-            image_path = os.path.join(folder_path, filename)
+EXTENSIONES_IMAGEN = ('.jpg', '.jpeg', '.png')
+EXTENSIONES_DOCUMENTO = ('.pdf', '.doc', '.docx')
+EXTENSIONES_TEXTO = ('.txt',)
 
-            # Obtener el texto de la imagen
-            result = ocr.ocr(image_path, cls=False)
-        
-            output_filename = os.path.splitext(filename)[0] + '.txt'
-            output_path = os.path.join(output_folder, output_filename)
-            
-            # Se crea el archivo de texto
-            with open(output_path, 'w', encoding='utf-8') as f:
-                for line in result:
-                    f.write(line[1][0] + ' ')
+def es_archivo_compatible(filename):
+    return filename.lower().endswith(EXTENSIONES_IMAGEN + EXTENSIONES_DOCUMENTO + EXTENSIONES_TEXTO)
+
+# Extrae el texto de archivos compatibles y entrega (nombre, texto, error) por cada uno.
+# Los archivos que no están en caché se procesan en paralelo: las imágenes en el pool de OCR
+# y los documentos en procesos aislados, entregando cada resultado apenas termina.
+# El tiempo que se registra por archivo es la espera hasta recibir su resultado, sin contar
+# el tiempo en que el consumidor procesa los resultados anteriores
+def extraer_textos_archivos(archivos):
+    imagenes = []
+    documentos = []
+    tamanos = {}
+
+    for filename, contenido in archivos:
+        nombre = filename.lower()
+        clave = hash_bytes(contenido)
+        text = obtener_cache(ESPACIO_TEXTO, clave)
+
+        if text is None:
+            tamanos[clave] = len(contenido)
+            if nombre.endswith(EXTENSIONES_IMAGEN):
+                imagenes.append((filename, clave, contenido))
+                continue
+            if nombre.endswith(EXTENSIONES_DOCUMENTO):
+                documentos.append((clave, filename, contenido))
+                continue
+            with medir_etapa(ETAPA_TEXTO, len(contenido), archivo=filename) as medicion:
+                text = contenido.decode('utf-8', errors='ignore')
+                medicion['bytes_salida'] = len(text.encode('utf-8'))
+            guardar_cache(ESPACIO_TEXTO, clave, text)
+
+        yield filename, text, None
+
+    resultados_ocr = reconocer_imagenes(contenido for _, _, contenido in imagenes)
+
+    inicio = time.perf_counter()
+    # Las páginas escaneadas de los PDF se rasterizan y pasan por el mismo pool de OCR que las imágenes
+    for clave, filename, text, error in extraer_documentos(documentos, reconocer=reconocer_imagenes):
+        registrar_etapa(ETAPA_DOCUMENTOS, time.perf_counter() - inicio, bytes_entrada=tamanos[clave],
+                        bytes_salida=len(text.encode('utf-8')) if text else 0, archivo=filename, error=error)
+        if error is None:
+            guardar_cache(ESPACIO_TEXTO, clave, text)
+        yield filename, text, error
+        inicio = time.perf_counter()
+
+    inicio = time.perf_counter()
+    for (filename, clave, _), (text, error) in zip(imagenes, resultados_ocr):
+        registrar_etapa(ETAPA_OCR, time.perf_counter() - inicio, bytes_entrada=tamanos[clave],
+                        bytes_salida=len(text.encode('utf-8')) if text else 0, archivo=filename, error=error)
+        if error is None:
+            guardar_cache(ESPACIO_TEXTO, clave, text)
+        yield filename, text, error
+        inicio = time.perf_counter()
+
+# Escribe el texto extraído de los archivos de una carpeta
+def _carpeta_a_texto(folder_path, output_folder, extensiones):
+    def leer_archivos():
+        for filename in os.listdir(folder_path):
+            if filename.lower().endswith(extensiones):
+                # Ruta completa del archivo de entrada
+                with open(os.path.join(folder_path, filename), 'rb') as f:
+                    yield filename, f.read()
+
+    for filename, text, error in extraer_textos_archivos(leer_archivos()):
+        if error is not None:
+            st.error(f"Error al procesar el archivo {filename}: {error}")
+            continue
+
+        # Genera el nombre del archivo de salida con extensión .txt
+        output_filename = os.path.splitext(filename)[0] + '.txt'
+        output_path = os.path.join(output_folder, output_filename)
+
+        # Se crea el archivo de texto
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+# Extrae texto de las imagenes
+def image_to_text(folder_path, output_folder):
+    _carpeta_a_texto(folder_path, output_folder, EXTENSIONES_IMAGEN)
 
 # Extrae textos de los documentos 
 def document_to_text(folder_path, output_folder):
-    for filename in os.listdir(folder_path):
-        if filename.endswith(('.pdf', '.doc', '.docx')):
-            # Ruta completa de la imagen de entrada
-            document_path = os.path.join(folder_path, filename)
-            try:
-                if filename.endswith('.pdf'):
-                    # Se extrae el texto
-                    result = extract_text(document_path)
-                else:
-                    # Se extrae el texto
-                    result = textract.process(document_path)
-            except Exception as e:
-                st.error(f"Error al procesar el archivo {filename}: {e}")
-                continue
-                
-            # Genera el nombre del archivo de salida con extensión .txt
-            output_filename = os.path.splitext(filename)[0] + '.txt'
-            output_path = os.path.join(output_folder, output_filename)
-            
-            # Se crea el archivo de texto
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(result if filename.endswith('.pdf') else result.decode('utf-8'))
-            
+    _carpeta_a_texto(folder_path, output_folder, EXTENSIONES_DOCUMENTO)
+
+# Se transforman las letras con tildes a su equivalente
+def normalizar_texto(text):
+    return re.sub(
+        r"([^n\u0300-\u036f]|n(?!\u0303(?![\u0300-\u036f])))[\u0300-\u036f]+", r"\1",
+        normalize("NFD", text), 0, re.I
+    )
+
 # Normaliza el texto (elimina tildes)
 def normalize_text(folder_data):
     for filename in os.listdir(folder_data):
@@ -72,69 +124,237 @@ def normalize_text(folder_data):
             
             # Se lee el archivo de texto
             with open(file_path, 'r', encoding='utf-8') as input_file:
-                text = input_file.read()
-                # Se transforman las letras con tildes a su equivalente
-                text = re.sub(
-                    r"([^n\u0300-\u036f]|n(?!\u0303(?![\u0300-\u036f])))[\u0300-\u036f]+", r"\1",
-                    normalize("NFD", text), 0, re.I
-                )
+                text = normalizar_texto(input_file.read())
               
             with open(file_path, 'w', encoding='utf-8') as output_file:
                 output_file.write(text)
+
+# Extrae y normaliza el texto de cada archivo en memoria, una sola vez por archivo
+# Los archivos que fallan se agregan a la lista fallos, si se entrega, para informarlos al final
+def extraer_textos(archivos, fallos=None):
+    def archivos_compatibles():
+        for filename, contenido in archivos:
+            print('Transformación a texto del archivo: ', filename)
+            if not es_archivo_compatible(filename):
+                st.warning(f"El archivo {filename} no es archivo compatible")
+                continue
+            yield filename, contenido
+
+    for filename, text, error in extraer_textos_archivos(archivos_compatibles()):
+        if error is not None:
+            print(f"Error al procesar el archivo {filename}: {error}")
+            if fallos is None:
+                st.error(f"Error al procesar el archivo {filename}: {error}")
+            else:
+                fallos.append({'archivo': filename, 'error': error})
+            continue
+
+        with medir_etapa(ETAPA_NORMALIZACION, len(text.encode('utf-8')), archivo=filename) as medicion:
+            text = normalizar_texto(text)
+            medicion['bytes_salida'] = len(text.encode('utf-8'))
+        yield filename, text
             
+# Extrae localmente los campos confiables (teléfono, email, URL, año de egreso, idiomas) y prepara el
+# texto recortado y los campos restantes para OpenAI. Registra los tokens que se ahorran por CV
+def preextraer_cv(cv_text, filename=None):
+    with medir_etapa(ETAPA_PREEXTRACCION, len(cv_text.encode('utf-8')), archivo=filename) as medicion:
+        locales, texto, campos = preextraer(cv_text, CAMPOS_CV)
+        ahorrados = estimar_tokens(construir_mensajes(cv_text)) - estimar_tokens(construir_mensajes(texto, campos))
+        medicion['bytes_salida'] = len(texto.encode('utf-8'))
+        medicion['tokens_ahorrados'] = ahorrados
+    contar('llm_tokens_ahorrados', ahorrados)
+    return locales, texto, campos
+
 # Función para extraer los datos de los currículums
 def extraer_datos_cv(client, cv_text):
-    # Se envía el texto a OpenAI para extraer los datos
+    clave = hash_texto(cv_text, MODELO_LLM, VERSION_PROMPT)
+    datos = obtener_cache(ESPACIO_DATOS, clave)
+
+    if datos is None:
+        locales, texto, campos = preextraer_cv(cv_text)
+        # Se envía el texto a OpenAI para extraer los datos que faltan
+        with medir_etapa(ETAPA_LLM, len(texto.encode('utf-8'))):
+            datos = consultar_llm(client, texto, campos)
+        datos.update(locales)
+        guardar_cache(ESPACIO_DATOS, clave, datos)
+
+    datos['habilidades_tecnicas'] = extraer_habilidades_tecnicas(cv_text)
+
+    return datos
+
+def consultar_llm(client, cv_text, campos=CAMPOS_CV):
     response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-          {"role": "user", "content": f"Necesito que extraigas del texto los siguientes datos y me los entregues en formato diccionario python: nombres, telefono, email, direccion, titulo_actual_o_al_egresar, universidad_o_instituto, anno_de_termino_de_estudios, habilidades_blandas, cargo_experiencia_laboral, empresa_en_la_que_trabajo, certificados, idiomas_que_habla, nivel_de_idioma, URL. Si no tiene alguno de estos dejarlo vacío, si hay más de un dato separarlo por coma. Texto: {cv_text}"}
-        ],
+        model=MODELO_LLM,
+        messages=construir_mensajes(cv_text, campos),
         temperature=0.2,
-        max_tokens=800
+        max_tokens=MAX_TOKENS_RESPUESTA
     )
+    registrar_uso(response)
     # Se transforma el texto de respuesta a un diccionario
-    datos = json.loads(response.choices[0].message.content)
+    datos = parsear_respuesta(response.choices[0].message.content)
+    if datos is None:
+        raise ErrorExtraccion("La respuesta no es un diccionario válido")
+    return datos
 
-    doc = nlp(cv_text)
+# Extrae las habilidades técnicas con el modelo de SpaCy
+def extraer_habilidades_tecnicas(cv_text):
+    return extraer_habilidades_tecnicas_lote([cv_text])[0]
 
-    # datos = {}
-    datos['habilidades_tecnicas'] = [ent.text for ent in doc.ents if ent.label_ == 'SKILLS']
+# Extrae las habilidades técnicas de varios CV; los que no están en caché se procesan en un solo lote
+def extraer_habilidades_tecnicas_lote(textos):
+    claves = [hash_texto(cv_text, VERSION_HABILIDADES) for cv_text in textos]
+    resultados = [obtener_cache(ESPACIO_HABILIDADES, clave) for clave in claves]
 
-    return datos
+    pendientes = [i for i, habilidades in enumerate(resultados) if habilidades is None]
+    habilidades_pendientes = []
+    if pendientes:
+        bytes_entrada = sum(len(textos[i].encode('utf-8')) for i in pendientes)
+        with medir_etapa(ETAPA_HABILIDADES, bytes_entrada, documentos=len(pendientes)):
+            habilidades_pendientes = extraer_habilidades([textos[i] for i in pendientes])
+    for i, habilidades in zip(pendientes, habilidades_pendientes):
+        guardar_cache(ESPACIO_HABILIDADES, claves[i], habilidades)
+        resultados[i] = habilidades
 
-def guardar_resultados(df):
-    # Crear un directorio temporal para almacenar los archivos subidos
-    if not os.path.exists("export"):
-        os.makedirs("export")
+    return resultados
 
-    df.to_excel('export/cv_datas.xlsx', index=False)
-    df.to_csv('export/cv_datas.csv', index=False)
-    df.to_json('export/cv_datas.json', orient='records')
-    print("Exportación finalizada")
+# Agrega el lote al almacén de resultados (por defecto el de la aplicación) y lo devuelve con el esquema del almacén
+def guardar_resultados(df, ruta_almacen=None, nombre=None):
+    with medir_etapa(ETAPA_ALMACEN, documentos=len(df)):
+        return agregar_resultados(df, ruta_almacen, nombre)
 
-# Función para procesar los currículums
-def procesar_cv(folder_data):
-    client = OpenAI()
-    os.environ.get("OPENAI_API_KEY")
+# CV procesados nuevos o modificados respecto del almacén. Un CV cuyo último envío guardado
+# tiene el mismo texto no se vuelve a agregar
+def procesados_con_cambios(procesados, ruta_almacen=None):
+    return quitar_sin_cambios(pd.DataFrame([datos for _, datos in procesados]), ruta_almacen)
+
+# Agrega al almacén los CV procesados nuevos o modificados y devuelve la cantidad agregada
+def agregar_procesados(procesados, ruta_almacen=None):
+    df = procesados_con_cambios(procesados, ruta_almacen)
+    if not df.empty:
+        guardar_resultados(df, ruta_almacen)
+    return len(df)
+
+# Datos de un CV casi igual a otro ya extraído: se reutilizan los del original, con los campos
+# que se extraen localmente (contacto, año de egreso, idiomas) tomados del CV nuevo
+def reutilizar_datos(datos, cv_text):
+    return {**datos, **extraer_campos_locales(cv_text)}
+
+# Registra los CV en el índice de duplicados y devuelve el id de candidato de cada uno y, para los que
+# no están en caché, la clave de datos del CV casi igual ya registrado
+def registrar_duplicados(textos, claves, resultados):
+    indice = IndiceDuplicados()
+    candidatos = []
+    originales = {}
+    try:
+        for i, (_, cv_text) in enumerate(textos):
+            candidato, original = indice.registrar(cv_text, claves[i])
+            candidatos.append(candidato)
+            if resultados[i] is None:
+                originales[i] = original
+    finally:
+        indice.cerrar()
+    return candidatos, originales
+
+# Extrae los datos de los CV (OpenAI y habilidades técnicas) y entrega (nombre, datos) por cada CV procesado.
+# Los CV que no están en caché se envían a OpenAI en paralelo, salvo los casi iguales a otro CV ya extraído
+# (en esta ejecución o en una anterior), que reutilizan sus datos. Cada CV recibe un id_candidato estable
+# y la huella de su texto
+def extraer_datos_textos(textos, fallos=None):
+    textos = list(textos)
+    claves = [hash_texto(cv_text, MODELO_LLM, VERSION_PROMPT) for _, cv_text in textos]
+    resultados = [obtener_cache(ESPACIO_DATOS, clave) for clave in claves]
+
+    def informar_fallo(filename, error):
+        registrar_fallo(ETAPA_LLM, filename, error)
+        print(f"Error al procesar el archivo {filename}: {error}")
+        if fallos is None:
+            st.error(f"Error al procesar el archivo {filename}: {error}")
+        else:
+            fallos.append({'archivo': filename, 'error': str(error)})
+
+    candidatos, originales = registrar_duplicados(textos, claves, resultados)
 
+    # Primer CV del lote con cada clave, para los duplicados cuyo original está en este mismo lote
+    posiciones = {}
+    for i, clave in enumerate(claves):
+        posiciones.setdefault(clave, i)
+    dependientes = {}
+    for i, original in originales.items():
+        datos = obtener_cache(ESPACIO_DATOS, original) if original is not None else None
+        if datos is not None:
+            resultados[i] = reutilizar_datos(datos, textos[i][1])
+            guardar_cache(ESPACIO_DATOS, claves[i], resultados[i])
+            contar('cv_duplicados')
+        else:
+            # El original, o el mismo texto, está en este lote y se extrae una sola vez
+            primero = posiciones.get(original, posiciones[claves[i]])
+            if primero != i:
+                dependientes[i] = primero
+    # Cada duplicado apunta al CV del lote que efectivamente se envía a OpenAI
+    for i in dependientes:
+        vistos = {i}
+        while dependientes[i] in dependientes and dependientes[i] not in vistos:
+            vistos.add(dependientes[i])
+            dependientes[i] = dependientes[dependientes[i]]
+
+    pendientes = [i for i, datos in enumerate(resultados) if datos is None and i not in dependientes]
+    # Solo los campos que no se extraen localmente se piden a OpenAI, con el texto recortado
+    preextraidos = [preextraer_cv(textos[i][1], textos[i][0]) for i in pendientes]
+    respuestas = []
+    if pendientes:
+        # Los CV se envían en paralelo, por lo que se mide el lote completo
+        bytes_entrada = sum(len(texto.encode('utf-8')) for _, texto, _ in preextraidos)
+        with medir_etapa(ETAPA_LLM, bytes_entrada, documentos=len(pendientes)):
+            respuestas = extraer_datos_lote([texto for _, texto, _ in preextraidos], campos=[campos for _, _, campos in preextraidos])
+
+    for i, (locales, _, _), (datos, error) in zip(pendientes, preextraidos, respuestas):
+        if error is not None:
+            informar_fallo(textos[i][0], error)
+            continue
+        datos.update(locales)
+        guardar_cache(ESPACIO_DATOS, claves[i], datos)
+        resultados[i] = datos
+
+    # Los duplicados dentro del lote reutilizan los datos de su original
+    for i, j in dependientes.items():
+        if resultados[j] is None:
+            informar_fallo(textos[i][0], f"No se pudieron extraer los datos de {textos[j][0]}, del que es casi igual")
+            continue
+        resultados[i] = reutilizar_datos(resultados[j], textos[i][1])
+        guardar_cache(ESPACIO_DATOS, claves[i], resultados[i])
+        contar('cv_duplicados')
+
+    procesados = [(filename, cv_text, datos, candidato) for (filename, cv_text), datos, candidato in zip(textos, resultados, candidatos) if datos is not None]
+    habilidades = extraer_habilidades_tecnicas_lote([cv_text for _, cv_text, _, _ in procesados])
+    for (_, cv_text, datos, candidato), habilidades_tecnicas in zip(procesados, habilidades):
+        datos['habilidades_tecnicas'] = habilidades_tecnicas
+        datos['id_candidato'] = candidato
+        datos['huella_cv'] = hash_texto(cv_text)
+
+    return [(filename, datos) for filename, _, datos, _ in procesados]
+
+# Procesa los textos de los currículums y agrega al almacén los CV nuevos o modificados, sin volver
+# a procesar los resultados existentes. Devuelve la cantidad de CV agregados
+def procesar_textos(textos, fallos=None):
     print("Inicio procesamiento CV")
     st.write("Procesando CV...")
-    resultados = []
 
+    procesados = extraer_datos_textos(textos, fallos)
+
+    print("Fin procesamiento CV")
+    st.write("CV Procesados")
+
+    return agregar_procesados(procesados)
+
+# Lee los textos de una carpeta
+def leer_textos(folder_data):
     for filename in os.listdir(folder_data):
         if filename.endswith(".txt"):
             file_path = os.path.join(folder_data, filename)
-            print(f"Procesando archivo {filename}")
             # Se lee el archivo de texto
             with open(file_path, "r", encoding="utf-8") as file:
-                cv_text = file.read()
-                datos = extraer_datos_cv(client, cv_text)
-                resultados.append(datos)
-
-    print("Fin procesamiento CV")
-    st.write("CV Procesados")
+                yield filename, file.read()
 
-    df = pd.DataFrame(resultados)
-    guardar_resultados(df)
-    procesar_df(df)
+# Función para procesar los currículums
+def procesar_cv(folder_data):
+    procesar_textos(leer_textos(folder_data))